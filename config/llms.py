@@ -1,17 +1,48 @@
-from langchain_openai import ChatOpenAI
-from .settings import OPENAI_API_KEY
+from crewai.llms.providers.openai.completion import OpenAICompletion
+from openai import AsyncOpenAI, OpenAI
+from .settings import OPENAI_API_KEY, OPENAI_BASE_URL
+from core.transport import get_async_http_client, get_http_client
 
+# As novas tentativas são feitas pelo transporte governado (core.transport),
+# por isso os clientes não repetem chamadas por conta própria.
+# O papel define quais provedores (config "papeis_provedores") atendem as chamadas.
 
-def get_gpt35():
-    return ChatOpenAI(
-        model="gpt-3.5-turbo",
+def get_openai_client(papel="padrao"):
+    return OpenAI(
+        api_key=OPENAI_API_KEY,
+        base_url=OPENAI_BASE_URL,
+        http_client=get_http_client(papel),
+        max_retries=0,
+    )
+
+class GovernedCompletion(OpenAICompletion):
+    """
+    LLM nativo do CrewAI cujas chamadas (síncronas e assíncronas) usam o cliente HTTP do papel.
+    Objetos de outras bibliotecas (ex.: ChatOpenAI) são convertidos pelo CrewAI
+    sem o http_client, e as chamadas dos agentes deixariam de passar pelo
+    transporte governado.
+    """
+
+    papel: str = "padrao"
+
+    def _build_sync_client(self):
+        return OpenAI(**{**self._get_client_params(), "http_client": get_http_client(self.papel)})
+
+    def _build_async_client(self):
+        return AsyncOpenAI(**{**self._get_client_params(), "http_client": get_async_http_client(self.papel)})
+
+def _get_crew_llm(model, papel):
+    return GovernedCompletion(
+        model=model,
         temperature=0,
         api_key=OPENAI_API_KEY,
+        base_url=OPENAI_BASE_URL,
+        max_retries=0,
+        papel=papel,
     )
 
-def get_gpt40():
-    return ChatOpenAI(
-      model="gpt-4o",
-      temperature=0,
-      api_key=OPENAI_API_KEY,
-  )
\ No newline at end of file
+def get_gpt35(papel="padrao"):
+    return _get_crew_llm("gpt-3.5-turbo", papel)
+
+def get_gpt40(papel="padrao"):
+    return _get_crew_llm("gpt-4o", papel)
@@ -17,6 +17,7 @@ os.makedirs(USER_CONFIG_DIR, exist_ok=True)
 # Configurações padrão
 DEFAULT_CONFIG = {
     "openai_api_key": os.getenv("OPENAI_API_KEY", ""),
+    "openai_base_url": os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"),
     "assistant_name": os.getenv("ASSISTANT_NAME", "Assistente IA"),
     "temperature": float(os.getenv("TEMPERATURE", "0.7")),
     "max_tokens": int(os.getenv("MAX_TOKENS", "1024")),
@@ -25,7 +26,50 @@ DEFAULT_CONFIG = {
     "email_password": os.getenv("EMAIL_PASSWORD", ""),
     "smtp_server": os.getenv("SMTP_SERVER", "smtp.gmail.com"),
     "smtp_port": int(os.getenv("SMTP_PORT", "587")),
-    "verbose_mode": os.getenv("VERBOSE_MODE", "False").lower() == "true"
+    "verbose_mode": os.getenv("VERBOSE_MODE", "False").lower() == "true",
+    "outbox_max_tentativas": int(os.getenv("OUTBOX_MAX_TENTATIVAS", "6")),
+    "outbox_intervalo_base": float(os.getenv("OUTBOX_INTERVALO_BASE", "5")),
+    "outbox_janela_idempotencia": float(os.getenv("OUTBOX_JANELA_IDEMPOTENCIA", "600")),
+    "outbox_prazo_posse": float(os.getenv("OUTBOX_PRAZO_POSSE", "120")),
+    "openai_rpm": int(os.getenv("OPENAI_RPM", "500")),
+    "openai_tpm": int(os.getenv("OPENAI_TPM", "30000")),
+    "openai_concorrencia_por_modelo": int(os.getenv("OPENAI_CONCORRENCIA_POR_MODELO", "4")),
+    "openai_max_tentativas": int(os.getenv("OPENAI_MAX_TENTATIVAS", "3")),
+    "openai_limites_modelos": {},
+    "orcamento_sessao_usd": float(os.getenv("ORCAMENTO_SESSAO_USD", "1.0")),
+    "orcamento_crews_usd": {"search": 0.5, "email": 0.25},
+    "orcamento_limiar_economia": 0.8,
+    "orcamento_max_tokens_economia": 512,
+    "modelos_economicos": {"gpt-4o": "gpt-4o-mini", "gpt-3.5-turbo": "gpt-4o-mini"},
+    "precos_modelos": {},
+    "crew_workers": int(os.getenv("CREW_WORKERS", "2")),
+    "crew_espera_worker": float(os.getenv("CREW_ESPERA_WORKER", "120")),
+    "cassette_modo": "desligado",
+    "cassette_arquivo": "",
+    "cassette_tempo_real": False,
+    "busca_max_tokens": int(os.getenv("BUSCA_MAX_TOKENS", "600")),
+    "busca_trecho_max_chars": 300,
+    "busca_max_fontes": 6,
+    "busca_passagens_k": 6,
+    "busca_passagens_max_tokens": 400,
+    "busca_passagem_max_palavras": 80,
+    "provedores": {"openai": {"base_url": os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")}},
+    "papeis_provedores": {"padrao": ["openai"]},
+    "estrategia_provedores": "failover",
+    "provedores_intervalo_verificacao": 30,
+    "timeouts_adaptativos": True,
+    "timeout_inicial": 60,
+    "timeout_minimo": 5,
+    "timeout_maximo": 180,
+    "timeout_fator": 2.0,
+    "hedge_papeis": ["router", "search"],
+    "hedge_max_fracao": 0.1,
+    "sessao_atual": None,
+    "sessao_contexto_mensagens": 20,
+    "sessao_contexto_tokens": 3000,
+    "sessao_intervalo_snapshot": 25,
+    "prompts_variantes": {},
+    "perfil_prompts": True
 }
 
 # Carrega as configurações do usuário ou usa os valores padrão
@@ -60,6 +104,8 @@ CONFIG = carregar_configuracoes()
 
 # Define as variáveis globais para uso no resto do aplicativo
 OPENAI_API_KEY = CONFIG.get("openai_api_key", "")
+# URL base dos clientes da OpenAI; o transporte governado a troca pela do provedor escolhido
+OPENAI_BASE_URL = CONFIG.get("openai_base_url", "https://api.openai.com/v1")
 ASSISTANT_NAME = CONFIG.get("assistant_name", "Assistente IA")
 TEMPERATURE = float(CONFIG.get("temperature", 0.7))
 MAX_TOKENS = int(CONFIG.get("max_tokens", 1024))
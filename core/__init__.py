@@ -0,0 +1 @@
+# Infraestrutura compartilhada pelo assistente e pelos crews
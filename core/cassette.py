@@ -0,0 +1,194 @@
+# Gravação e reprodução do tráfego com a OpenAI e o SMTP ("cassetes")
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from config.settings import CONFIG
+
+# Modos: "desligado", "gravar" ou "reproduzir"
+MODO = os.getenv("ASSIST_CASSETTE_MODO", CONFIG.get("cassette_modo", "desligado"))
+ARQUIVO = os.path.expanduser(os.getenv("ASSIST_CASSETTE_ARQUIVO", CONFIG.get("cassette_arquivo", "")))
+# Na reprodução, respeita a duração original de cada chamada (ou responde imediatamente)
+TEMPO_REAL = os.getenv("ASSIST_CASSETTE_TEMPO_REAL", str(CONFIG.get("cassette_tempo_real", False))).lower() == "true"
+
+DOMINIO_ANONIMO = "anonimo.invalid"
+_RE_EMAIL = re.compile(r'[a-zA-Z0-9._%+-]+@([a-zA-Z0-9.-]+\.[a-zA-Z]{2,})')
+_RE_CHAVE_API = re.compile(r'sk-[A-Za-z0-9_-]{16,}')
+HEADERS_GRAVADOS = ("content-type",)
+
+
+def gravando() -> bool:
+    return MODO == "gravar" and bool(ARQUIVO)
+
+
+def reproduzindo() -> bool:
+    return MODO == "reproduzir" and bool(ARQUIVO)
+
+
+def anonimizar(texto: str) -> str:
+    """
+    Remove dados sensíveis do texto. Endereços de email viram endereços fictícios
+    determinísticos, para que a mesma entrada gere sempre a mesma requisição.
+    """
+    def trocar_email(match):
+        if match.group(1) == DOMINIO_ANONIMO:
+            return match.group(0)
+        digest = hashlib.sha256(match.group(0).lower().encode("utf-8")).hexdigest()[:8]
+        return f"usuario{digest}@{DOMINIO_ANONIMO}"
+
+    texto = _RE_CHAVE_API.sub("sk-REMOVIDA", texto)
+    return _RE_EMAIL.sub(trocar_email, texto)
+
+
+def chave_requisicao(metodo: str, caminho: str, corpo: str) -> str:
+    return hashlib.sha256(f"{metodo} {caminho}\n{anonimizar(corpo)}".encode("utf-8")).hexdigest()
+
+
+def _gravar(registro: Dict):
+    """
+    Acrescenta um registro ao cassete. Cada registro é um membro gzip independente
+    escrito com uma única chamada, de modo que gravações de threads diferentes
+    não se misturam e um processo interrompido não corrompe os registros anteriores.
+    """
+    linha = (json.dumps(registro, ensure_ascii=False) + "\n").encode("utf-8")
+    fd = os.open(ARQUIVO, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+    try:
+        os.write(fd, gzip.compress(linha))
+    finally:
+        os.close(fd)
+
+
+def ler_cassete(arquivo: str = None) -> List[Dict]:
+    with gzip.open(arquivo or ARQUIVO, "rt", encoding="utf-8") as f:
+        return [json.loads(linha) for linha in f if linha.strip()]
+
+
+def registrar_turno(entrada: str):
+    """
+    Grava o início de um turno do usuário, usado para reproduzir a sessão inteira.
+    """
+    if gravando():
+        _gravar({"tipo": "turno", "t": time.time(), "entrada": anonimizar(entrada)})
+
+
+def gravar_http(request: httpx.Request, response: httpx.Response, conteudo: bytes, duracao: float):
+    """
+    Grava uma requisição à OpenAI e sua resposta final (já decodificada e
+    anonimizada). É chamada uma vez por requisição do cliente, depois das novas
+    tentativas, do failover e do hedging, e duracao inclui todas elas.
+    """
+    decodificada = httpx.Response(response.status_code, headers=response.headers, content=conteudo)
+    corpo_requisicao = request.read().decode("utf-8", errors="replace")
+    _gravar({
+        "tipo": "http",
+        "t": time.time(),
+        "chave": chave_requisicao(request.method, request.url.path, corpo_requisicao),
+        "metodo": request.method,
+        "caminho": request.url.path,
+        "requisicao": anonimizar(corpo_requisicao),
+        "status": response.status_code,
+        "headers": {h: response.headers[h] for h in HEADERS_GRAVADOS if h in response.headers},
+        "resposta": anonimizar(decodificada.text),
+        "duracao": duracao,
+    })
+
+
+class Reprodutor:
+    """
+    Serve as respostas gravadas em um cassete. As chamadas são casadas pela chave
+    da requisição e, se não houver correspondência exata, pela ordem de gravação
+    no mesmo caminho da API.
+    """
+
+    def __init__(self, registros: List[Dict], tempo_real: bool = TEMPO_REAL):
+        self.tempo_real = tempo_real
+        self.tempo_rede = 0.0
+        self._lock = threading.Lock()
+        self._por_chave = defaultdict(deque)
+        self._por_caminho = defaultdict(deque)
+        self._smtp = deque()
+        for registro in registros:
+            if registro["tipo"] == "http":
+                self._por_chave[registro["chave"]].append(registro)
+                self._por_caminho[registro["caminho"]].append(registro)
+            elif registro["tipo"] == "smtp":
+                self._smtp.append(registro)
+
+    def _consumir(self, registro: Dict):
+        with self._lock:
+            self.tempo_rede += registro["duracao"]
+        if self.tempo_real:
+            time.sleep(registro["duracao"])
+
+    def proximo_http(self, metodo: str, caminho: str, corpo: str) -> Optional[Dict]:
+        with self._lock:
+            fila = self._por_chave.get(chave_requisicao(metodo, caminho, corpo))
+            registro = fila.popleft() if fila else None
+            if registro is not None:
+                self._por_caminho[caminho].remove(registro)
+            elif self._por_caminho.get(caminho):
+                registro = self._por_caminho[caminho].popleft()
+                self._por_chave[registro["chave"]].remove(registro)
+        if registro is not None:
+            self._consumir(registro)
+        return registro
+
+    def proximo_smtp(self) -> Optional[Dict]:
+        with self._lock:
+            registro = self._smtp.popleft() if self._smtp else None
+        if registro is not None:
+            self._consumir(registro)
+        return registro
+
+
+_reprodutor = None
+_reprodutor_lock = threading.Lock()
+
+
+def get_reprodutor() -> Reprodutor:
+    global _reprodutor
+    with _reprodutor_lock:
+        if _reprodutor is None:
+            _reprodutor = Reprodutor(ler_cassete())
+        return _reprodutor
+
+
+def resposta_gravada(request: httpx.Request) -> Tuple[httpx.Response, bytes]:
+    """
+    Resposta gravada para a requisição, sem acesso à rede. Sem gravação
+    correspondente, retorna o status 599.
+    """
+    corpo = request.read().decode("utf-8", errors="replace")
+    registro = get_reprodutor().proximo_http(request.method, request.url.path, corpo)
+    if registro is None:
+        conteudo = json.dumps({"error": {"message": f"Nenhuma resposta gravada para {request.method} {request.url.path}"}})
+        return httpx.Response(599, headers={"content-type": "application/json"}), conteudo.encode("utf-8")
+    return httpx.Response(registro["status"], headers=registro["headers"]), registro["resposta"].encode("utf-8")
+
+
+def enviar_smtp(enviar, recipient: str, subject: str, body: str):
+    """
+    Envia o email pela função real, gravando a duração, ou simula o envio
+    durante a reprodução.
+    """
+    if reproduzindo():
+        get_reprodutor().proximo_smtp()
+        return
+
+    inicio = time.monotonic()
+    enviar(recipient, subject, body)
+    if gravando():
+        _gravar({
+            "tipo": "smtp",
+            "t": time.time(),
+            "destinatario": anonimizar(recipient),
+            "duracao": time.monotonic() - inicio,
+        })
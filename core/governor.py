@@ -0,0 +1,256 @@
+# Governador das chamadas à OpenAI: limites de taxa, concorrência e prioridade
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from config.settings import CONFIG
+
+# Níveis de prioridade: turnos interativos passam na frente de trabalhos em lote
+INTERATIVO = "interativo"
+LOTE = "lote"
+
+_prioridade_atual: ContextVar[str] = ContextVar("prioridade_openai", default=INTERATIVO)
+
+
+@contextmanager
+def prioridade(nivel: str):
+    """
+    Define a prioridade das chamadas feitas dentro do bloco.
+    """
+    token = _prioridade_atual.set(nivel)
+    try:
+        yield
+    finally:
+        _prioridade_atual.reset(token)
+
+
+def prioridade_atual() -> str:
+    """
+    Retorna a prioridade das chamadas feitas no contexto atual.
+    """
+    return _prioridade_atual.get()
+
+
+class TokenBucket:
+    """
+    Balde de fichas com reposição contínua. As reservas podem deixar o saldo
+    negativo; nesse caso quem reservou deve aguardar o tempo devolvido.
+    """
+
+    def __init__(self, por_minuto: float):
+        self.capacidade = float(por_minuto)
+        self.taxa = float(por_minuto) / 60.0
+        self.saldo = self.capacidade
+        self.atualizado = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reservar(self, quantidade: float) -> float:
+        """
+        Reserva fichas e retorna quantos segundos é preciso aguardar para usá-las.
+        """
+        with self._lock:
+            agora = time.monotonic()
+            self.saldo = min(self.capacidade, self.saldo + (agora - self.atualizado) * self.taxa)
+            self.atualizado = agora
+            self.saldo -= min(quantidade, self.capacidade)
+            if self.saldo >= 0:
+                return 0.0
+            return -self.saldo / self.taxa
+
+    def tentar_reservar(self, quantidade: float) -> bool:
+        """
+        Reserva fichas apenas se houver saldo agora, sem deixá-lo negativo.
+        """
+        with self._lock:
+            agora = time.monotonic()
+            self.saldo = min(self.capacidade, self.saldo + (agora - self.atualizado) * self.taxa)
+            self.atualizado = agora
+            quantidade = min(quantidade, self.capacidade)
+            if self.saldo < quantidade:
+                return False
+            self.saldo -= quantidade
+            return True
+
+    def devolver(self, quantidade: float):
+        with self._lock:
+            self.saldo = min(self.capacidade, self.saldo + min(quantidade, self.capacidade))
+
+
+class _LimiteModelo:
+    """
+    Estado de limites de um modelo: baldes de requisições e tokens,
+    vagas de concorrência e bloqueio temporário por Retry-After.
+    """
+
+    def __init__(self, rpm: float, tpm: float, concorrencia: int):
+        self.requisicoes = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.concorrencia = max(1, int(concorrencia))
+        self.ativos = 0
+        self.esperando = {INTERATIVO: 0, LOTE: 0}
+        self.bloqueado_ate = 0.0
+        self.condicao = threading.Condition()
+
+    def _pode_entrar(self, nivel: str) -> bool:
+        if self.ativos >= self.concorrencia:
+            return False
+        # Trabalhos em lote só entram quando não há turnos interativos aguardando
+        return nivel == INTERATIVO or self.esperando[INTERATIVO] == 0
+
+    def ocupar(self, nivel: str):
+        with self.condicao:
+            self.esperando[nivel] += 1
+            try:
+                while not self._pode_entrar(nivel):
+                    self.condicao.wait()
+            finally:
+                self.esperando[nivel] -= 1
+            self.ativos += 1
+
+    def tentar_ocupar(self) -> bool:
+        """
+        Ocupa uma vaga apenas se houver uma livre e ninguém aguardando na fila.
+        """
+        with self.condicao:
+            if self.ativos >= self.concorrencia or any(self.esperando.values()):
+                return False
+            self.ativos += 1
+            return True
+
+    def liberar(self):
+        with self.condicao:
+            self.ativos -= 1
+            self.condicao.notify_all()
+
+
+class Governor:
+    """
+    Coordena todas as chamadas à OpenAI do processo. Cada chamada ocupa uma vaga
+    de concorrência do modelo e consome dos limites de requisições e tokens por minuto.
+    """
+
+    def __init__(self, rpm: float = None, tpm: float = None, concorrencia: int = None,
+                 limites_modelos: Optional[Dict[str, Dict]] = None):
+        self.rpm = float(rpm or CONFIG.get("openai_rpm", 500))
+        self.tpm = float(tpm or CONFIG.get("openai_tpm", 30000))
+        self.concorrencia = int(concorrencia or CONFIG.get("openai_concorrencia_por_modelo", 4))
+        self.limites_modelos = limites_modelos if limites_modelos is not None else CONFIG.get("openai_limites_modelos", {})
+        self._modelos: Dict[str, _LimiteModelo] = {}
+        self._lock = threading.Lock()
+        self._esperas = deque(maxlen=1000)
+        self._contadores = {"chamadas": 0, "limitadas": 0, "novas_tentativas": 0}
+
+    def _limite(self, modelo: str) -> _LimiteModelo:
+        with self._lock:
+            if modelo not in self._modelos:
+                especifico = self.limites_modelos.get(modelo, {})
+                self._modelos[modelo] = _LimiteModelo(
+                    especifico.get("rpm", self.rpm),
+                    especifico.get("tpm", self.tpm),
+                    especifico.get("concorrencia", self.concorrencia),
+                )
+            return self._modelos[modelo]
+
+    def aguardar_liberacao(self, modelo: str):
+        """
+        Aguarda o fim de um bloqueio imposto por uma resposta 429 com Retry-After.
+        """
+        espera = self._limite(modelo).bloqueado_ate - time.monotonic()
+        if espera > 0:
+            time.sleep(espera)
+
+    def penalizar(self, modelo: str, segundos: float):
+        """
+        Bloqueia novas chamadas ao modelo pelo tempo indicado pelo servidor.
+        """
+        limite = self._limite(modelo)
+        with self._lock:
+            limite.bloqueado_ate = max(limite.bloqueado_ate, time.monotonic() + segundos)
+            self._contadores["limitadas"] += 1
+
+    def registrar_nova_tentativa(self):
+        with self._lock:
+            self._contadores["novas_tentativas"] += 1
+
+    @contextmanager
+    def vaga(self, modelo: str, tokens_estimados: int):
+        """
+        Ocupa uma vaga para uma chamada ao modelo, aguardando os limites de
+        concorrência, de taxa e eventuais bloqueios por Retry-After.
+        """
+        limite = self._limite(modelo)
+        inicio = time.monotonic()
+
+        limite.ocupar(prioridade_atual())
+        try:
+            espera = max(limite.requisicoes.reservar(1), limite.tokens.reservar(tokens_estimados))
+            if espera > 0:
+                time.sleep(espera)
+            self.aguardar_liberacao(modelo)
+
+            with self._lock:
+                self._esperas.append(time.monotonic() - inicio)
+                self._contadores["chamadas"] += 1
+
+            yield
+        finally:
+            limite.liberar()
+
+    def tentar_vaga(self, modelo: str, tokens_estimados: int) -> bool:
+        """
+        Ocupa, sem esperar, uma vaga para uma chamada opcional (ex.: a cópia
+        disparada pelo hedging). Só tem sucesso se houver vaga de concorrência
+        livre, saldo nos limites de taxa e nenhum bloqueio por Retry-After; caso
+        contrário nada é consumido. A vaga ocupada é devolvida com liberar_vaga.
+        """
+        limite = self._limite(modelo)
+        if limite.bloqueado_ate > time.monotonic() or not limite.tentar_ocupar():
+            return False
+        if not limite.requisicoes.tentar_reservar(1):
+            limite.liberar()
+            return False
+        if not limite.tokens.tentar_reservar(tokens_estimados):
+            limite.requisicoes.devolver(1)
+            limite.liberar()
+            return False
+
+        with self._lock:
+            self._contadores["chamadas"] += 1
+        return True
+
+    def liberar_vaga(self, modelo: str):
+        self._limite(modelo).liberar()
+
+    def metricas(self) -> Dict[str, float]:
+        """
+        Retorna as métricas de fila: chamadas, tempos de espera e respostas 429.
+        """
+        with self._lock:
+            esperas = sorted(self._esperas)
+            contadores = dict(self._contadores)
+
+        if esperas:
+            contadores["espera_media"] = sum(esperas) / len(esperas)
+            contadores["espera_p95"] = esperas[min(len(esperas) - 1, int(len(esperas) * 0.95))]
+            contadores["espera_maxima"] = esperas[-1]
+        else:
+            contadores["espera_media"] = contadores["espera_p95"] = contadores["espera_maxima"] = 0.0
+        return contadores
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_governor() -> Governor:
+    """
+    Retorna o governador compartilhado pelo processo.
+    """
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            _governor = Governor()
+        return _governor
@@ -0,0 +1,119 @@
+# Latência observada por papel, modelo e endpoint: timeouts adaptativos e hedging de requisições
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import CONFIG
+
+TIMEOUTS_ADAPTATIVOS = bool(CONFIG.get("timeouts_adaptativos", True))
+TIMEOUT_INICIAL = float(CONFIG.get("timeout_inicial", 60))
+TIMEOUT_MINIMO = float(CONFIG.get("timeout_minimo", 5))
+TIMEOUT_MAXIMO = float(CONFIG.get("timeout_maximo", 180))
+# O timeout é o p99 observado multiplicado por este fator
+TIMEOUT_FATOR = float(CONFIG.get("timeout_fator", 2.0))
+# Papéis cujas chamadas são idempotentes e podem ser duplicadas (hedging)
+HEDGE_PAPEIS = set(CONFIG.get("hedge_papeis", ["router", "search"]))
+# Fração máxima de chamadas extras que o hedging pode gerar
+HEDGE_MAX_FRACAO = float(CONFIG.get("hedge_max_fracao", 0.1))
+AMOSTRAS_MINIMAS = 20
+JANELA = 200
+
+
+class LatencyTracker:
+    """
+    Janela móvel das latências de um papel em um modelo e endpoint, usada para
+    calcular o timeout adaptativo e o momento de disparar uma requisição
+    duplicada. Chamadas de natureza diferente (ex.: pesquisa na web pela
+    Responses API e passos do agente em Chat Completions) ficam em janelas separadas.
+    """
+
+    def __init__(self, papel: str, modelo: str = "", endpoint: str = ""):
+        self.papel = papel
+        self.modelo = modelo
+        self.endpoint = endpoint
+        self._amostras = deque(maxlen=JANELA)
+        self._lock = threading.Lock()
+        self.chamadas = 0
+        self.hedges = 0
+        self.hedges_vencedores = 0
+        self.timeouts = 0
+
+    def registrar(self, duracao: float):
+        with self._lock:
+            self._amostras.append(duracao)
+            self.chamadas += 1
+
+    def registrar_timeout(self, limite: float):
+        # A chamada levaria pelo menos o timeout: entra na janela com esse valor
+        with self._lock:
+            self._amostras.append(limite)
+            self.chamadas += 1
+            self.timeouts += 1
+
+    def percentil(self, p: float) -> Optional[float]:
+        with self._lock:
+            if len(self._amostras) < AMOSTRAS_MINIMAS:
+                return None
+            ordenadas = sorted(self._amostras)
+        return ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * p))]
+
+    def timeout(self) -> float:
+        """
+        Timeout da próxima chamada: p99 × fator, limitado ao intervalo configurado.
+        Enquanto não há amostras suficientes, usa o timeout inicial.
+        """
+        p99 = self.percentil(0.99) if TIMEOUTS_ADAPTATIVOS else None
+        if p99 is None:
+            return TIMEOUT_INICIAL
+        return min(max(p99 * TIMEOUT_FATOR, TIMEOUT_MINIMO), TIMEOUT_MAXIMO)
+
+    def atraso_hedge(self) -> Optional[float]:
+        """
+        Tempo de espera (p95) antes de duplicar a chamada, ou None se o papel não
+        admite hedging, se ainda não há amostras ou se o limite de custo extra foi atingido.
+        """
+        if self.papel not in HEDGE_PAPEIS:
+            return None
+        with self._lock:
+            if self.hedges >= HEDGE_MAX_FRACAO * max(self.chamadas, 1):
+                return None
+        return self.percentil(0.95)
+
+    def registrar_hedge(self, venceu: bool):
+        with self._lock:
+            self.hedges += 1
+            if venceu:
+                self.hedges_vencedores += 1
+
+    def resumo(self) -> Dict:
+        return {
+            "papel": self.papel,
+            "modelo": self.modelo,
+            "endpoint": self.endpoint,
+            "chamadas": self.chamadas,
+            "p50": self.percentil(0.50),
+            "p95": self.percentil(0.95),
+            "p99": self.percentil(0.99),
+            "timeout": self.timeout(),
+            "timeouts": self.timeouts,
+            "hedges": self.hedges,
+            "hedges_vencedores": self.hedges_vencedores,
+        }
+
+
+_trackers: Dict[Tuple[str, str, str], LatencyTracker] = {}
+_trackers_lock = threading.Lock()
+
+
+def get_tracker(papel: str, modelo: str = "", endpoint: str = "") -> LatencyTracker:
+    chave = (papel, modelo, endpoint)
+    with _trackers_lock:
+        if chave not in _trackers:
+            _trackers[chave] = LatencyTracker(papel, modelo, endpoint)
+        return _trackers[chave]
+
+
+def resumo_latencias() -> List[Dict]:
+    with _trackers_lock:
+        trackers = sorted(_trackers.items())
+    return [t.resumo() for _, t in trackers]
@@ -0,0 +1,181 @@
+# Perfil do tamanho dos prompts: tokens por componente em cada chamada à OpenAI
+import json
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from config.settings import CONFIG
+from core import usage
+
+ATIVO = bool(CONFIG.get("perfil_prompts", True))
+
+COMPONENTES = ("sistema", "backstory", "goal", "tarefa", "esquemas_ferramentas", "saidas_ferramentas", "historico")
+
+_RE_OBSERVACAO = re.compile(r'Observation:(.*?)(?=\n(?:Thought|Action|Final Answer):|\Z)', re.DOTALL)
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS perfis_prompt (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    criado_em REAL NOT NULL,
+    sessao TEXT NOT NULL,
+    turno TEXT,
+    origem TEXT NOT NULL,
+    prompt TEXT,
+    modelo TEXT NOT NULL,
+    {", ".join(f"{c} INTEGER NOT NULL" for c in COMPONENTES)}
+);
+CREATE INDEX IF NOT EXISTS idx_perfis_prompt_sessao ON perfis_prompt (sessao, origem);
+"""
+
+# Textos conhecidos do prompt atual, por componente, e a versão dos prompts em uso
+_componentes: ContextVar[Dict] = ContextVar("componentes_prompt", default={"textos": {}, "prompt": None})
+
+
+def estimar_tokens(texto: str) -> int:
+    return len(texto) // 4 if texto else 0
+
+
+@contextmanager
+def _conectar():
+    # O perfil fica no mesmo banco do uso (usage.USO_DB é lido a cada conexão)
+    conn = sqlite3.connect(usage.USO_DB, timeout=10)
+    conn.row_factory = sqlite3.Row
+    try:
+        with conn:
+            conn.executescript(_SCHEMA)
+            yield conn
+    finally:
+        conn.close()
+
+
+@contextmanager
+def componentes_prompt(textos: Dict[str, List[str]], prompt: Optional[str] = None):
+    """
+    Informa quais textos das chamadas feitas dentro do bloco pertencem a cada
+    componente (ex.: {"backstory": [...], "tarefa": [...]}).
+    """
+    token = _componentes.set({"textos": textos, "prompt": prompt})
+    try:
+        yield
+    finally:
+        _componentes.reset(token)
+
+
+def componentes_atuais() -> Dict:
+    """
+    Retorna os componentes informados por componentes_prompt no contexto atual.
+    """
+    return dict(_componentes.get())
+
+
+def componentes_do_crew(crew) -> Dict[str, List[str]]:
+    """
+    Textos de backstory, goal, tarefas e descrições de ferramentas de um crew do CrewAI.
+    """
+    textos = {"backstory": [], "goal": [], "tarefa": [], "esquemas_ferramentas": []}
+    for agente in getattr(crew, "agents", None) or []:
+        textos["backstory"].append(getattr(agente, "backstory", "") or "")
+        textos["goal"].append(getattr(agente, "goal", "") or "")
+        for ferramenta in getattr(agente, "tools", None) or []:
+            textos["esquemas_ferramentas"].append(getattr(ferramenta, "description", "") or "")
+    for tarefa in getattr(crew, "tasks", None) or []:
+        textos["tarefa"].append(getattr(tarefa, "description", "") or "")
+        textos["tarefa"].append(getattr(tarefa, "expected_output", "") or "")
+    return textos
+
+
+def _conteudo(mensagem: Dict) -> str:
+    conteudo = mensagem.get("content") or ""
+    if isinstance(conteudo, list):
+        return "\n".join(str(parte.get("text", "")) for parte in conteudo if isinstance(parte, dict))
+    return str(conteudo)
+
+
+def medir(corpo: Dict, textos: Optional[Dict[str, List[str]]] = None) -> Dict[str, int]:
+    """
+    Estima os tokens de cada componente no corpo de uma chamada (Chat Completions
+    ou Responses API). Os textos conhecidos são procurados nas mensagens; as
+    observações do agente contam como saídas de ferramentas, o esquema "tools"
+    como esquemas de ferramentas e o que sobra como sistema ou histórico.
+    """
+    textos = textos if textos is not None else _componentes.get()["textos"]
+    medidas = dict.fromkeys(COMPONENTES, 0)
+    conhecidos = sorted(
+        ((componente, texto) for componente, lista in textos.items() for texto in lista if texto),
+        key=lambda item: len(item[1]), reverse=True,
+    )
+
+    mensagens = corpo.get("messages")
+    if mensagens is None:
+        entrada = corpo.get("input") or ""
+        mensagens = [{"role": "user", "content": entrada}] if isinstance(entrada, str) else entrada
+    if corpo.get("instructions"):
+        mensagens = [{"role": "system", "content": corpo["instructions"]}, *mensagens]
+
+    for mensagem in mensagens:
+        if not isinstance(mensagem, dict):
+            continue
+        restante = _conteudo(mensagem)
+        if mensagem.get("role") == "tool":
+            medidas["saidas_ferramentas"] += estimar_tokens(restante)
+            continue
+        for componente, texto in conhecidos:
+            ocorrencias = restante.count(texto)
+            if ocorrencias:
+                medidas[componente] += ocorrencias * estimar_tokens(texto)
+                restante = restante.replace(texto, "")
+        for observacao in _RE_OBSERVACAO.findall(restante):
+            medidas["saidas_ferramentas"] += estimar_tokens(observacao)
+        restante = _RE_OBSERVACAO.sub("", restante)
+        medidas["sistema" if mensagem.get("role") in ("system", "developer") else "historico"] += estimar_tokens(restante)
+
+    if corpo.get("tools"):
+        medidas["esquemas_ferramentas"] += estimar_tokens(json.dumps(corpo["tools"], ensure_ascii=False))
+    return medidas
+
+
+def registrar(papel: str, modelo: str, corpo: Dict):
+    """
+    Mede o prompt da chamada e grava o perfil, associado ao crew (ou ao papel do cliente).
+    """
+    if not ATIVO:
+        return
+    medidas = medir(corpo)
+    contexto = usage.contexto_atual()
+    with _conectar() as conn:
+        conn.execute(
+            f"INSERT INTO perfis_prompt (criado_em, sessao, turno, origem, prompt, modelo, {', '.join(COMPONENTES)}) "
+            f"VALUES (?, ?, ?, ?, ?, ?, {', '.join('?' for _ in COMPONENTES)})",
+            (time.time(), contexto["sessao"], contexto["turno"], contexto["crew"] or papel,
+             _componentes.get()["prompt"], modelo, *(medidas[c] for c in COMPONENTES))
+        )
+
+
+def relatorio(sessao: Optional[str] = None) -> List[Dict]:
+    """
+    Média de tokens por componente em cada chamada, por origem (crew ou papel) e
+    versão dos prompts, na sessão atual.
+    """
+    sessao = sessao or usage.contexto_atual()["sessao"]
+    medias = ", ".join(f"AVG({c}) AS {c}" for c in COMPONENTES)
+    with _conectar() as conn:
+        linhas = conn.execute(
+            f"SELECT origem, COALESCE(prompt, '-') AS prompt, COUNT(*) AS chamadas, {medias} "
+            "FROM perfis_prompt WHERE sessao = ? GROUP BY origem, prompt ORDER BY origem, prompt",
+            (sessao,)
+        ).fetchall()
+    return [dict(linha) for linha in linhas]
+
+
+def ultimas_chamadas(limite: int = 10, sessao: Optional[str] = None) -> List[Dict]:
+    sessao = sessao or usage.contexto_atual()["sessao"]
+    with _conectar() as conn:
+        linhas = conn.execute(
+            f"SELECT criado_em, origem, prompt, modelo, {', '.join(COMPONENTES)} FROM perfis_prompt "
+            "WHERE sessao = ? ORDER BY id DESC LIMIT ?",
+            (sessao, limite)
+        ).fetchall()
+    return [dict(linha) for linha in linhas]
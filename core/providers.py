@@ -0,0 +1,180 @@
+# Provedores compatíveis com a API da OpenAI, com failover e balanceamento por latência
+import json
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from config.settings import CONFIG, OPENAI_API_KEY
+
+# Estratégias de escolha entre os provedores de um papel:
+# "failover" segue a ordem configurada, "latencia" prefere o mais rápido
+# e "distribuir" sorteia com peso inversamente proporcional à latência.
+ESTRATEGIA = CONFIG.get("estrategia_provedores", "failover")
+INTERVALO_VERIFICACAO = float(CONFIG.get("provedores_intervalo_verificacao", 30))
+FALHAS_PARA_INDISPONIVEL = 2
+PESO_EWMA = 0.3
+
+PROVEDORES_PADRAO = {"openai": {"base_url": "https://api.openai.com/v1"}}
+# Cabeçalhos da conta OpenAI dos clientes; cada provedor usa apenas a própria chave
+_CABECALHOS_DA_CONTA = ("authorization", "openai-organization", "openai-project")
+
+
+def caminho_relativo(url: httpx.URL, base_cliente: httpx.URL) -> str:
+    """
+    Caminho da API em relação à URL base do cliente
+    (ex.: /v1/chat/completions com base .../v1 vira /chat/completions).
+    """
+    caminho = url.path
+    prefixo = base_cliente.path.rstrip("/")
+    if prefixo and (caminho == prefixo or caminho.startswith(prefixo + "/")):
+        caminho = caminho[len(prefixo):]
+    return caminho
+
+
+class Provedor:
+    """
+    Um endpoint compatível com a OpenAI e seu estado de saúde e latência.
+    """
+
+    def __init__(self, nome: str, base_url: str, api_key: str = "", modelos: Optional[Dict[str, str]] = None):
+        self.nome = nome
+        self.base_url = httpx.URL(base_url.rstrip("/"))
+        self.api_key = api_key
+        self.modelos = modelos or {}
+        self.latencia: Optional[float] = None
+        self.falhas = 0
+        self.disponivel = True
+        self._lock = threading.Lock()
+
+    def registrar_sucesso(self, duracao: float):
+        with self._lock:
+            self.latencia = duracao if self.latencia is None else (1 - PESO_EWMA) * self.latencia + PESO_EWMA * duracao
+            self.falhas = 0
+            self.disponivel = True
+
+    def marcar_disponivel(self):
+        with self._lock:
+            self.falhas = 0
+            self.disponivel = True
+
+    def registrar_falha(self):
+        with self._lock:
+            self.falhas += 1
+            if self.falhas >= FALHAS_PARA_INDISPONIVEL:
+                self.disponivel = False
+
+    def preparar(self, request: httpx.Request, corpo: dict, base_cliente: httpx.URL) -> httpx.Request:
+        """
+        Reescreve a requisição para este provedor: URL, chave de API e nome do modelo.
+        O caminho da requisição é tomado em relação à URL base do cliente.
+        """
+        caminho = caminho_relativo(request.url, base_cliente)
+        url = self.base_url.copy_with(path=self.base_url.path + caminho, query=request.url.query or None)
+
+        headers = httpx.Headers(request.headers)
+        headers["host"] = self.base_url.netloc.decode("ascii")
+        for nome in _CABECALHOS_DA_CONTA:
+            headers.pop(nome, None)
+        if self.api_key:
+            headers["authorization"] = f"Bearer {self.api_key}"
+
+        conteudo = request.read()
+        modelo = corpo.get("model")
+        if modelo in self.modelos:
+            conteudo = json.dumps({**corpo, "model": self.modelos[modelo]}).encode("utf-8")
+            headers["content-length"] = str(len(conteudo))
+
+        return httpx.Request(request.method, url, headers=headers, content=conteudo, extensions=request.extensions)
+
+    def verificar(self, timeout: float = 5.0) -> bool:
+        """
+        Verificação de saúde: consulta GET /models no provedor.
+        """
+        headers = {"authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        try:
+            response = httpx.get(f"{self.base_url}/models", headers=headers, timeout=timeout)
+        except httpx.HTTPError:
+            self.registrar_falha()
+            return False
+        if response.status_code >= 500:
+            self.registrar_falha()
+            return False
+        # A latência das verificações não entra na média, que mede só as chamadas reais
+        self.marcar_disponivel()
+        return True
+
+
+class ProviderRegistry:
+    """
+    Provedores configurados e a atribuição de provedores a cada papel
+    (router, email, search...). Mantém verificações de saúde em segundo plano
+    quando há mais de um provedor.
+    """
+
+    def __init__(self, provedores: Dict[str, Dict] = None, papeis: Dict[str, List[str]] = None,
+                 estrategia: str = ESTRATEGIA):
+        provedores = provedores or CONFIG.get("provedores") or PROVEDORES_PADRAO
+        self.provedores = {
+            nome: Provedor(
+                nome,
+                cfg.get("base_url", PROVEDORES_PADRAO["openai"]["base_url"]),
+                cfg.get("api_key") or os.getenv(cfg.get("api_key_env", ""), "") or (OPENAI_API_KEY if nome == "openai" else ""),
+                cfg.get("modelos"),
+            )
+            for nome, cfg in provedores.items()
+        }
+        self.papeis = papeis if papeis is not None else CONFIG.get("papeis_provedores", {})
+        self.estrategia = estrategia
+        self._verificador = None
+        if len(self.provedores) > 1:
+            self._verificador = threading.Thread(target=self._verificar_periodicamente, name="provedores-saude", daemon=True)
+            self._verificador.start()
+
+    def candidatos(self, papel: str) -> List[Provedor]:
+        """
+        Provedores a tentar para o papel, na ordem de preferência.
+        Os indisponíveis ficam por último, como última alternativa.
+        """
+        nomes = self.papeis.get(papel) or self.papeis.get("padrao") or list(self.provedores)
+        lista = [self.provedores[n] for n in nomes if n in self.provedores] or list(self.provedores.values())
+        disponiveis = [p for p in lista if p.disponivel]
+        indisponiveis = [p for p in lista if not p.disponivel]
+
+        if self.estrategia == "latencia":
+            # Provedores ainda sem medição vêm primeiro, para que sejam medidos
+            disponiveis.sort(key=lambda p: p.latencia if p.latencia is not None else 0.0)
+        elif self.estrategia == "distribuir" and len(disponiveis) > 1:
+            pesos = [1.0 / max(p.latencia or 0.05, 0.05) for p in disponiveis]
+            primeiro = random.choices(disponiveis, weights=pesos)[0]
+            disponiveis.remove(primeiro)
+            disponiveis.insert(0, primeiro)
+
+        return disponiveis + indisponiveis
+
+    def _verificar_periodicamente(self):
+        while True:
+            time.sleep(INTERVALO_VERIFICACAO)
+            for provedor in list(self.provedores.values()):
+                provedor.verificar()
+
+    def estado(self) -> List[Dict]:
+        return [
+            {"nome": p.nome, "base_url": str(p.base_url), "disponivel": p.disponivel, "latencia": p.latencia}
+            for p in self.provedores.values()
+        ]
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ProviderRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ProviderRegistry()
+        return _registry
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Reproduz offline uma sessão gravada em cassete e mede o tempo gasto pelo próprio
+aplicativo (montagem dos crews, parsing, etc.) separado do tempo de rede.
+
+Uso:
+    python -m core.replay sessao.cassete.gz [--tempo-real]
+
+Para gravar um cassete, execute o assistente com:
+    ASSIST_CASSETTE_MODO=gravar ASSIST_CASSETTE_ARQUIVO=sessao.cassete.gz python main.py
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproduz uma sessão gravada em cassete.")
+    parser.add_argument("arquivo", help="Arquivo do cassete (.gz)")
+    parser.add_argument("--tempo-real", action="store_true",
+                        help="Respeita a duração original de cada chamada em vez de responder imediatamente")
+    args = parser.parse_args()
+
+    # O modo do cassete precisa estar definido antes de importar os módulos do aplicativo
+    os.environ["ASSIST_CASSETTE_MODO"] = "reproduzir"
+    os.environ["ASSIST_CASSETTE_ARQUIVO"] = os.path.abspath(args.arquivo)
+    os.environ["ASSIST_CASSETTE_TEMPO_REAL"] = str(args.tempo_real)
+
+    from rich.console import Console
+    from rich.table import Table
+    from rich import box
+
+    from core import cassette, usage
+    from core.governor import LOTE, prioridade
+    from crews.email import outbox
+
+    # A reprodução não deve tocar a caixa de saída nem o histórico de uso reais
+    temporario = tempfile.mkdtemp(prefix="assist-replay-")
+    outbox.OUTBOX_DB = os.path.join(temporario, "outbox.db")
+    usage.USO_DB = os.path.join(temporario, "uso.db")
+
+    from chat_completion import ChatManager
+    from crews.manager import CrewManager
+    from crews.events import descrever_evento, etapa_mais_lenta
+
+    console = Console()
+    reprodutor = cassette.get_reprodutor()
+    turnos = [r for r in cassette.ler_cassete() if r["tipo"] == "turno"]
+    if not turnos:
+        console.print("[bold red]O cassete não contém turnos gravados.[/]")
+        sys.exit(1)
+
+    tabela = Table(title="Reprodução da sessão", box=box.ROUNDED)
+    tabela.add_column("Turno")
+    tabela.add_column("Entrada")
+    tabela.add_column("Ação")
+    tabela.add_column("Total", justify="right")
+    tabela.add_column("Rede (gravada)", justify="right")
+    tabela.add_column("Aplicativo", justify="right")
+    tabela.add_column("Etapa mais lenta")
+
+    total_app = total_rede = 0.0
+    for indice, turno in enumerate(turnos, 1):
+        rede_antes = reprodutor.tempo_rede
+        inicio = time.monotonic()
+        # A reprodução é trabalho em lote: cede as vagas do governador a turnos interativos
+        with usage.contexto_uso(turno=str(indice)), prioridade(LOTE):
+            result = ChatManager().handle_user_input(turno["entrada"])
+            crew_manager = CrewManager()
+            eventos = []
+            try:
+                if result["action"] == "use_crew":
+                    eventos = crew_manager.execute_crew(result["crew_type"], turno["entrada"])["events"]
+                elif result["action"] == "use_plan":
+                    eventos = crew_manager.execute_plan(result.get("plan") or [])["events"]
+            except ValueError as e:
+                result["action"] += f" (erro: {e})"
+        decorrido = time.monotonic() - inicio
+        rede = reprodutor.tempo_rede - rede_antes
+        # Sem tempo real, o tempo de rede gravado não é aguardado
+        aplicativo = decorrido - rede if args.tempo_real else decorrido
+
+        mais_lenta = etapa_mais_lenta(eventos)
+
+        total_app += aplicativo
+        total_rede += rede
+        tabela.add_row(str(indice), turno["entrada"][:40], result["action"],
+                       f"{decorrido:.3f}s", f"{rede:.3f}s", f"{aplicativo:.3f}s",
+                       descrever_evento(mais_lenta) if mais_lenta else "-")
+
+    # Entrega os emails enfileirados durante a sessão (o SMTP também é reproduzido)
+    outbox.processar_pendentes()
+
+    console.print(tabela)
+    console.print(f"Tempo do aplicativo: {total_app:.3f}s | Tempo de rede gravado: {total_rede:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+# Sessões de conversa persistentes: log só de acréscimos, índice de offsets e snapshots
+import json
+import os
+import re
+import struct
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from config.settings import CONFIG, USER_CONFIG_DIR
+
+SESSOES_DIR = os.path.join(USER_CONFIG_DIR, "sessoes")
+# Janela de contexto enviada ao roteador: últimas mensagens, limitadas por tokens
+CONTEXTO_MENSAGENS = int(CONFIG.get("sessao_contexto_mensagens", 20))
+CONTEXTO_TOKENS = int(CONFIG.get("sessao_contexto_tokens", 3000))
+# A cada N mensagens a janela de contexto é gravada em um snapshot
+INTERVALO_SNAPSHOT = int(CONFIG.get("sessao_intervalo_snapshot", 25))
+
+_RE_NOME = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+# Cada entrada do índice é o offset (8 bytes) de uma mensagem no log
+_OFFSET = struct.Struct("<Q")
+
+_atual: Optional["Sessao"] = None
+_atual_lock = threading.Lock()
+
+
+def _estimar_tokens(texto: str) -> int:
+    return len(texto) // 4 + 1
+
+
+def _caminhos(nome: str) -> Dict[str, str]:
+    if not _RE_NOME.match(nome or ""):
+        raise ValueError("Nome de sessão inválido: use letras, números, '-' ou '_' (até 64 caracteres).")
+    base = os.path.join(SESSOES_DIR, nome)
+    return {"log": base + ".log", "indice": base + ".idx", "snapshot": base + ".snap.json"}
+
+
+class Sessao:
+    """
+    Sessão de conversa gravada em disco. As mensagens são acrescentadas a um log
+    JSON Lines e o offset de cada uma vai para um índice de tamanho fixo, o que
+    permite ler apenas a cauda do log ao retomar a sessão. A janela de contexto
+    também é gravada periodicamente em um snapshot.
+    """
+
+    def __init__(self, nome: str, criar: bool = False):
+        self.nome = nome
+        self.caminhos = _caminhos(nome)
+        existe = os.path.exists(self.caminhos["indice"])
+        if criar and existe:
+            raise ValueError(f"A sessão '{nome}' já existe. Use /sessao abrir {nome}.")
+        if not criar and not existe:
+            raise ValueError(f"Sessão '{nome}' não encontrada. Use /sessao listar para ver as sessões.")
+
+        os.makedirs(SESSOES_DIR, exist_ok=True)
+        for caminho in (self.caminhos["log"], self.caminhos["indice"]):
+            open(caminho, "ab").close()
+
+        self._lock = threading.Lock()
+        self.total = self._reparar_indice()
+        self._janela = deque(self._carregar_janela(), maxlen=CONTEXTO_MENSAGENS)
+
+    def _offset(self, indice: int) -> int:
+        with open(self.caminhos["indice"], "rb") as f:
+            f.seek(indice * _OFFSET.size)
+            return _OFFSET.unpack(f.read(_OFFSET.size))[0]
+
+    def _reparar_indice(self) -> int:
+        """
+        Garante que o índice cubra todas as mensagens completas do log após uma
+        interrupção entre as duas gravações. Só a parte não indexada é lida; uma
+        linha incompleta no fim do log é descartada.
+
+        Returns:
+            O número de mensagens da sessão
+        """
+        tamanho_indice = os.path.getsize(self.caminhos["indice"])
+        total = tamanho_indice // _OFFSET.size
+        tamanho_log = os.path.getsize(self.caminhos["log"])
+        if tamanho_indice % _OFFSET.size:
+            with open(self.caminhos["indice"], "r+b") as f:
+                f.truncate(total * _OFFSET.size)
+        while total and self._offset(total - 1) >= tamanho_log:
+            total -= 1
+            with open(self.caminhos["indice"], "r+b") as f:
+                f.truncate(total * _OFFSET.size)
+
+        with open(self.caminhos["log"], "r+b") as log:
+            if total:
+                log.seek(self._offset(total - 1))
+                log.readline()
+            novos = []
+            while True:
+                offset = log.tell()
+                linha = log.readline()
+                if not linha:
+                    break
+                if not linha.endswith(b"\n"):
+                    log.truncate(offset)
+                    break
+                novos.append(offset)
+
+        if novos:
+            with open(self.caminhos["indice"], "ab") as f:
+                f.write(b"".join(_OFFSET.pack(o) for o in novos))
+        return total + len(novos)
+
+    def _ler_mensagens(self, inicio: int, fim: int) -> List[Dict]:
+        """
+        Lê as mensagens [inicio, fim) indo direto ao offset da primeira pelo índice.
+        """
+        if inicio >= fim:
+            return []
+        mensagens = []
+        with open(self.caminhos["log"], "rb") as log:
+            log.seek(self._offset(inicio))
+            for _ in range(fim - inicio):
+                mensagens.append(json.loads(log.readline()))
+        return mensagens
+
+    def _carregar_janela(self) -> List[Dict]:
+        """
+        Reconstrói a janela de contexto a partir do snapshot mais as mensagens
+        gravadas depois dele, ou apenas da cauda do log se o snapshot estiver
+        ausente ou defasado demais.
+        """
+        inicio = max(0, self.total - CONTEXTO_MENSAGENS)
+        janela = []
+        try:
+            with open(self.caminhos["snapshot"], "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            if inicio <= snapshot["mensagens"] <= self.total:
+                janela = snapshot["janela"]
+                inicio = snapshot["mensagens"]
+        except (OSError, ValueError, KeyError):
+            pass
+        return janela + self._ler_mensagens(inicio, self.total)
+
+    def _salvar_snapshot(self):
+        temporario = self.caminhos["snapshot"] + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump({"mensagens": self.total, "atualizada": time.time(), "janela": list(self._janela)},
+                      f, ensure_ascii=False)
+        os.replace(temporario, self.caminhos["snapshot"])
+
+    def adicionar(self, role: str, content: str):
+        """
+        Acrescenta uma mensagem ao log e seu offset ao índice.
+        """
+        mensagem = {"role": role, "content": content, "t": time.time()}
+        linha = (json.dumps(mensagem, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            with open(self.caminhos["log"], "ab") as log:
+                offset = log.tell()
+                log.write(linha)
+            with open(self.caminhos["indice"], "ab") as f:
+                f.write(_OFFSET.pack(offset))
+            self.total += 1
+            self._janela.append(mensagem)
+            if self.total % INTERVALO_SNAPSHOT == 0:
+                self._salvar_snapshot()
+
+    def registrar_turno(self, entrada: str, resposta: str):
+        self.adicionar("user", entrada)
+        self.adicionar("assistant", resposta)
+
+    def contexto(self, max_tokens: int = CONTEXTO_TOKENS) -> List[Dict[str, str]]:
+        """
+        Mensagens mais recentes que cabem no orçamento de tokens, em ordem cronológica.
+        """
+        with self._lock:
+            janela = list(self._janela)
+        mensagens = []
+        restante = max_tokens
+        for mensagem in reversed(janela):
+            conteudo = mensagem["content"]
+            if _estimar_tokens(conteudo) > restante:
+                # A mensagem que não cabe inteira entra cortada, mantendo o início
+                if restante > 50:
+                    mensagens.append({"role": mensagem["role"], "content": conteudo[:restante * 4] + "…"})
+                break
+            mensagens.append({"role": mensagem["role"], "content": conteudo})
+            restante -= _estimar_tokens(conteudo)
+        return mensagens[::-1]
+
+
+def listar_sessoes() -> List[Dict]:
+    """
+    Sessões existentes, da mais recente para a mais antiga. Usa apenas o tamanho
+    dos arquivos, sem ler os logs.
+    """
+    if not os.path.isdir(SESSOES_DIR):
+        return []
+    sessoes = []
+    for arquivo in os.listdir(SESSOES_DIR):
+        if not arquivo.endswith(".idx"):
+            continue
+        nome = arquivo[:-len(".idx")]
+        try:
+            caminhos = _caminhos(nome)
+        except ValueError:
+            continue
+        sessoes.append({
+            "nome": nome,
+            "mensagens": os.path.getsize(caminhos["indice"]) // _OFFSET.size,
+            "tamanho": os.path.getsize(caminhos["log"]) if os.path.exists(caminhos["log"]) else 0,
+            "atualizada": os.path.getmtime(caminhos["indice"]),
+        })
+    return sorted(sessoes, key=lambda s: s["atualizada"], reverse=True)
+
+
+def nova_sessao(nome: str) -> Sessao:
+    global _atual
+    sessao = Sessao(nome, criar=True)
+    with _atual_lock:
+        _atual = sessao
+    return sessao
+
+
+def abrir_sessao(nome: str) -> Sessao:
+    global _atual
+    sessao = Sessao(nome)
+    with _atual_lock:
+        _atual = sessao
+    return sessao
+
+
+def sessao_atual() -> Optional[Sessao]:
+    with _atual_lock:
+        return _atual
@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+"""
+Teste de longa duração (soak): executa milhares de turnos pelo pipeline completo
+(roteador, crews, caixa de saída, sessão) contra uma OpenAI e um SMTP falsos
+locais, acompanhando o crescimento de memória e a deriva da latência por turno.
+
+Uso:
+    python -m core.soak [--turnos 2000] [--amostra 100] [--max-rss-mb 50] [--max-heap-mb 20]
+    python -m core.soak --workers 0   # crews no próprio processo, sem o pool
+
+Por padrão os crews rodam no pool de processos, como no aplicativo; a memória
+dos workers é medida à parte.
+
+Sai com código 1 se o crescimento de memória, a deriva da latência ou o número
+de erros passar dos limites informados.
+"""
+import argparse
+import gc
+import json
+import os
+import smtplib
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from email.mime.text import MIMEText
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Entradas usadas em rodízio: conversa direta, pesquisa (crew completo) e email (caminho rápido)
+ENTRADAS = (
+    "Olá! Me conte uma curiosidade sobre o número {n}.",
+    "Pesquise as últimas notícias sobre o tema {n} de tecnologia.",
+    "Mande um email para pessoa{n}@exemplo.com dizendo que a reunião {n} está confirmada.",
+)
+
+
+def _estimar_tokens(texto: str) -> int:
+    return len(texto) // 4 + 1
+
+
+class _OpenAIFalsa(BaseHTTPRequestHandler):
+    """
+    Responde às rotas usadas pelo aplicativo (chat completions, responses e models)
+    de forma determinística, imitando o roteador, o agente do CrewAI (com chamadas
+    de ferramentas) e a pesquisa na web com citações.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # Sem isso o atraso de ACK do TCP somaria ~40 ms a cada chamada com keep-alive
+    disable_nagle_algorithm = True
+    latencia = 0.0
+    # Pesquisas na web recebidas: confirma que a ferramenta do agente foi de fato executada
+    pesquisas = 0
+    _lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, status: int, dados: dict):
+        corpo = json.dumps(dados, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._responder(200, {"object": "list", "data": [{"id": "gpt-4o", "object": "model"}]})
+        else:
+            self._responder(404, {"error": {"message": "rota desconhecida"}})
+
+    def do_POST(self):
+        tamanho = int(self.headers.get("content-length") or 0)
+        corpo = json.loads(self.rfile.read(tamanho) or b"{}")
+        if self.latencia:
+            time.sleep(self.latencia)
+        if self.path.endswith("/responses"):
+            with _OpenAIFalsa._lock:
+                _OpenAIFalsa.pesquisas += 1
+            self._responder(200, self._pesquisa(corpo))
+        elif self.path.endswith("/chat/completions"):
+            self._responder(200, self._chat(corpo))
+        else:
+            self._responder(404, {"error": {"message": "rota desconhecida"}})
+
+    @staticmethod
+    def _chat(corpo: dict) -> dict:
+        mensagens = corpo.get("messages") or []
+        textos = [str(m.get("content") or "") for m in mensagens]
+        sistema = " ".join(t for m, t in zip(mensagens, textos) if m.get("role") == "system")
+        ultima = textos[-1] if textos else ""
+        ferramentas = [t.get("function", {}).get("name") for t in corpo.get("tools") or []]
+        chamadas_ferramentas = None
+
+        if ferramentas:
+            # Agente com chamada nativa de ferramentas: primeiro pede a pesquisa e, com o
+            # resultado da ferramenta já na conversa, dá a resposta final
+            if any(m.get("role") == "tool" for m in mensagens):
+                conteudo = "Resumo das informações encontradas."
+            else:
+                conteudo = None
+                nome = "web_search" if "web_search" in ferramentas else ferramentas[0]
+                chamadas_ferramentas = [{
+                    "id": f"call_soak_{len(mensagens)}",
+                    "type": "function",
+                    "function": {"name": nome, "arguments": json.dumps({"query": "notícias de tecnologia"})},
+                }]
+        elif (corpo.get("response_format") or {}).get("type") == "json_schema":
+            conteudo = json.dumps({"subject": "Reunião confirmada",
+                                   "body": "Olá,\n\nA reunião está confirmada.\n\nAtenciosamente."})
+        elif "use_plan" in sistema:
+            if "Pesquise" in ultima:
+                decisao = {"action": "use_crew", "crew_type": "search", "explanation": "pesquisa"}
+            elif "email" in ultima:
+                decisao = {"action": "use_crew", "crew_type": "email", "explanation": "email"}
+            else:
+                decisao = {"action": "direct_response", "response": "Curiosidade: " + ultima[-60:],
+                           "explanation": "conversa"}
+            conteudo = json.dumps(decisao, ensure_ascii=False)
+        elif "web_search" in " ".join(textos) and not any("Observation" in t for t in textos[1:]):
+            conteudo = ('Thought: Preciso pesquisar.\nAction: web_search\n'
+                        'Action Input: {"query": "notícias de tecnologia"}')
+        else:
+            conteudo = "Thought: Já tenho a resposta.\nFinal Answer: Resumo das informações encontradas."
+
+        mensagem = {"role": "assistant", "content": conteudo}
+        if chamadas_ferramentas:
+            mensagem["tool_calls"] = chamadas_ferramentas
+        entrada = sum(_estimar_tokens(t) for t in textos)
+        saida = _estimar_tokens(conteudo or json.dumps(chamadas_ferramentas))
+        return {
+            "id": "chatcmpl-soak",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": corpo.get("model", "gpt-4o"),
+            "choices": [{"index": 0, "message": mensagem,
+                         "finish_reason": "tool_calls" if chamadas_ferramentas else "stop"}],
+            "usage": {"prompt_tokens": entrada, "completion_tokens": saida, "total_tokens": entrada + saida},
+        }
+
+    @staticmethod
+    def _pesquisa(corpo: dict) -> dict:
+        texto = ""
+        anotacoes = []
+        for i in range(1, 4):
+            url = f"https://exemplo.com/noticia-{i}"
+            paragrafo = f"A notícia {i} sobre {corpo.get('input', '')} traz números e detalhes relevantes"
+            anotacoes.append({"type": "url_citation", "url": url, "title": f"Notícia {i}",
+                              "start_index": len(texto) + len(paragrafo), "end_index": len(texto) + len(paragrafo) + 1})
+            texto += paragrafo + ".\n\n"
+        return {
+            "id": "resp_soak",
+            "object": "response",
+            "created_at": int(time.time()),
+            "model": corpo.get("model", "gpt-4o"),
+            "status": "completed",
+            "output": [{
+                "type": "message", "id": "msg_soak", "role": "assistant", "status": "completed",
+                "content": [{"type": "output_text", "text": texto, "annotations": anotacoes}],
+            }],
+            "usage": {"input_tokens": _estimar_tokens(str(corpo.get("input", ""))),
+                      "output_tokens": _estimar_tokens(texto),
+                      "total_tokens": _estimar_tokens(str(corpo.get("input", ""))) + _estimar_tokens(texto)},
+        }
+
+
+class _SMTPFalso(socketserver.StreamRequestHandler):
+    """
+    Servidor SMTP mínimo que aceita e descarta as mensagens.
+    """
+
+    recebidas = 0
+
+    def _linha(self, texto: str):
+        self.wfile.write(texto.encode("ascii") + b"\r\n")
+
+    def handle(self):
+        self._linha("220 soak ESMTP")
+        em_dados = False
+        while True:
+            linha = self.rfile.readline()
+            if not linha:
+                break
+            if em_dados:
+                if linha.rstrip(b"\r\n") == b".":
+                    em_dados = False
+                    _SMTPFalso.recebidas += 1
+                    self._linha("250 OK")
+                continue
+            comando = linha[:4].upper()
+            if comando == b"EHLO":
+                self._linha("250-soak")
+                self._linha("250 8BITMIME")
+            elif comando == b"DATA":
+                em_dados = True
+                self._linha("354 fim com <CRLF>.<CRLF>")
+            elif comando == b"QUIT":
+                self._linha("221 tchau")
+                break
+            else:
+                self._linha("250 OK")
+
+
+def _iniciar_servidor(servidor) -> str:
+    threading.Thread(target=servidor.serve_forever, name="soak-servidor", daemon=True).start()
+    host, porta = servidor.server_address[:2]
+    return f"{host}:{porta}"
+
+
+def _rss_mb(pid=None):
+    """
+    Memória residente atual do processo (este, por padrão) em MB, ou None se não
+    for possível medir.
+    """
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError, AttributeError):
+        pass
+    if pid is not None:
+        return None
+    try:
+        import resource
+        # Fora do Linux só há o pico de memória (em bytes no macOS)
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return pico / 1024 ** 2 if sys.platform == "darwin" else pico / 1024
+    except ImportError:
+        return None
+
+
+def _rss_workers_mb(pool):
+    """
+    Memória residente somada dos workers do pool de crews, ou None sem pool ou sem medição.
+    """
+    if pool is None:
+        return None
+    medidas = [_rss_mb(pid) for pid in pool.pids()]
+    return sum(medidas) if medidas and None not in medidas else None
+
+
+def _media(valores):
+    return sum(valores) / len(valores) if valores else 0.0
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))] if ordenados else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de longa duração com medição de memória e latência.")
+    parser.add_argument("--turnos", type=int, default=2000, help="Número de turnos a executar")
+    parser.add_argument("--aquecimento", type=int, default=200, help="Turnos executados antes da medição de base")
+    parser.add_argument("--amostra", type=int, default=100, help="Intervalo de turnos entre as amostras")
+    parser.add_argument("--latencia-ms", type=float, default=0.0, help="Latência simulada da OpenAI falsa")
+    parser.add_argument("--frames", type=int, default=1, help="Profundidade da pilha registrada pelo tracemalloc")
+    parser.add_argument("--top", type=int, default=10, help="Quantidade de locais de alocação exibidos")
+    parser.add_argument("--sessao", action="store_true", help="Grava os turnos em uma sessão persistente")
+    parser.add_argument("--workers", type=int, default=2,
+                        help="Processos do pool de crews (0 executa os crews no próprio processo)")
+    parser.add_argument("--max-rss-mb", type=float, default=50.0, help="Crescimento máximo da memória residente")
+    parser.add_argument("--max-rss-workers-mb", type=float, default=100.0,
+                        help="Crescimento máximo da memória residente somada dos workers")
+    parser.add_argument("--max-heap-mb", type=float, default=20.0, help="Crescimento máximo da memória rastreada")
+    parser.add_argument("--max-deriva", type=float, default=0.5,
+                        help="Aumento relativo máximo da latência média (0.5 = 50%%)")
+    parser.add_argument("--max-erros", type=int, default=0, help="Número máximo de turnos com exceção")
+    parser.add_argument("--saida", help="Grava o relatório em JSON neste arquivo")
+    args = parser.parse_args()
+    if args.turnos <= args.aquecimento:
+        parser.error("--turnos precisa ser maior que --aquecimento")
+
+    tracemalloc.start(args.frames)
+
+    openai_falsa = ThreadingHTTPServer(("127.0.0.1", 0), _OpenAIFalsa)
+    _OpenAIFalsa.latencia = args.latencia_ms / 1000.0
+    base_url = f"http://{_iniciar_servidor(openai_falsa)}/v1"
+    smtp_falso = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SMTPFalso)
+    smtp_falso.daemon_threads = True
+    smtp_host, smtp_porta = _iniciar_servidor(smtp_falso).rsplit(":", 1)
+
+    # Diretório de configuração isolado: caixa de saída, uso, sessões e config.json
+    # do teste não se misturam com os do usuário. Precisa vir antes dos imports do aplicativo.
+    home = tempfile.mkdtemp(prefix="assist-soak-")
+    os.environ["HOME"] = os.environ["USERPROFILE"] = home
+    os.environ["OPENAI_API_KEY"] = "sk-soak-teste-local"
+    # Os clientes apontam para uma porta sem servidor: só o transporte governado, que
+    # reescreve a URL para o provedor "soak", alcança a OpenAI falsa. Uma chamada que
+    # escape do transporte (sem governador, uso, failover...) falha e conta como erro.
+    os.environ["OPENAI_BASE_URL"] = os.environ["OPENAI_API_BASE"] = "http://127.0.0.1:9/v1"
+    os.environ["ASSIST_CASSETTE_MODO"] = "desligado"
+    os.makedirs(os.path.join(home, ".assistente_config"))
+    with open(os.path.join(home, ".assistente_config", "config.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "openai_api_key": "sk-soak-teste-local",
+            "verbose_mode": False,
+            "crew_workers": args.workers,
+            "openai_rpm": 1_000_000,
+            "openai_tpm": 1_000_000_000,
+            "orcamento_sessao_usd": 0,
+            "orcamento_crews_usd": {},
+            "provedores": {"soak": {"base_url": base_url}},
+            "papeis_provedores": {"padrao": ["soak"]},
+            "smtp_server": smtp_host,
+            "smtp_port": int(smtp_porta),
+        }, f)
+
+    from rich.console import Console
+    from rich.table import Table
+    from rich import box
+
+    import numpy as np
+    from main import executar_turno, get_tema
+    from crews.pool import get_pool
+    from crews.email import outbox
+    from core.sessions import nova_sessao
+    from core.governor import LOTE, prioridade
+
+    def entregar(recipient: str, subject: str, body: str):
+        # O SMTP falso não tem TLS nem autenticação: envia a mensagem sem STARTTLS
+        msg = MIMEText(body, "plain", "utf-8")
+        msg["Subject"] = subject
+        msg["From"] = "soak@exemplo.com"
+        msg["To"] = recipient
+        with smtplib.SMTP(smtp_host, int(smtp_porta), timeout=10) as server:
+            server.send_message(msg)
+
+    console = Console()
+    cores = get_tema()
+    # Com workers, os crews rodam no pool e as chamadas deles voltam a este processo
+    pool = get_pool()
+    if args.sessao:
+        nova_sessao("soak")
+
+    latencias = []
+    amostras = []
+    erros = []
+    base = None
+    inicio_teste = time.monotonic()
+
+    for turno in range(1, args.turnos + 1):
+        entrada = ENTRADAS[turno % len(ENTRADAS)].format(n=turno)
+        inicio = time.perf_counter()
+        try:
+            # Turnos do teste são trabalho em lote; as etapas dos planos herdam a prioridade
+            with prioridade(LOTE):
+                executar_turno(entrada, cores)
+        except Exception as e:
+            erros.append(f"turno {turno}: {e!r}")
+        latencias.append(time.perf_counter() - inicio)
+
+        if turno == args.aquecimento or (turno > args.aquecimento and turno % args.amostra == 0):
+            outbox.processar_pendentes(entregar=entregar)
+            gc.collect()
+            # O snapshot de base ocupa memória própria: é tirado antes de medir o RSS de base
+            snapshot = tracemalloc.take_snapshot() if turno == args.aquecimento else None
+            # A janela só inclui turnos após o aquecimento (exceto a própria medição de base)
+            janela = latencias[max(turno - args.amostra, 0 if turno == args.aquecimento else args.aquecimento):]
+            amostra = {
+                "turno": turno,
+                "rss_mb": _rss_mb(),
+                "rss_workers_mb": _rss_workers_mb(pool),
+                "heap_mb": tracemalloc.get_traced_memory()[0] / 1024 ** 2,
+                "latencia_media": _media(janela),
+                "latencia_p95": _percentil(janela, 0.95),
+            }
+            if turno == args.aquecimento:
+                base = {**amostra, "snapshot": snapshot}
+            else:
+                amostras.append(amostra)
+                console.print(f"[dim]turno {turno}: RSS {amostra['rss_mb'] or 0:.1f} MB | "
+                              f"heap {amostra['heap_mb']:.1f} MB | "
+                              f"latência média {amostra['latencia_media'] * 1000:.1f} ms[/dim]")
+
+    outbox.processar_pendentes(entregar=entregar)
+    gc.collect()
+    final = tracemalloc.take_snapshot()
+    filtros = [tracemalloc.Filter(False, tracemalloc.__file__),
+               tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")]
+    crescimento = [d for d in final.filter_traces(filtros).compare_to(base["snapshot"].filter_traces(filtros), "lineno")
+                   if d.size_diff > 0][:args.top]
+
+    medidas = latencias[args.aquecimento:]
+    inclinacao = float(np.polyfit(np.arange(len(medidas)), medidas, 1)[0]) if len(medidas) > 1 else 0.0
+    primeira = amostras[0] if amostras else base
+    ultima = amostras[-1] if amostras else base
+    deriva = ultima["latencia_media"] / primeira["latencia_media"] - 1 if primeira["latencia_media"] else 0.0
+    rss_crescimento = (ultima["rss_mb"] - base["rss_mb"]) if base["rss_mb"] is not None else None
+    rss_workers_crescimento = None
+    if base["rss_workers_mb"] is not None and ultima["rss_workers_mb"] is not None:
+        rss_workers_crescimento = ultima["rss_workers_mb"] - base["rss_workers_mb"]
+    heap_crescimento = ultima["heap_mb"] - base["heap_mb"]
+
+    tabela = Table(title="Amostras", box=box.ROUNDED)
+    for coluna in ("Turno", "RSS (MB)", "RSS workers (MB)", "Heap (MB)", "Latência média", "Latência p95"):
+        tabela.add_column(coluna, justify="right")
+    for amostra in [base] + amostras:
+        tabela.add_row(str(amostra["turno"]), f"{amostra['rss_mb']:.1f}" if amostra["rss_mb"] is not None else "-",
+                       f"{amostra['rss_workers_mb']:.1f}" if amostra["rss_workers_mb"] is not None else "-",
+                       f"{amostra['heap_mb']:.1f}", f"{amostra['latencia_media'] * 1000:.1f} ms",
+                       f"{amostra['latencia_p95'] * 1000:.1f} ms")
+    console.print(tabela)
+
+    tabela = Table(title="Locais de alocação que mais cresceram", box=box.ROUNDED)
+    tabela.add_column("Local")
+    tabela.add_column("Crescimento", justify="right")
+    tabela.add_column("Blocos", justify="right")
+    for diferenca in crescimento:
+        quadro = diferenca.traceback[0]
+        tabela.add_row(f"{quadro.filename}:{quadro.lineno}", f"{diferenca.size_diff / 1024:.1f} KB",
+                       f"{diferenca.count_diff:+d}")
+    console.print(tabela)
+
+    turnos_pesquisa = sum(1 for t in range(1, args.turnos + 1) if "Pesquise" in ENTRADAS[t % len(ENTRADAS)])
+    violacoes = []
+    if rss_crescimento is not None and rss_crescimento > args.max_rss_mb:
+        violacoes.append(f"RSS cresceu {rss_crescimento:.1f} MB (limite {args.max_rss_mb:.1f} MB)")
+    if rss_workers_crescimento is not None and rss_workers_crescimento > args.max_rss_workers_mb:
+        violacoes.append(f"RSS dos workers cresceu {rss_workers_crescimento:.1f} MB "
+                         f"(limite {args.max_rss_workers_mb:.1f} MB)")
+    if heap_crescimento > args.max_heap_mb:
+        violacoes.append(f"memória rastreada cresceu {heap_crescimento:.1f} MB (limite {args.max_heap_mb:.1f} MB)")
+    if deriva > args.max_deriva:
+        violacoes.append(f"latência média aumentou {deriva:.0%} (limite {args.max_deriva:.0%})")
+    if turnos_pesquisa and not _OpenAIFalsa.pesquisas:
+        violacoes.append("nenhuma pesquisa na web chegou à OpenAI falsa: a ferramenta do agente não foi executada")
+    if len(erros) > args.max_erros:
+        violacoes.append(f"{len(erros)} turnos com erro (limite {args.max_erros}); primeiro: {erros[0]}")
+
+    console.print(
+        f"{args.turnos} turnos em {time.monotonic() - inicio_teste:.1f}s | "
+        f"RSS {'+%.1f MB' % rss_crescimento if rss_crescimento is not None else '-'} | "
+        f"RSS workers {'%+.1f MB' % rss_workers_crescimento if rss_workers_crescimento is not None else '-'} | "
+        f"heap {heap_crescimento:+.1f} MB | deriva da latência {deriva:+.0%} "
+        f"({inclinacao * 1000 * 1000:+.2f} ms a cada 1000 turnos) | "
+        f"pesquisas na web: {_OpenAIFalsa.pesquisas} | emails recebidos pelo SMTP falso: {_SMTPFalso.recebidas}"
+    )
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump({
+                "turnos": args.turnos,
+                "amostras": [{k: v for k, v in base.items() if k != "snapshot"}] + amostras,
+                "workers": args.workers,
+                "crescimento_rss_mb": rss_crescimento,
+                "crescimento_rss_workers_mb": rss_workers_crescimento,
+                "pesquisas": _OpenAIFalsa.pesquisas,
+                "crescimento_heap_mb": heap_crescimento,
+                "deriva_latencia": deriva,
+                "inclinacao_latencia_s_por_turno": inclinacao,
+                "locais_crescimento": [{"local": f"{d.traceback[0].filename}:{d.traceback[0].lineno}",
+                                        "bytes": d.size_diff, "blocos": d.count_diff} for d in crescimento],
+                "erros": erros,
+                "violacoes": violacoes,
+            }, f, ensure_ascii=False, indent=2)
+
+    openai_falsa.shutdown()
+    smtp_falso.shutdown()
+
+    if violacoes:
+        for violacao in violacoes:
+            console.print(f"[bold red]FALHOU:[/] {violacao}")
+        sys.exit(1)
+    console.print("[bold green]OK:[/] crescimento e deriva dentro dos limites.")
+
+
+if __name__ == "__main__":
+    main()
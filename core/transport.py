@@ -0,0 +1,443 @@
+# Transporte HTTP compartilhado por todos os clientes da OpenAI
+import asyncio
+import email.utils
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, TimeoutError as FuturesTimeout, wait
+from contextvars import copy_context
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from config.settings import CONFIG, OPENAI_BASE_URL
+from core.governor import get_governor, prioridade, prioridade_atual
+from core.latency import LatencyTracker, get_tracker
+from core.providers import caminho_relativo, get_registry
+from core import cassette, profiler, usage
+
+# Respostas que justificam uma nova tentativa
+STATUS_REPETIVEIS = {429, 500, 502, 503, 504}
+MAX_TENTATIVAS = int(CONFIG.get("openai_max_tentativas", 3))
+ESPERA_BASE = 1.0
+ESPERA_MAXIMA = 60.0
+
+_transportes = {}
+_http_clients = {}
+_async_http_clients = {}
+# Threads usadas para disparar a requisição original e a duplicada (hedging)
+_hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+_http_client_lock = threading.Lock()
+# Nos processos do pool de crews, função que leva as requisições ao processo principal
+_encaminhar: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None
+
+# Cabeçalhos que deixam de valer quando o conteúdo da resposta é repassado já decodificado
+_CABECALHOS_DE_CODIFICACAO = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+def _ler_corpo(request: httpx.Request) -> dict:
+    try:
+        return json.loads(request.read() or b"{}")
+    except (ValueError, UnicodeDecodeError):
+        return {}
+
+
+def estimar_tokens(corpo: dict) -> int:
+    """
+    Estimativa grosseira dos tokens de uma chamada (entrada + saída máxima),
+    usada para o limite de tokens por minuto antes de a resposta chegar.
+    """
+    entrada = len(json.dumps(corpo.get("messages") or corpo.get("input") or "", ensure_ascii=False)) // 4
+    saida = corpo.get("max_tokens") or corpo.get("max_completion_tokens") or corpo.get("max_output_tokens") or 512
+    return int(entrada + saida)
+
+
+def tempo_retry_after(headers: httpx.Headers) -> Optional[float]:
+    """
+    Lê os cabeçalhos retry-after-ms / retry-after da resposta, em segundos.
+    """
+    valor = headers.get("retry-after-ms")
+    if valor:
+        try:
+            return float(valor) / 1000.0
+        except ValueError:
+            pass
+
+    valor = headers.get("retry-after")
+    if not valor:
+        return None
+    try:
+        return float(valor)
+    except ValueError:
+        data = email.utils.parsedate_to_datetime(valor)
+        return max(0.0, data.timestamp() - time.time()) if data else None
+
+
+def reescrever_corpo(request: httpx.Request, corpo: dict) -> httpx.Request:
+    """
+    Cria uma cópia da requisição com um novo corpo JSON.
+    """
+    conteudo = json.dumps(corpo).encode("utf-8")
+    headers = httpx.Headers(request.headers)
+    headers["content-length"] = str(len(conteudo))
+    return httpx.Request(request.method, request.url, headers=headers, content=conteudo,
+                         extensions=request.extensions)
+
+
+def registrar_uso(modelo: str, response: httpx.Response):
+    """
+    Registra o uso informado na resposta, se houver.
+    """
+    if response.status_code != 200 or "json" not in response.headers.get("content-type", ""):
+        return
+    try:
+        dados = response.json()
+    except ValueError:
+        return
+    if isinstance(dados, dict) and dados.get("usage"):
+        usage.registrar(dados.get("model") or modelo, dados["usage"])
+
+
+def _ao_terminar_todas(futures, funcao):
+    """
+    Chama funcao uma única vez, quando todos os futures tiverem terminado.
+    """
+    restantes = [len(futures)]
+    lock = threading.Lock()
+
+    def concluido(_):
+        with lock:
+            restantes[0] -= 1
+            ultimo = restantes[0] == 0
+        if ultimo:
+            funcao()
+
+    for future in futures:
+        future.add_done_callback(concluido)
+
+
+class OpenAITransport(httpx.BaseTransport):
+    """
+    Transporte que faz todas as chamadas passarem pelo governador do processo
+    e trata as novas tentativas (429, 5xx e falhas de conexão) respeitando Retry-After.
+    Também aplica os ajustes de orçamento, escolhe o provedor configurado para o
+    papel do cliente (com failover entre provedores) e registra o uso de cada resposta.
+    """
+
+    def __init__(self, papel: str = "padrao", inner: Optional[httpx.BaseTransport] = None, governor=None,
+                 providers=None, max_tentativas: int = MAX_TENTATIVAS, base_cliente: str = OPENAI_BASE_URL):
+        self.papel = papel
+        # URL base configurada nos clientes: o que vem depois dela é o caminho da API
+        self.base_cliente = httpx.URL(base_cliente)
+        self.inner = inner or httpx.HTTPTransport()
+        self.governor = governor or get_governor()
+        self.providers = providers or get_registry()
+        self.max_tentativas = max_tentativas
+
+    def _enviar(self, request: httpx.Request) -> Tuple[httpx.Response, bytes]:
+        """
+        Envia a requisição e lê a resposta inteira, para que a vaga no governador
+        seja ocupada apenas enquanto a chamada estiver de fato em andamento.
+        """
+        response = self.inner.handle_request(request)
+        try:
+            conteudo = b"".join(response.iter_raw())
+        finally:
+            response.close()
+        return response, conteudo
+
+    def _enviar_com_hedge(self, provedor, request: httpx.Request, corpo: dict, modelo: str,
+                          latencias: LatencyTracker) -> Tuple[httpx.Response, bytes]:
+        """
+        Envia a requisição com o timeout adaptativo do papel, modelo e endpoint.
+        Em papéis idempotentes, se a resposta não chegar até o p95 observado,
+        dispara uma cópia e fica com a primeira resposta; a outra é descartada (o
+        httpx síncrono não interrompe uma chamada em andamento, mas ela é limitada
+        pelo mesmo timeout). A cópia só é disparada se o governador tiver uma vaga
+        livre para ela, que fica ocupada até as duas chamadas terminarem.
+        """
+        timeout = latencias.timeout()
+
+        def preparar() -> httpx.Request:
+            preparada = provedor.preparar(request, corpo, self.base_cliente)
+            preparada.extensions = {
+                **preparada.extensions,
+                "timeout": {"connect": min(10.0, timeout), "read": timeout, "write": timeout, "pool": timeout},
+            }
+            return preparada
+
+        atraso = latencias.atraso_hedge()
+        if atraso is None:
+            return self._enviar(preparar())
+
+        primeira = _hedge_executor.submit(self._enviar, preparar())
+        try:
+            return primeira.result(timeout=atraso)
+        except FuturesTimeout:
+            pass
+
+        if not self.governor.tentar_vaga(modelo, estimar_tokens(corpo)):
+            # Sem vaga para a cópia (concorrência, taxa ou Retry-After): aguarda a original
+            return primeira.result()
+        segunda = _hedge_executor.submit(self._enviar, preparar())
+        _ao_terminar_todas([primeira, segunda], lambda: self.governor.liberar_vaga(modelo))
+        concluidas, _ = wait([primeira, segunda], return_when=FIRST_COMPLETED)
+        vencedora = primeira if primeira in concluidas else segunda
+        if vencedora.exception() is not None:
+            # A primeira a terminar falhou: a resposta passa a depender da outra
+            vencedora = segunda if vencedora is primeira else primeira
+        descartada = segunda if vencedora is primeira else primeira
+
+        latencias.registrar_hedge(venceu=vencedora is segunda)
+        descartada.cancel()
+        # A chamada descartada também é cobrada: registra o uso quando ela terminar
+        contexto = copy_context()
+        descartada.add_done_callback(lambda f: contexto.run(self._registrar_descartada, modelo, f))
+        return vencedora.result()
+
+    def _registrar_descartada(self, modelo: str, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        response, conteudo = future.result()
+        try:
+            descartada = httpx.Response(response.status_code, headers=response.headers,
+                                        stream=httpx.ByteStream(conteudo))
+            descartada.read()
+            registrar_uso(modelo, descartada)
+        except (sqlite3.Error, httpx.DecodingError):
+            pass
+
+    def _enviar_com_tentativas(self, request: httpx.Request, corpo: dict, modelo: str,
+                               latencias: LatencyTracker) -> Tuple[httpx.Response, bytes]:
+        """
+        Envia a requisição ao primeiro provedor do papel. Falhas de conexão e
+        respostas 5xx passam imediatamente ao próximo provedor; 429 aguarda o
+        Retry-After. Com um único provedor, as novas tentativas usam espera exponencial.
+        """
+        candidatos = self.providers.candidatos(self.papel)
+        max_tentativas = max(self.max_tentativas, len(candidatos))
+        indice = 0
+        tentativa = 0
+        while True:
+            tentativa += 1
+            provedor = candidatos[indice % len(candidatos)]
+            inicio = time.monotonic()
+            try:
+                response, conteudo = self._enviar_com_hedge(provedor, request, corpo, modelo, latencias)
+            except httpx.TransportError as e:
+                if isinstance(e, httpx.TimeoutException):
+                    latencias.registrar_timeout(time.monotonic() - inicio)
+                provedor.registrar_falha()
+                if tentativa >= max_tentativas:
+                    raise
+                self.governor.registrar_nova_tentativa()
+                if len(candidatos) > 1:
+                    indice += 1
+                else:
+                    time.sleep(min(ESPERA_BASE * 2 ** (tentativa - 1), ESPERA_MAXIMA))
+                continue
+
+            if response.status_code >= 500:
+                provedor.registrar_falha()
+            else:
+                duracao = time.monotonic() - inicio
+                provedor.registrar_sucesso(duracao)
+                latencias.registrar(duracao)
+
+            if response.status_code not in STATUS_REPETIVEIS or tentativa >= max_tentativas:
+                return response, conteudo
+
+            self.governor.registrar_nova_tentativa()
+            if response.status_code >= 500 and len(candidatos) > 1:
+                indice += 1
+                continue
+
+            espera = tempo_retry_after(response.headers)
+            if espera is None:
+                espera = ESPERA_BASE * 2 ** (tentativa - 1)
+            espera = min(espera, ESPERA_MAXIMA)
+            if response.status_code == 429:
+                self.governor.penalizar(modelo, espera)
+                self.governor.aguardar_liberacao(modelo)
+            else:
+                time.sleep(espera)
+
+    def _enviar_gravado(self, request: httpx.Request, corpo: dict, modelo: str,
+                        latencias: LatencyTracker) -> Tuple[httpx.Response, bytes]:
+        """
+        Com um cassete ativo, responde a partir da gravação, sem acesso à rede, ou
+        grava a resposta final. A gravação fica acima das novas tentativas e do
+        hedging: cada requisição do cliente gera um único registro.
+        """
+        if cassette.reproduzindo():
+            return cassette.resposta_gravada(request)
+
+        inicio = time.monotonic()
+        response, conteudo = self._enviar_com_tentativas(request, corpo, modelo, latencias)
+        if cassette.gravando():
+            cassette.gravar_http(request, response, conteudo, time.monotonic() - inicio)
+        return response, conteudo
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        corpo = _ler_corpo(request)
+        if corpo and usage.ajustar_requisicao(corpo):
+            request = reescrever_corpo(request, corpo)
+        modelo = corpo.get("model") or "desconhecido"
+        # Latências separadas por modelo e endpoint: um papel pode misturar chamadas
+        # de perfis bem diferentes (ex.: /responses com web_search e /chat/completions)
+        latencias = get_tracker(self.papel, modelo, caminho_relativo(request.url, self.base_cliente))
+
+        with self.governor.vaga(modelo, estimar_tokens(corpo)):
+            response, conteudo = self._enviar_gravado(request, corpo, modelo, latencias)
+
+        final = httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=httpx.ByteStream(conteudo),
+            extensions=response.extensions,
+            request=request,
+        )
+        final.read()
+        try:
+            registrar_uso(modelo, final)
+            if corpo:
+                profiler.registrar(self.papel, modelo, corpo)
+        except sqlite3.Error:
+            # Falha na contabilidade não deve derrubar a chamada
+            pass
+        return final
+
+    def close(self):
+        self.inner.close()
+
+
+class TransporteEncaminhado(httpx.BaseTransport):
+    """
+    Transporte dos processos do pool de crews: em vez de chamar a OpenAI, envia a
+    requisição ao processo principal (ver executar_encaminhada). Assim governador,
+    provedores, latências, hedging, uso e cassete são únicos para todo o aplicativo,
+    e os limites configurados não se multiplicam pelo número de workers.
+    """
+
+    def __init__(self, papel: str, encaminhar: Callable[[Dict[str, Any]], Dict[str, Any]]):
+        self.papel = papel
+        self.encaminhar = encaminhar
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        resposta = self.encaminhar({
+            "papel": self.papel,
+            "metodo": request.method,
+            "url": str(request.url),
+            "headers": request.headers.multi_items(),
+            "conteudo": request.read(),
+            # O processo principal faz a chamada no contexto do turno, do crew e da prioridade
+            "contexto": usage.contexto_atual(),
+            "componentes": profiler.componentes_atuais(),
+            "prioridade": prioridade_atual(),
+        })
+        if "erro" in resposta:
+            tipo, mensagem = resposta["erro"]
+            if tipo == "timeout":
+                raise httpx.ReadTimeout(mensagem, request=request)
+            if tipo == "conexao":
+                raise httpx.ConnectError(mensagem, request=request)
+            raise RuntimeError(mensagem)
+        return httpx.Response(resposta["status"], headers=resposta["headers"],
+                              stream=httpx.ByteStream(resposta["conteudo"]), request=request)
+
+
+def executar_encaminhada(dados: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Executa no processo principal uma requisição encaminhada por um worker do pool.
+
+    Returns:
+        {"status", "headers", "conteudo"} com o conteúdo já decodificado, ou
+        {"erro": (tipo, mensagem)} com tipo "timeout", "conexao" ou "erro"
+    """
+    request = httpx.Request(dados["metodo"], dados["url"], headers=dados["headers"], content=dados["conteudo"])
+    try:
+        with usage.contexto_uso(**dados["contexto"]), profiler.componentes_prompt(**dados["componentes"]), \
+                prioridade(dados["prioridade"]):
+            response = get_transport(dados["papel"]).handle_request(request)
+    except httpx.TimeoutException as e:
+        return {"erro": ("timeout", str(e))}
+    except httpx.TransportError as e:
+        return {"erro": ("conexao", str(e))}
+    except Exception as e:
+        return {"erro": ("erro", f"{type(e).__name__}: {e}")}
+
+    headers = [(nome, valor) for nome, valor in response.headers.multi_items()
+               if nome.lower() not in _CABECALHOS_DE_CODIFICACAO]
+    return {"status": response.status_code, "headers": headers, "conteudo": response.content}
+
+
+def definir_encaminhamento(encaminhar: Callable[[Dict[str, Any]], Dict[str, Any]]):
+    """
+    Faz os clientes criados a partir de agora encaminharem as chamadas por
+    encaminhar. Usado pelos workers do pool antes de importar os crews.
+    """
+    global _encaminhar
+    _encaminhar = encaminhar
+
+
+class AsyncOpenAITransport(httpx.AsyncBaseTransport):
+    """
+    Versão assíncrona do transporte governado, para clientes AsyncOpenAI. A
+    chamada roda numa thread pelo transporte síncrono do papel, de modo que
+    governador, provedores, latências e uso são os mesmos dos clientes síncronos.
+    """
+
+    def __init__(self, transporte: httpx.BaseTransport):
+        self.transporte = transporte
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        conteudo = await request.aread()
+        sincrona = httpx.Request(request.method, request.url, headers=request.headers, content=conteudo,
+                                 extensions=request.extensions)
+        # asyncio.to_thread copia o contexto (turno, sessão, prioridade) para a thread
+        response = await asyncio.to_thread(self.transporte.handle_request, sincrona)
+        response.request = request
+        return response
+
+
+def get_transport(papel: str = "padrao") -> httpx.BaseTransport:
+    """
+    Retorna o transporte governado do papel, compartilhado pelos clientes síncrono e
+    assíncrono. Nos workers do pool, o transporte encaminha as chamadas ao processo principal.
+    """
+    with _http_client_lock:
+        if papel not in _transportes:
+            if _encaminhar is not None:
+                _transportes[papel] = TransporteEncaminhado(papel, _encaminhar)
+            else:
+                _transportes[papel] = OpenAITransport(papel)
+        return _transportes[papel]
+
+
+def get_http_client(papel: str = "padrao") -> httpx.Client:
+    """
+    Retorna o cliente HTTP do papel (router, email, search...), que usa o transporte governado.
+    """
+    transporte = get_transport(papel)
+    with _http_client_lock:
+        if papel not in _http_clients:
+            _http_clients[papel] = httpx.Client(
+                transport=transporte,
+                timeout=httpx.Timeout(600.0, connect=10.0),
+            )
+        return _http_clients[papel]
+
+
+def get_async_http_client(papel: str = "padrao") -> httpx.AsyncClient:
+    """
+    Retorna o cliente HTTP assíncrono do papel, que usa o mesmo transporte governado.
+    """
+    transporte = get_transport(papel)
+    with _http_client_lock:
+        if papel not in _async_http_clients:
+            _async_http_clients[papel] = httpx.AsyncClient(
+                transport=AsyncOpenAITransport(transporte),
+                timeout=httpx.Timeout(600.0, connect=10.0),
+            )
+        return _async_http_clients[papel]
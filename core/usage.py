@@ -0,0 +1,203 @@
+# Contabilidade de uso (tokens e custo) e aplicação de orçamentos
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config.settings import CONFIG, USER_CONFIG_DIR
+
+USO_DB = os.path.join(USER_CONFIG_DIR, 'uso.db')
+
+# Preços em dólares por milhão de tokens (entrada, saída)
+PRECOS_PADRAO = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-3.5-turbo": (0.50, 1.50),
+}
+PRECOS = {**PRECOS_PADRAO, **{m: tuple(p) for m, p in CONFIG.get("precos_modelos", {}).items()}}
+
+# Orçamentos por sessão e por tipo de crew (em dólares)
+ORCAMENTO_SESSAO = float(CONFIG.get("orcamento_sessao_usd", 1.0))
+ORCAMENTO_CREWS = CONFIG.get("orcamento_crews_usd", {})
+# Fração do orçamento a partir da qual as chamadas passam a usar modelos mais baratos
+LIMIAR_ECONOMIA = float(CONFIG.get("orcamento_limiar_economia", 0.8))
+MODELOS_ECONOMICOS = CONFIG.get("modelos_economicos", {"gpt-4o": "gpt-4o-mini", "gpt-3.5-turbo": "gpt-4o-mini"})
+MAX_TOKENS_ECONOMIA = int(CONFIG.get("orcamento_max_tokens_economia", 512))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chamadas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    criado_em REAL NOT NULL,
+    sessao TEXT NOT NULL,
+    turno TEXT,
+    crew TEXT,
+    modelo TEXT NOT NULL,
+    tokens_entrada INTEGER NOT NULL,
+    tokens_saida INTEGER NOT NULL,
+    custo REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chamadas_sessao ON chamadas (sessao, crew);
+"""
+
+_contexto: ContextVar[Dict[str, Optional[str]]] = ContextVar(
+    "contexto_uso",
+    default={"sessao": datetime.now().strftime("%Y%m%d-%H%M%S"), "turno": None, "crew": None},
+)
+
+
+class OrcamentoExcedidoError(ValueError):
+    """
+    Lançada quando um crew é recusado porque o orçamento foi atingido.
+    """
+
+
+@contextmanager
+def _conectar():
+    conn = sqlite3.connect(USO_DB, timeout=10)
+    conn.row_factory = sqlite3.Row
+    try:
+        with conn:
+            conn.executescript(_SCHEMA)
+            yield conn
+    finally:
+        conn.close()
+
+
+@contextmanager
+def contexto_uso(**campos):
+    """
+    Associa as chamadas feitas dentro do bloco a uma sessão, turno e/ou crew.
+    """
+    token = _contexto.set({**_contexto.get(), **campos})
+    try:
+        yield
+    finally:
+        _contexto.reset(token)
+
+
+def contexto_atual() -> Dict[str, Optional[str]]:
+    return dict(_contexto.get())
+
+
+def novo_turno() -> str:
+    return datetime.now().strftime("%H%M%S%f")
+
+
+def calcular_custo(modelo: str, tokens_entrada: int, tokens_saida: int) -> float:
+    """
+    Custo estimado da chamada. Modelos fora da tabela usam o preço do prefixo
+    conhecido mais próximo (ex.: "gpt-4o-2024-08-06" usa "gpt-4o").
+    """
+    preco = PRECOS.get(modelo)
+    if preco is None:
+        candidatos = [m for m in PRECOS if modelo.startswith(m)]
+        preco = PRECOS[max(candidatos, key=len)] if candidatos else (0.0, 0.0)
+    return (tokens_entrada * preco[0] + tokens_saida * preco[1]) / 1_000_000
+
+
+def registrar(modelo: str, usage: Dict):
+    """
+    Registra o uso retornado por uma chamada (Chat Completions ou Responses API).
+    """
+    tokens_entrada = int(usage.get("prompt_tokens", usage.get("input_tokens", 0)) or 0)
+    tokens_saida = int(usage.get("completion_tokens", usage.get("output_tokens", 0)) or 0)
+    contexto = _contexto.get()
+
+    with _conectar() as conn:
+        conn.execute(
+            "INSERT INTO chamadas (criado_em, sessao, turno, crew, modelo, tokens_entrada, tokens_saida, custo) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (time.time(), contexto["sessao"], contexto["turno"], contexto["crew"], modelo,
+             tokens_entrada, tokens_saida, calcular_custo(modelo, tokens_entrada, tokens_saida))
+        )
+
+
+def gasto(sessao: Optional[str] = None, crew: Optional[str] = None) -> float:
+    """
+    Total gasto na sessão (a atual, por padrão), opcionalmente restrito a um crew.
+    """
+    sessao = sessao or _contexto.get()["sessao"]
+    consulta = "SELECT COALESCE(SUM(custo), 0) FROM chamadas WHERE sessao = ?"
+    parametros = [sessao]
+    if crew:
+        consulta += " AND crew = ?"
+        parametros.append(crew)
+    with _conectar() as conn:
+        return conn.execute(consulta, parametros).fetchone()[0]
+
+
+def _fracao_orcamento() -> float:
+    """
+    Maior fração já consumida entre o orçamento da sessão e o do crew atual.
+    """
+    fracoes = []
+    if ORCAMENTO_SESSAO > 0:
+        fracoes.append(gasto() / ORCAMENTO_SESSAO)
+    crew = _contexto.get()["crew"]
+    if crew and ORCAMENTO_CREWS.get(crew):
+        fracoes.append(gasto(crew=crew) / float(ORCAMENTO_CREWS[crew]))
+    return max(fracoes, default=0.0)
+
+
+def verificar_crew(crew_type: str):
+    """
+    Recusa a execução do crew se o orçamento da sessão ou do próprio crew já foi atingido.
+    """
+    if ORCAMENTO_SESSAO > 0 and gasto() >= ORCAMENTO_SESSAO:
+        raise OrcamentoExcedidoError(
+            f"Orçamento da sessão (US$ {ORCAMENTO_SESSAO:.2f}) atingido; o crew '{crew_type}' não será executado."
+        )
+    limite = ORCAMENTO_CREWS.get(crew_type)
+    if limite and gasto(crew=crew_type) >= float(limite):
+        raise OrcamentoExcedidoError(
+            f"Orçamento do crew '{crew_type}' (US$ {float(limite):.2f}) atingido nesta sessão."
+        )
+
+
+def ajustar_requisicao(corpo: Dict) -> bool:
+    """
+    Quando o orçamento está perto do limite, troca o modelo por um mais barato e
+    reduz o máximo de tokens de saída. Altera o corpo no lugar.
+
+    Returns:
+        True se o corpo da requisição foi alterado
+    """
+    if _fracao_orcamento() < LIMIAR_ECONOMIA:
+        return False
+
+    modelo = corpo.get("model")
+    if modelo in MODELOS_ECONOMICOS:
+        corpo["model"] = MODELOS_ECONOMICOS[modelo]
+
+    campos = [c for c in ("max_tokens", "max_completion_tokens", "max_output_tokens") if c in corpo]
+    if not campos:
+        campos = ["max_output_tokens" if "input" in corpo else "max_tokens"]
+    for campo in campos:
+        corpo[campo] = min(int(corpo.get(campo) or MAX_TOKENS_ECONOMIA), MAX_TOKENS_ECONOMIA)
+    return True
+
+
+def relatorio(sessao: Optional[str] = None) -> Dict[str, List[Dict]]:
+    """
+    Agrega o uso por crew na sessão, e o total da sessão, do dia e geral.
+    """
+    sessao = sessao or _contexto.get()["sessao"]
+    inicio_dia = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    totais = "COUNT(*) AS chamadas, COALESCE(SUM(tokens_entrada), 0) AS tokens_entrada, " \
+             "COALESCE(SUM(tokens_saida), 0) AS tokens_saida, COALESCE(SUM(custo), 0) AS custo"
+
+    with _conectar() as conn:
+        por_crew = conn.execute(
+            f"SELECT COALESCE(crew, 'router') AS crew, {totais} FROM chamadas WHERE sessao = ? GROUP BY crew ORDER BY custo DESC",
+            (sessao,)
+        ).fetchall()
+        resumo = [
+            {"periodo": "Sessão", **dict(conn.execute(f"SELECT {totais} FROM chamadas WHERE sessao = ?", (sessao,)).fetchone())},
+            {"periodo": "Hoje", **dict(conn.execute(f"SELECT {totais} FROM chamadas WHERE criado_em >= ?", (inicio_dia,)).fetchone())},
+            {"periodo": "Total", **dict(conn.execute(f"SELECT {totais} FROM chamadas").fetchone())},
+        ]
+
+    return {"por_crew": [dict(linha) for linha in por_crew], "resumo": resumo}
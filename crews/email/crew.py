@@ -1,19 +1,15 @@
 from crewai import Agent, Task, Crew, Process
-from config.llms import get_gpt35, get_gpt40
+from config.llms import get_gpt35, get_gpt40, get_openai_client
 from crewai.tools import tool
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import os
+import json
 import re
-from config.settings import CONFIG, VERBOSE_MODE
-from typing import Optional
-
-# Obtenha as credenciais do email das configurações ou variáveis de ambiente
-EMAIL_SENDER = CONFIG.get("email_sender", os.getenv("EMAIL_SENDER", ""))
-EMAIL_PASSWORD = CONFIG.get("email_password", os.getenv("EMAIL_PASSWORD", ""))
-SMTP_SERVER = CONFIG.get("smtp_server", os.getenv("SMTP_SERVER", "smtp.gmail.com"))
-SMTP_PORT = int(CONFIG.get("smtp_port", os.getenv("SMTP_PORT", "587")))
+from config.settings import VERBOSE_MODE
+from crews.email.outbox import enfileirar
+from crews.events import instrumentar_ferramentas
+from crews.planner import instrucao_da_etapa
+from core.prompts import prompt, versao
+from core.profiler import componentes_prompt
+from typing import List, Optional
 
 # Funções para ferramentas
 def is_valid_email(email: str) -> bool:
@@ -23,32 +19,58 @@ def is_valid_email(email: str) -> bool:
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
     return bool(re.match(pattern, email))
 
+_ADDRESS_CANDIDATE = re.compile(r'[^\s<>(),;:"\']+@[^\s<>(),;:"\']+')
+# "para"/"pra"/"to" imediatamente antes do endereço (ex.: "para: <a@b.com>")
+_RECIPIENT_POSITION = re.compile(r'\b(?:para|pra|to)\s*:?\s*<?$', re.IGNORECASE)
+
+def _find_addresses(text: str) -> List[re.Match]:
+    return [m for m in _ADDRESS_CANDIDATE.finditer(text or "") if is_valid_email(m.group().rstrip('.!?'))]
+
+def extract_recipients(text: str) -> List[str]:
+    """
+    Extrai os endereços de email presentes no texto, na ordem em que aparecem e sem repetições.
+    Cada candidato é confirmado com is_valid_email.
+    """
+    recipients = []
+    for match in _find_addresses(text):
+        candidate = match.group().rstrip('.!?')
+        if candidate.lower() not in (r.lower() for r in recipients):
+            recipients.append(candidate)
+    return recipients
+
+def extract_single_recipient(text: str) -> Optional[str]:
+    """
+    Retorna o destinatário quando o texto contém exatamente um endereço e ele
+    aparece logo após "para"/"pra"/"to". Em qualquer outro caso (nenhum endereço,
+    vários endereços ou um endereço citado em outra posição) retorna None.
+    """
+    if len(extract_recipients(text)) != 1:
+        return None
+    match = _find_addresses(text)[0]
+    if not _RECIPIENT_POSITION.search(text[:match.start()]):
+        return None
+    return match.group().rstrip('.!?')
+
+def _deliver_email(recipient: str, subject: str, body: str) -> str:
+    """
+    Coloca a mensagem na caixa de saída; a entrega é feita pelo worker em segundo plano.
+    Uma mensagem idêntica enfileirada há pouco tempo não é enviada novamente.
+    """
+    try:
+        message_id, nova = enfileirar(recipient, subject, body)
+    except Exception as e:
+        return f"Falha ao enfileirar email: {str(e)}"
+
+    if not nova:
+        return f"Este email para {recipient} já está na caixa de saída (id {message_id}); nenhum novo envio foi feito."
+    return f"Email para {recipient} enfileirado para envio (id {message_id})."
+
 @tool('send_email')
 def send_email(recipient: str, subject: str, body: str) -> str:
     """
     Envia um email para o destinatário especificado com o assunto e corpo fornecidos.
     """
-    try:
-        # Criando mensagem MIME
-        msg = MIMEMultipart()
-        msg['Subject'] = subject
-        msg['From'] = f"Agents <agents@andersonc.dev.br>"
-        msg['To'] = recipient
-
-        # Anexando o corpo do texto
-        texto = MIMEText(body, 'plain', 'utf-8')
-        msg.attach(texto)
-
-        # Configuração do servidor SMTP
-        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-        server.starttls()
-        server.login(EMAIL_SENDER, EMAIL_PASSWORD)        # Envio do email
-        server.send_message(msg)
-        server.quit()
-
-        return f"Email enviado com sucesso para {recipient}."
-    except Exception as e:
-        return f"Falha ao enviar email: {str(e)}"
+    return _deliver_email(recipient, subject, body)
 
 @tool('compose_email')
 def compose_email(recipient: str, subject: str, body: str) -> str:
@@ -70,6 +92,59 @@ def validate_email(email: str) -> bool:
     """
     return is_valid_email(email)
 
+# Schema da resposta estruturada usada pelo caminho rápido
+EMAIL_DRAFT_SCHEMA = {
+    "name": "email_draft",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "subject": {"type": "string"},
+            "body": {"type": "string"},
+        },
+        "required": ["subject", "body"],
+        "additionalProperties": False,
+    },
+}
+
+def run_email_fast_path(user_input: str) -> Optional[str]:
+    """
+    Caminho rápido para solicitações simples ("mande um email para x@y dizendo z").
+    O destinatário é extraído só da instrução (nunca dos resultados de etapas
+    anteriores de um plano), o email é redigido em uma única chamada com saída
+    estruturada e enviado diretamente, sem o loop do agente.
+
+    Returns:
+        A confirmação do envio, ou None se a solicitação for ambígua e
+        precisar do crew completo.
+    """
+    recipient = extract_single_recipient(instrucao_da_etapa(user_input))
+    if recipient is None:
+        return None
+
+    try:
+        with componentes_prompt({}, versao("email")):
+            response = get_openai_client(papel="email").chat.completions.create(
+                model="gpt-4o",
+                messages=[
+                    {"role": "system", "content": prompt("email", "rascunho")},
+                    {"role": "user", "content": user_input},
+                ],
+                response_format={"type": "json_schema", "json_schema": EMAIL_DRAFT_SCHEMA},
+                temperature=0.2,
+            )
+        draft = json.loads(response.choices[0].message.content)
+    except Exception:
+        # Qualquer falha na redação devolve a solicitação para o crew completo
+        return None
+
+    subject = (draft.get("subject") or "").strip()
+    body = (draft.get("body") or "").strip()
+    if not subject or not body:
+        return None
+
+    return _deliver_email(recipient, subject, body)
+
 # Função para obter o crew de email
 def get_email_crew(user_input=None):
     """
@@ -79,25 +154,25 @@ def get_email_crew(user_input=None):
     """
     # Criar uma nova instância do agente de email
     email_agent = Agent(
-        role="Agente de Email",
-        goal=f"Compor e enviar emails profissionais baseados na solicitação do usuário: {user_input}",
-        backstory="Você é um especialista em comunicação escrita, com vasta experiência em redação de emails formais e informais. Sua função é entender a solicitação do usuário e criar emails bem estruturados, claros e adequados ao contexto.",
-        tools=[send_email, compose_email, validate_email],
+        role=prompt("email", "role"),
+        goal=prompt("email", "goal", entrada=user_input),
+        backstory=prompt("email", "backstory"),
+        tools=instrumentar_ferramentas([send_email, compose_email, validate_email]),
         allow_delegation=False,
-        llm=get_gpt40(),
+        llm=get_gpt40(papel="email"),
         verbose=VERBOSE_MODE
     )
     
     # Criar novas instâncias das tarefas
     compose_task = Task(
-        description=f"Compor um email baseado na solicitação do usuário: {user_input}. Identifique o destinatário, o assunto e o corpo da mensagem a partir da solicitação.",
-        expected_output="Um email bem estruturado, com destinatário, assunto e corpo claros e adequados ao contexto da solicitação.",
+        description=prompt("email", "tarefa_compor", entrada=user_input),
+        expected_output=prompt("email", "resultado_compor"),
         agent=email_agent
     )
     
     send_task = Task(
-        description="Enviar o email composto para o destinatário especificado.",
-        expected_output="Confirmação de que o email foi enviado com sucesso.",
+        description=prompt("email", "tarefa_enviar"),
+        expected_output=prompt("email", "resultado_enviar"),
         agent=email_agent
     )
     
@@ -0,0 +1,284 @@
+# Caixa de saída persistente para os emails enviados pelos crews
+import hashlib
+import os
+import smtplib
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import CONFIG, USER_CONFIG_DIR
+from core import cassette
+
+# Obtenha as credenciais do email das configurações ou variáveis de ambiente
+EMAIL_SENDER = CONFIG.get("email_sender", os.getenv("EMAIL_SENDER", ""))
+EMAIL_PASSWORD = CONFIG.get("email_password", os.getenv("EMAIL_PASSWORD", ""))
+SMTP_SERVER = CONFIG.get("smtp_server", os.getenv("SMTP_SERVER", "smtp.gmail.com"))
+SMTP_PORT = int(CONFIG.get("smtp_port", os.getenv("SMTP_PORT", "587")))
+
+# Parâmetros de entrega
+OUTBOX_DB = os.path.join(USER_CONFIG_DIR, 'outbox.db')
+MAX_TENTATIVAS = int(CONFIG.get("outbox_max_tentativas", 6))
+INTERVALO_BASE = float(CONFIG.get("outbox_intervalo_base", 5))
+INTERVALO_MAXIMO = 3600.0
+JANELA_IDEMPOTENCIA = float(CONFIG.get("outbox_janela_idempotencia", 600))
+# Tempo máximo de posse de uma mensagem em entrega; depois disso ela volta para a fila
+PRAZO_POSSE = float(CONFIG.get("outbox_prazo_posse", 120))
+INTERVALO_VERIFICACAO = 2.0
+
+# Estados possíveis de uma mensagem na caixa de saída
+PENDENTE = "pendente"
+ENVIANDO = "enviando"
+ENVIADO = "enviado"
+DESCARTADO = "descartado"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mensagens (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chave TEXT NOT NULL,
+    destinatario TEXT NOT NULL,
+    assunto TEXT NOT NULL,
+    corpo TEXT NOT NULL,
+    status TEXT NOT NULL,
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    proxima_tentativa REAL NOT NULL,
+    ultimo_erro TEXT,
+    criado_em REAL NOT NULL,
+    enviado_em REAL
+);
+CREATE INDEX IF NOT EXISTS idx_mensagens_chave ON mensagens (chave);
+CREATE INDEX IF NOT EXISTS idx_mensagens_fila ON mensagens (status, proxima_tentativa);
+"""
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+@contextmanager
+def _conectar():
+    """
+    Abre uma conexão com o banco da caixa de saída, criando as tabelas se necessário.
+    A transação é confirmada e a conexão fechada ao sair do bloco.
+    """
+    conn = sqlite3.connect(OUTBOX_DB, timeout=10)
+    conn.row_factory = sqlite3.Row
+    try:
+        with conn:
+            conn.executescript(_SCHEMA)
+            yield conn
+    finally:
+        conn.close()
+
+
+def chave_idempotencia(recipient: str, subject: str, body: str) -> str:
+    """
+    Calcula a chave que identifica uma mensagem, usada para evitar envios duplicados.
+    """
+    conteudo = "\x1f".join([recipient.strip().lower(), subject.strip(), body.strip()])
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+
+def enfileirar(recipient: str, subject: str, body: str, chave: Optional[str] = None) -> Tuple[int, bool]:
+    """
+    Grava a mensagem na caixa de saída para ser entregue pelo worker.
+
+    Se uma mensagem com a mesma chave foi enfileirada dentro da janela de
+    idempotência, nenhuma nova mensagem é criada. A verificação e a inserção
+    acontecem numa transação com trava de escrita, para que dois processos
+    enfileirando a mesma mensagem ao mesmo tempo não criem duas entradas.
+
+    Returns:
+        Uma tupla (id da mensagem, True se a mensagem foi criada agora)
+    """
+    chave = chave or chave_idempotencia(recipient, subject, body)
+    agora = time.time()
+
+    with _conectar() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        existente = conn.execute(
+            "SELECT id FROM mensagens WHERE chave = ? AND criado_em >= ? AND status != ? ORDER BY id DESC LIMIT 1",
+            (chave, agora - JANELA_IDEMPOTENCIA, DESCARTADO)
+        ).fetchone()
+        if existente:
+            return existente["id"], False
+
+        cursor = conn.execute(
+            "INSERT INTO mensagens (chave, destinatario, assunto, corpo, status, proxima_tentativa, criado_em) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (chave, recipient, subject, body, PENDENTE, agora, agora)
+        )
+        message_id = cursor.lastrowid
+
+    if _worker is not None:
+        _worker.notificar()
+
+    return message_id, True
+
+
+def enviar_smtp(recipient: str, subject: str, body: str):
+    """
+    Envia a mensagem pelo servidor SMTP configurado. Lança exceção em caso de falha.
+    Com um cassete ativo, o envio é gravado ou simulado (ver core.cassette).
+    """
+    cassette.enviar_smtp(_enviar_smtp, recipient, subject, body)
+
+
+def _enviar_smtp(recipient: str, subject: str, body: str):
+    # Criando mensagem MIME
+    msg = MIMEMultipart()
+    msg['Subject'] = subject
+    msg['From'] = f"Agents <agents@andersonc.dev.br>"
+    msg['To'] = recipient
+
+    # Anexando o corpo do texto
+    texto = MIMEText(body, 'plain', 'utf-8')
+    msg.attach(texto)
+
+    # Configuração do servidor SMTP
+    with smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=30) as server:
+        server.starttls()
+        server.login(EMAIL_SENDER, EMAIL_PASSWORD)
+        server.send_message(msg)
+
+
+def calcular_espera(tentativas: int) -> float:
+    """
+    Intervalo até a próxima tentativa, com crescimento exponencial.
+    """
+    return min(INTERVALO_BASE * (2 ** max(tentativas - 1, 0)), INTERVALO_MAXIMO)
+
+
+def _reservar(message_id: int) -> bool:
+    """
+    Toma posse de uma mensagem pendente antes da entrega. Só um processo consegue
+    mudar o estado para "enviando"; a posse vale até proxima_tentativa.
+
+    Returns:
+        True se a mensagem foi reservada por este processo
+    """
+    agora = time.time()
+    with _conectar() as conn:
+        cursor = conn.execute(
+            "UPDATE mensagens SET status = ?, proxima_tentativa = ? WHERE id = ? AND status = ? AND proxima_tentativa <= ?",
+            (ENVIANDO, agora + PRAZO_POSSE, message_id, PENDENTE, agora)
+        )
+        return cursor.rowcount == 1
+
+
+def processar_pendentes(entregar=enviar_smtp) -> int:
+    """
+    Tenta entregar todas as mensagens pendentes cujo horário de tentativa já chegou.
+    Cada mensagem é reservada antes da entrega, de modo que vários processos
+    podem consumir a mesma caixa de saída sem enviar duas vezes. Reservas
+    vencidas (processo interrompido durante a entrega) voltam para a fila.
+
+    Returns:
+        Quantidade de mensagens processadas
+    """
+    agora = time.time()
+    with _conectar() as conn:
+        conn.execute(
+            "UPDATE mensagens SET status = ? WHERE status = ? AND proxima_tentativa <= ?",
+            (PENDENTE, ENVIANDO, agora)
+        )
+        pendentes = conn.execute(
+            "SELECT * FROM mensagens WHERE status = ? AND proxima_tentativa <= ? ORDER BY id",
+            (PENDENTE, agora)
+        ).fetchall()
+
+    processadas = 0
+    for mensagem in pendentes:
+        if not _reservar(mensagem["id"]):
+            # Outro processo já está entregando esta mensagem
+            continue
+        processadas += 1
+        try:
+            entregar(mensagem["destinatario"], mensagem["assunto"], mensagem["corpo"])
+        except Exception as e:
+            tentativas = mensagem["tentativas"] + 1
+            status = DESCARTADO if tentativas >= MAX_TENTATIVAS else PENDENTE
+            with _conectar() as conn:
+                conn.execute(
+                    "UPDATE mensagens SET status = ?, tentativas = ?, proxima_tentativa = ?, ultimo_erro = ? WHERE id = ?",
+                    (status, tentativas, time.time() + calcular_espera(tentativas), str(e), mensagem["id"])
+                )
+        else:
+            with _conectar() as conn:
+                conn.execute(
+                    "UPDATE mensagens SET status = ?, tentativas = tentativas + 1, enviado_em = ?, ultimo_erro = NULL WHERE id = ?",
+                    (ENVIADO, time.time(), mensagem["id"])
+                )
+
+    return processadas
+
+
+class OutboxWorker(threading.Thread):
+    """
+    Thread em segundo plano que entrega as mensagens da caixa de saída,
+    com novas tentativas em caso de falha.
+    """
+
+    def __init__(self, entregar=enviar_smtp):
+        super().__init__(name="outbox-worker", daemon=True)
+        self.entregar = entregar
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+
+    def notificar(self):
+        """
+        Acorda o worker para processar uma mensagem recém-enfileirada.
+        """
+        self._acordar.set()
+
+    def parar(self):
+        self._parar.set()
+        self._acordar.set()
+
+    def run(self):
+        while not self._parar.is_set():
+            try:
+                processar_pendentes(self.entregar)
+            except sqlite3.Error:
+                # Banco ocupado ou indisponível: tenta novamente no próximo ciclo
+                pass
+            self._acordar.wait(INTERVALO_VERIFICACAO)
+            self._acordar.clear()
+
+
+def iniciar_worker() -> OutboxWorker:
+    """
+    Inicia (uma única vez) o worker da caixa de saída.
+    """
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = OutboxWorker()
+            _worker.start()
+        return _worker
+
+
+def resumo_status() -> Dict[str, int]:
+    """
+    Retorna a quantidade de mensagens em cada estado.
+    """
+    resumo = {PENDENTE: 0, ENVIANDO: 0, ENVIADO: 0, DESCARTADO: 0}
+    with _conectar() as conn:
+        for linha in conn.execute("SELECT status, COUNT(*) AS total FROM mensagens GROUP BY status"):
+            resumo[linha["status"]] = linha["total"]
+    return resumo
+
+
+def listar_mensagens(limite: int = 10) -> List[Dict]:
+    """
+    Retorna as mensagens mais recentes da caixa de saída.
+    """
+    with _conectar() as conn:
+        linhas = conn.execute(
+            "SELECT id, destinatario, assunto, status, tentativas, ultimo_erro, criado_em, enviado_em "
+            "FROM mensagens ORDER BY id DESC LIMIT ?",
+            (limite,)
+        ).fetchall()
+    return [dict(linha) for linha in linhas]
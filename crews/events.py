@@ -0,0 +1,153 @@
+# Eventos de progresso dos crews: tarefas, passos do agente e chamadas de ferramentas
+import contextvars
+import functools
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+MAX_CHARS_RESUMO = 80
+
+# Função que recebe os eventos da execução atual (definida pelo CrewManager)
+_emissor: contextvars.ContextVar = contextvars.ContextVar("emissor_eventos", default=None)
+
+
+def resumir(texto: Any, limite: int = MAX_CHARS_RESUMO) -> str:
+    """
+    Resume um texto em uma única linha com no máximo `limite` caracteres.
+    """
+    texto = " ".join(str(texto or "").split())
+    return texto if len(texto) <= limite else texto[:limite - 1].rstrip() + "…"
+
+
+def resumir_argumentos(args: tuple, kwargs: Dict[str, Any]) -> str:
+    partes = [repr(resumir(a, 40)) for a in args]
+    partes += [f"{k}={resumir(v, 40)!r}" for k, v in kwargs.items()]
+    return resumir(", ".join(partes))
+
+
+@contextmanager
+def emissor(callback: Optional[Callable[[Dict[str, Any]], None]]):
+    """
+    Define a função que recebe os eventos emitidos no contexto atual.
+    """
+    token = _emissor.set(callback)
+    try:
+        yield
+    finally:
+        _emissor.reset(token)
+
+
+def emitir(evento: Dict[str, Any]):
+    callback = _emissor.get()
+    if callback is None:
+        return
+    try:
+        callback(evento)
+    except Exception:
+        # Uma falha ao exibir o progresso não deve interromper o crew
+        pass
+
+
+def instrumentar_ferramentas(ferramentas: List[Any]) -> List[Any]:
+    """
+    Envolve o _run de cada ferramenta para emitir ferramenta_chamada e
+    ferramenta_concluida. As ferramentas compartilhadas entre crews são
+    instrumentadas uma única vez; o destino dos eventos vem do contexto.
+    """
+    for ferramenta in ferramentas:
+        if getattr(ferramenta, "_instrumentada", False):
+            continue
+        original = ferramenta._run
+        nome = ferramenta.name
+
+        @functools.wraps(original)
+        def _run(*args, _original=original, _nome=nome, **kwargs):
+            emitir({"tipo": "ferramenta_chamada", "ferramenta": _nome,
+                    "argumentos": resumir_argumentos(args, kwargs)})
+            inicio = time.monotonic()
+            erro = None
+            try:
+                return _original(*args, **kwargs)
+            except Exception as e:
+                erro = resumir(e)
+                raise
+            finally:
+                emitir({"tipo": "ferramenta_concluida", "ferramenta": _nome,
+                        "duracao": time.monotonic() - inicio, "erro": erro})
+
+        # As ferramentas do CrewAI são modelos pydantic: atribui direto no objeto
+        object.__setattr__(ferramenta, "_run", _run)
+        object.__setattr__(ferramenta, "_instrumentada", True)
+    return ferramentas
+
+
+def kickoff_com_eventos(crew):
+    """
+    Executa o crew ligando os callbacks de passo e de tarefa do CrewAI aos eventos
+    tarefa_iniciada, passo e tarefa_concluida. O processo é sequencial, então o
+    fim de uma tarefa marca o início da seguinte.
+    """
+    tarefas = list(crew.tasks)
+    estado = {"indice": 0, "inicio": time.monotonic()}
+    task_callback_original = crew.task_callback
+    step_callback_original = crew.step_callback
+
+    def iniciar_tarefa():
+        estado["inicio"] = time.monotonic()
+        if estado["indice"] < len(tarefas):
+            emitir({"tipo": "tarefa_iniciada", "indice": estado["indice"] + 1, "total": len(tarefas),
+                    "tarefa": resumir(tarefas[estado["indice"]].description)})
+
+    def task_callback(output):
+        emitir({"tipo": "tarefa_concluida", "indice": estado["indice"] + 1, "total": len(tarefas),
+                "tarefa": resumir(getattr(output, "description", "") or tarefas[estado["indice"]].description),
+                "duracao": time.monotonic() - estado["inicio"]})
+        estado["indice"] += 1
+        iniciar_tarefa()
+        if task_callback_original is not None:
+            task_callback_original(output)
+
+    def step_callback(passo):
+        descricao = getattr(passo, "thought", None) or getattr(passo, "log", None) or getattr(passo, "text", "")
+        emitir({"tipo": "passo", "descricao": resumir(descricao)})
+        if step_callback_original is not None:
+            step_callback_original(passo)
+
+    crew.task_callback = task_callback
+    crew.step_callback = step_callback
+    iniciar_tarefa()
+    return crew.kickoff()
+
+
+def descrever_evento(evento: Dict[str, Any]) -> Optional[str]:
+    """
+    Texto curto de um evento para a linha do tempo, ou None para eventos que não
+    aparecem nela.
+    """
+    tipo = evento.get("tipo")
+    origem = evento.get("crew", "")
+    if evento.get("etapa"):
+        origem = f"{evento['etapa']}:{origem}"
+
+    if tipo == "crew_iniciado":
+        return f"{origem} iniciado"
+    if tipo == "crew_concluido":
+        return f"{origem} concluído em {evento['duracao']:.1f}s"
+    if tipo == "tarefa_iniciada":
+        return f"{origem} tarefa {evento['indice']}/{evento['total']}: {evento['tarefa']}"
+    if tipo == "tarefa_concluida":
+        return f"{origem} tarefa {evento['indice']}/{evento['total']} concluída em {evento['duracao']:.1f}s"
+    if tipo == "ferramenta_chamada":
+        return f"{origem} {evento['ferramenta']}({evento['argumentos']})"
+    if tipo == "ferramenta_concluida":
+        situacao = f"falhou: {evento['erro']}" if evento.get("erro") else "ok"
+        return f"{origem} {evento['ferramenta']} {situacao} em {evento['duracao']:.1f}s"
+    return None
+
+
+def etapa_mais_lenta(eventos: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Chamada de ferramenta ou tarefa mais demorada entre os eventos coletados.
+    """
+    medidos = [e for e in eventos if e.get("tipo") in ("ferramenta_concluida", "tarefa_concluida")]
+    return max(medidos, key=lambda e: e["duracao"], default=None)
@@ -1,9 +1,17 @@
 # Crews Manager
-from typing import Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextvars import copy_context
+import time
+from typing import Callable, Dict, Any, List, Optional
 
 # Importação dos crews
-from crews.email.crew import get_email_crew
+from crews.email.crew import get_email_crew, run_email_fast_path
 from crews.search.crew import get_search_crew
+from crews.planner import validar_plano, montar_entrada
+from crews.events import emissor, kickoff_com_eventos
+from core.usage import contexto_uso, verificar_crew
+from core.prompts import versao
+from core.profiler import componentes_prompt, componentes_do_crew
 
 class CrewManager:
     """
@@ -11,11 +19,23 @@ class CrewManager:
     Responsável por selecionar e executar o crew apropriado com base no tipo de solicitação.
     """
     
-    def __init__(self):
+    def __init__(self, pool=None, on_event: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """
+        Args:
+            pool: CrewPool opcional; quando informado, os crews rodam nos processos do pool
+            on_event: Função chamada com os eventos de progresso da execução
+        """
+        self.pool = pool
+        self.on_event = on_event
         self.available_crews = {
             "email": get_email_crew,
             "search": get_search_crew,
         }
+        # Caminhos rápidos que resolvem solicitações simples sem montar o crew.
+        # Devem retornar None quando a solicitação precisar do crew completo.
+        self.fast_paths = {
+            "email": run_email_fast_path,
+        }
     
     def get_crew(self, crew_type: str, user_input: str = None):
         """
@@ -33,24 +53,150 @@ class CrewManager:
         
         return self.available_crews[crew_type](user_input)
     
-    def execute_crew(self, crew_type: str, user_input: str) -> Dict[str, Any]:
+    def execute_crew(self, crew_type: str, user_input: str, etapa: str = None) -> Dict[str, Any]:
         """
         Obtém e executa o crew apropriado com base no tipo.
         
         Args:
             crew_type: O tipo de crew a ser executado
             user_input: A entrada do usuário a ser processada pelo crew
+            etapa: Id da etapa do plano, incluído nos eventos de progresso
             
         Returns:
-            Resultado da execução do crew
+            Resultado da execução do crew e os eventos de progresso emitidos
+
+        Raises:
+            OrcamentoExcedidoError: Se o orçamento da sessão ou do crew foi atingido
+            CrewWorkerError: Se o processo do pool que executava o crew falhar ou for cancelado
         """
-        crew = self.get_crew(crew_type, user_input)
-        result = crew.kickoff()
+        eventos: List[Dict[str, Any]] = []
+
+        def on_event(evento: Dict[str, Any]):
+            evento = {"crew": crew_type, **evento}
+            if etapa is not None:
+                evento["etapa"] = etapa
+            eventos.append(evento)
+            self._emit(evento)
+
+        if self.pool is not None:
+            result = self.pool.run(crew_type, user_input, on_event=on_event)
+            return {
+                "crew_type": crew_type,
+                "result": result,
+                "events": eventos,
+            }
+
+        verificar_crew(crew_type)
+
+        inicio = time.monotonic()
+        with emissor(on_event):
+            on_event({"tipo": "crew_iniciado"})
+            with contexto_uso(crew=crew_type):
+                fast_path = self.fast_paths.get(crew_type)
+                result = fast_path(user_input) if fast_path is not None else None
+                if result is None:
+                    crew = self.get_crew(crew_type, user_input)
+                    # Permite ao perfil de prompts separar backstory, goal, tarefas e ferramentas
+                    with componentes_prompt(componentes_do_crew(crew), versao(crew_type)):
+                        result = kickoff_com_eventos(crew)
+            on_event({"tipo": "crew_concluido", "duracao": time.monotonic() - inicio})
         
         return {
             "crew_type": crew_type,
             "result": result,
+            "events": eventos,
+        }
+
+    def execute_plan(self, plan: List[Dict[str, Any]], max_parallel: int = 4) -> Dict[str, Any]:
+        """
+        Executa um plano com várias etapas como um grafo de dependências.
+        Etapas independentes rodam em paralelo e o resultado de cada etapa
+        é repassado às etapas que dependem dela.
+        
+        Args:
+            plan: Lista de etapas no formato {"id", "crew_type", "input", "depends_on"}
+            max_parallel: Número máximo de crews executando ao mesmo tempo
+            
+        Returns:
+            Resultado consolidado, o resultado de cada etapa e os eventos de progresso
+
+        Raises:
+            ValueError: Se o plano for inválido
+        """
+        etapas = validar_plano(plan, self.available_crews.keys())
+        resultados: Dict[str, str] = {}
+        falhas: Dict[str, str] = {}
+        eventos: List[Dict[str, Any]] = []
+
+        with ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix="plan") as executor:
+            try:
+                self._run_plan_steps(executor, etapas, resultados, falhas, eventos)
+            except KeyboardInterrupt:
+                # Sem cancelar, o executor aguardaria o fim dos crews em andamento
+                self.cancel()
+                raise
+
+        partes = []
+        for etapa in etapas:
+            saida = resultados.get(etapa["id"], falhas.get(etapa["id"]))
+            partes.append(f"[{etapa['id']} - {etapa['crew_type']}]\n{saida}")
+
+        return {
+            "crew_type": "plan",
+            "result": "\n\n".join(partes),
+            "results": resultados,
+            "errors": falhas,
+            "events": eventos,
         }
+
+    def _run_plan_steps(self, executor, etapas: List[Dict[str, Any]],
+                        resultados: Dict[str, str], falhas: Dict[str, str],
+                        eventos: List[Dict[str, Any]]):
+        """
+        Submete as etapas cujas dependências já terminaram até que todas tenham
+        resultado ou falha registrada.
+        """
+        em_execucao = {}
+        while len(resultados) + len(falhas) < len(etapas):
+            for etapa in etapas:
+                etapa_id = etapa["id"]
+                if etapa_id in resultados or etapa_id in falhas or etapa_id in em_execucao.values():
+                    continue
+                deps_com_falha = [d for d in etapa["depends_on"] if d in falhas]
+                if deps_com_falha:
+                    falhas[etapa_id] = f"Não executada: a etapa '{deps_com_falha[0]}' falhou."
+                elif all(d in resultados for d in etapa["depends_on"]):
+                    # Cada etapa roda com uma cópia do contexto atual (turno, sessão)
+                    future = executor.submit(
+                        copy_context().run, self.execute_crew,
+                        etapa["crew_type"], montar_entrada(etapa, resultados), etapa_id
+                    )
+                    em_execucao[future] = etapa_id
+
+            if not em_execucao:
+                continue
+
+            concluidos, _ = wait(list(em_execucao), return_when=FIRST_COMPLETED)
+            for future in concluidos:
+                etapa_id = em_execucao.pop(future)
+                try:
+                    resultado = future.result()
+                    resultados[etapa_id] = str(resultado["result"])
+                    eventos.extend(resultado["events"])
+                except Exception as e:
+                    falhas[etapa_id] = f"Erro: {str(e)}"
+
+    def cancel(self):
+        """
+        Cancela os crews em execução no pool, se houver.
+        """
+        if self.pool is not None:
+            self.pool.cancel_all()
+
+    def _emit(self, evento: Dict[str, Any]):
+        if self.on_event is not None:
+            self.on_event(evento)
+
     def list_available_crews(self) -> Dict[str, str]:
         """
         Lista todos os crews disponíveis no sistema.
@@ -0,0 +1,88 @@
+# Planos com várias etapas: validação e montagem das entradas de cada etapa
+from typing import Any, Dict, Iterable, List
+
+# Separa a instrução da etapa dos resultados das etapas de que ela depende
+MARCADOR_RESULTADOS = "Resultados das etapas anteriores:"
+
+def validar_plano(plan: List[Dict[str, Any]], crews_disponiveis: Iterable[str]) -> List[Dict[str, Any]]:
+    """
+    Valida e normaliza um plano retornado pelo roteador.
+
+    Cada etapa tem a forma {"id": str, "crew_type": str, "input": str, "depends_on": [ids]}.
+
+    Raises:
+        ValueError: Se o plano estiver vazio, tiver etapas ou dependências malformadas,
+                    usar crews inexistentes, repetir ids,
+                    depender de etapas desconhecidas ou tiver dependências circulares
+    """
+    if not isinstance(plan, list) or not plan:
+        raise ValueError("O plano não contém nenhuma etapa")
+
+    crews_disponiveis = set(crews_disponiveis)
+    etapas = []
+    ids = set()
+    for indice, etapa in enumerate(plan, 1):
+        if not isinstance(etapa, dict):
+            raise ValueError(f"A etapa {indice} do plano não é um objeto")
+        depends_on = etapa.get("depends_on") or []
+        if not isinstance(depends_on, list):
+            raise ValueError(f"A etapa {indice} do plano tem \"depends_on\" que não é uma lista")
+        etapa_id = str(etapa.get("id") or f"p{indice}")
+        if etapa_id in ids:
+            raise ValueError(f"Etapa '{etapa_id}' repetida no plano")
+        if not isinstance(etapa.get("crew_type"), str) or etapa["crew_type"] not in crews_disponiveis:
+            raise ValueError(f"Crew do tipo '{etapa.get('crew_type')}' não encontrado")
+        ids.add(etapa_id)
+        etapas.append({
+            "id": etapa_id,
+            "crew_type": etapa["crew_type"],
+            "input": str(etapa.get("input") or ""),
+            "depends_on": [str(d) for d in depends_on],
+        })
+
+    for etapa in etapas:
+        desconhecidas = [d for d in etapa["depends_on"] if d not in ids]
+        if desconhecidas:
+            raise ValueError(f"Etapa '{etapa['id']}' depende de etapas inexistentes: {', '.join(desconhecidas)}")
+
+    ordem_topologica(etapas)
+    return etapas
+
+
+def ordem_topologica(etapas: List[Dict[str, Any]]) -> List[str]:
+    """
+    Retorna os ids das etapas em uma ordem que respeita as dependências.
+
+    Raises:
+        ValueError: Se houver dependências circulares
+    """
+    pendentes = {e["id"]: set(e["depends_on"]) for e in etapas}
+    ordem = []
+    while pendentes:
+        prontas = [etapa_id for etapa_id, deps in pendentes.items() if not deps]
+        if not prontas:
+            raise ValueError(f"O plano tem dependências circulares entre: {', '.join(pendentes)}")
+        for etapa_id in prontas:
+            ordem.append(etapa_id)
+            del pendentes[etapa_id]
+        for deps in pendentes.values():
+            deps.difference_update(prontas)
+    return ordem
+
+
+def montar_entrada(etapa: Dict[str, Any], resultados: Dict[str, str]) -> str:
+    """
+    Monta a entrada de uma etapa acrescentando os resultados das etapas de que ela depende.
+    """
+    if not etapa["depends_on"]:
+        return etapa["input"]
+
+    anteriores = "\n\n".join(f"[{d}]\n{resultados[d]}" for d in etapa["depends_on"])
+    return f"{etapa['input']}\n\n{MARCADOR_RESULTADOS}\n{anteriores}"
+
+
+def instrucao_da_etapa(entrada: str) -> str:
+    """
+    Apenas a instrução da etapa, sem os resultados anteriores acrescentados por montar_entrada.
+    """
+    return entrada.split(f"\n\n{MARCADOR_RESULTADOS}\n", 1)[0]
@@ -0,0 +1,305 @@
+# Pool de processos para execução isolada dos crews
+import itertools
+import multiprocessing
+import queue
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from config.settings import CONFIG
+from core import transport
+from core.governor import prioridade_atual
+from core.usage import contexto_atual
+
+# "spawn" funciona igual no Windows e no Linux e evita herdar threads do processo principal
+_CTX = multiprocessing.get_context("spawn")
+
+NUM_WORKERS = int(CONFIG.get("crew_workers", 2))
+# Tempo máximo de espera por um worker livre
+ESPERA_WORKER = float(CONFIG.get("crew_espera_worker", 120))
+
+_pool = None
+_pool_lock = threading.Lock()
+# Threads do processo principal que executam as chamadas HTTP encaminhadas pelos workers
+_http_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="crew-http")
+
+
+class CrewWorkerError(RuntimeError):
+    """
+    Lançada quando o processo que executava o crew falha ou é encerrado.
+    """
+
+
+class CrewCancelledError(CrewWorkerError):
+    """
+    Lançada quando a execução do crew é cancelada.
+    """
+
+
+class CrewWorkerCrashedError(CrewWorkerError):
+    """
+    Lançada quando o processo do worker termina inesperadamente durante a execução.
+    """
+
+
+class _Canal:
+    """
+    Conexão de um worker com o processo principal. Uma thread lê o pipe e separa
+    as tarefas das respostas às chamadas HTTP encaminhadas; os envios são
+    serializados porque partem das threads dos crews e do próprio laço do worker.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.tarefas: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._envio = threading.Lock()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._pendentes: Dict[int, threading.Event] = {}
+        self._respostas: Dict[int, Dict[str, Any]] = {}
+        threading.Thread(target=self._ler, name="crew-canal", daemon=True).start()
+
+    def enviar(self, tipo: str, dados: Any):
+        with self._envio:
+            self.conn.send((tipo, dados))
+
+    def requisitar(self, dados: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Encaminha uma requisição HTTP ao processo principal e aguarda a resposta.
+        """
+        evento = threading.Event()
+        with self._lock:
+            requisicao_id = next(self._ids)
+            self._pendentes[requisicao_id] = evento
+        self.enviar("http", (requisicao_id, dados))
+        evento.wait()
+        with self._lock:
+            return self._respostas.pop(requisicao_id)
+
+    def _responder(self, requisicao_id: int, resposta: Dict[str, Any]):
+        with self._lock:
+            evento = self._pendentes.pop(requisicao_id, None)
+            if evento is not None:
+                self._respostas[requisicao_id] = resposta
+        if evento is not None:
+            evento.set()
+
+    def _ler(self):
+        while True:
+            try:
+                tipo, dados = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            if tipo == "tarefa":
+                self.tarefas.put(dados)
+            elif tipo == "http_resposta":
+                self._responder(*dados)
+
+        # Processo principal encerrado: libera quem aguarda e termina o laço do worker
+        with self._lock:
+            pendentes = list(self._pendentes)
+        for requisicao_id in pendentes:
+            self._responder(requisicao_id, {"erro": ("conexao", "Conexão com o processo principal encerrada")})
+        self.tarefas.put(None)
+
+
+def _worker_main(conn):
+    """
+    Laço principal de um processo do pool. Importa crewai/langchain uma única vez,
+    na inicialização, e depois executa os crews recebidos pelo pipe.
+
+    As chamadas à OpenAI dos crews são encaminhadas ao processo principal, que
+    aplica os limites do governador e registra uso e latências para todo o aplicativo.
+
+    Mensagens recebidas: ("tarefa", (crew_type, user_input, contexto, prioridade)) e
+    ("http_resposta", (id, resposta)). Mensagens enviadas ao processo principal:
+    ("pronto", None), ("evento", dict), ("http", (id, requisição)), ("resultado", str)
+    e ("erro", (é_value_error, mensagem)).
+    """
+    # O Ctrl+C é tratado pelo processo principal, que encerra apenas o worker afetado
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    canal = _Canal(conn)
+    # Precisa vir antes de qualquer cliente da OpenAI ser criado
+    transport.definir_encaminhamento(canal.requisitar)
+
+    from crews.manager import CrewManager
+    from core.governor import prioridade
+    from core.usage import contexto_uso
+
+    def enviar_evento(evento: Dict[str, Any]):
+        canal.enviar("evento", evento)
+
+    manager = CrewManager(on_event=enviar_evento)
+    canal.enviar("pronto", None)
+
+    while True:
+        tarefa = canal.tarefas.get()
+        if tarefa is None:
+            break
+
+        crew_type, user_input, contexto, nivel = tarefa
+        try:
+            with contexto_uso(**contexto), prioridade(nivel):
+                result = manager.execute_crew(crew_type, user_input)
+            canal.enviar("resultado", str(result["result"]))
+        except Exception as e:
+            canal.enviar("erro", (isinstance(e, ValueError), str(e)))
+
+
+class _Worker:
+    def __init__(self):
+        self.conn, conn_filho = _CTX.Pipe()
+        self.process = _CTX.Process(target=_worker_main, args=(conn_filho,), name="crew-worker", daemon=True)
+        self.process.start()
+        conn_filho.close()
+        self.cancelado = False
+        self._envio = threading.Lock()
+
+    def enviar(self, tipo: str, dados: Any):
+        with self._envio:
+            self.conn.send((tipo, dados))
+
+    def atender(self, requisicao_id: int, dados: Dict[str, Any]):
+        """
+        Executa uma chamada HTTP encaminhada pelo worker e devolve a resposta.
+        """
+        resposta = transport.executar_encaminhada(dados)
+        try:
+            self.enviar("http_resposta", (requisicao_id, resposta))
+        except (OSError, ValueError):
+            # Worker encerrado (cancelamento) enquanto a chamada estava em andamento
+            pass
+
+    def encerrar(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+class CrewPool:
+    """
+    Mantém processos pré-aquecidos para executar crews. Cada crew roda em um
+    worker próprio; ao cancelar uma execução, apenas aquele worker é encerrado
+    e um substituto é iniciado em segundo plano. As chamadas à OpenAI dos workers
+    são executadas por este processo (ver core.transport.TransporteEncaminhado).
+    """
+
+    def __init__(self, size: int = NUM_WORKERS):
+        self.size = max(1, size)
+        self._livres: "queue.Queue[_Worker]" = queue.Queue()
+        self._ocupados = set()
+        self._lock = threading.Lock()
+        for _ in range(self.size):
+            self._livres.put(_Worker())
+
+    def _repor(self):
+        threading.Thread(target=lambda: self._livres.put(_Worker()), name="crew-pool-repor", daemon=True).start()
+
+    def _descartar(self, worker: _Worker):
+        worker.encerrar()
+        self._repor()
+
+    def run(self, crew_type: str, user_input: str,
+            on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+            contexto: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Executa o crew em um worker livre e aguarda o resultado, repassando os
+        eventos de progresso para on_event.
+
+        Raises:
+            ValueError: Erros de validação do crew (tipo inexistente, orçamento etc.)
+            CrewWorkerError: Se não houver worker livre a tempo ou se o worker falhar
+                             durante a execução (CrewWorkerCrashedError) ou for
+                             cancelado (CrewCancelledError)
+        """
+        worker = None
+        devolver = False
+        try:
+            try:
+                worker = self._livres.get(timeout=ESPERA_WORKER)
+            except queue.Empty:
+                raise CrewWorkerError(f"Nenhum worker livre após {ESPERA_WORKER:.0f}s; tente novamente.")
+            with self._lock:
+                self._ocupados.add(worker)
+
+            try:
+                worker.enviar("tarefa", (crew_type, user_input, contexto or contexto_atual(), prioridade_atual()))
+            except OSError:
+                raise self._erro_worker(worker)
+            while True:
+                try:
+                    tipo, dados = worker.conn.recv()
+                except (EOFError, OSError):
+                    raise self._erro_worker(worker)
+
+                if tipo == "http":
+                    _http_executor.submit(worker.atender, *dados)
+                elif tipo == "evento":
+                    if on_event is not None:
+                        on_event(dados)
+                elif tipo == "resultado":
+                    devolver = True
+                    return dados
+                elif tipo == "erro":
+                    devolver = True
+                    eh_value_error, mensagem = dados
+                    raise ValueError(mensagem) if eh_value_error else CrewWorkerError(mensagem)
+        finally:
+            if worker is not None:
+                with self._lock:
+                    self._ocupados.discard(worker)
+                if devolver:
+                    self._livres.put(worker)
+                else:
+                    # Cancelamento (Ctrl+C) ou falha: encerra só este worker e repõe outro
+                    self._descartar(worker)
+
+    def pids(self) -> List[int]:
+        """
+        PIDs dos workers atuais, livres ou ocupados.
+        """
+        with self._lock:
+            workers = list(self._livres.queue) + list(self._ocupados)
+        return [worker.process.pid for worker in workers]
+
+    @staticmethod
+    def _erro_worker(worker: _Worker) -> CrewWorkerError:
+        """
+        Erro para a conexão perdida com o worker: cancelamento pedido por
+        cancel_all ou término inesperado do processo.
+        """
+        if worker.cancelado:
+            return CrewCancelledError("A execução do crew foi interrompida.")
+        worker.process.join(timeout=1)
+        return CrewWorkerCrashedError(
+            f"O processo que executava o crew terminou inesperadamente (código de saída {worker.process.exitcode})."
+        )
+
+    def cancel_all(self):
+        """
+        Encerra os workers com crews em execução. As chamadas run() correspondentes
+        terminam com CrewCancelledError.
+        """
+        with self._lock:
+            ocupados = list(self._ocupados)
+        for worker in ocupados:
+            worker.cancelado = True
+            if worker.process.is_alive():
+                worker.process.kill()
+
+
+def get_pool() -> Optional[CrewPool]:
+    """
+    Retorna o pool compartilhado, criando-o na primeira chamada.
+    Com crew_workers igual a 0 os crews rodam no próprio processo e None é retornado.
+    """
+    global _pool
+    if NUM_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = CrewPool()
+        return _pool
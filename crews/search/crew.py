@@ -1,8 +1,12 @@
 from crewai import Agent, Task, Crew, Process
-from config.llms import get_gpt35, get_gpt40
+from config.llms import get_gpt35, get_openai_client
 from crewai.tools import BaseTool
 from config.settings import VERBOSE_MODE
-from openai import OpenAI
+from crews.events import instrumentar_ferramentas
+from core.prompts import prompt
+from crews.search.results import extrair_fontes, guardar, compactar, parte_do_texto
+from crews.search.rerank import extrair_passagens, selecionar_passagens
+from crews.planner import instrucao_da_etapa
 
 # Classes para as ferramentas de pesquisa
 class WebSearchTool(BaseTool):
@@ -11,6 +15,9 @@ class WebSearchTool(BaseTool):
     """
     name: str = "web_search"
     description: str = "Realiza pesquisas na web para encontrar informações atualizadas sobre um tópico específico."
+    # Pergunta original do usuário: as passagens são escolhidas pelo que foi perguntado,
+    # não pela reformulação que o agente usa como consulta da pesquisa
+    consulta_usuario: str = ""
 
     def _run(self, query: str) -> str:
         """
@@ -21,23 +28,43 @@ class WebSearchTool(BaseTool):
             query: A consulta a ser pesquisada
 
         Returns:
-            Resultados da pesquisa como texto
+            Resultado compacto em JSON: as passagens mais relevantes para a pergunta do
+            usuário (selecionadas localmente com BM25; sem ela, para a consulta), cada uma
+            com suas fontes, e a lista de fontes.
+            O texto completo fica guardado e pode ser lido com a ferramenta web_search_full.
         """
         try:
-            client = OpenAI()
+            client = get_openai_client(papel="search")
 
             response = client.responses.create(
-                model=get_gpt40(),
+                model="gpt-4o",
                 tools=[{"type": "web_search"}],
                 temperature=0.1,
-                max_tokens=1024,
+                max_output_tokens=1024,
                 input=query,
             )
 
-            return response.output_text
+            texto = response.output_text
+            fontes = extrair_fontes(response)
+            result_id = guardar(query, texto, fontes)
+            passagens = selecionar_passagens(self.consulta_usuario or query, extrair_passagens(response))
+            return compactar(result_id, query, texto, fontes, passagens=passagens)
         except Exception as e:
             return f"Erro ao fazer busca: {str(e)}"
 
+class SearchResultTool(BaseTool):
+    """
+    Ferramenta para ler, sob demanda, o texto completo de uma pesquisa anterior.
+    """
+    name: str = "web_search_full"
+    description: str = (
+        "Retorna o texto completo de um resultado de web_search, em partes. "
+        "Informe o result_id devolvido pela pesquisa e, opcionalmente, o número da parte."
+    )
+
+    def _run(self, result_id: str, parte: int = 1) -> str:
+        return parte_do_texto(result_id, parte)
+
 # Função para obter o crew de pesquisa
 def get_search_crew(user_input=None):
     """
@@ -46,24 +73,25 @@ def get_search_crew(user_input=None):
     a cada chamada para evitar persistência indesejada de estado.
     """
     # Instanciar as ferramentas (criar novas instâncias a cada chamada)
-    web_search_tool = WebSearchTool()
+    web_search_tool = WebSearchTool(consulta_usuario=instrucao_da_etapa(user_input or ""))
+    search_result_tool = SearchResultTool()
 
     # Criar um novo agente de pesquisa com as novas instâncias de ferramentas
     # Isso evita que o estado seja compartilhado entre diferentes consultas
     search_agent = Agent(
-        role="Agente de Pesquisa Web",
-        goal=f"Realizar pesquisas na web para encontrar informações atualizadas sobre: {user_input}",
-        backstory="Você é um especialista em pesquisa e análise de dados da web. Sua função é encontrar as informações mais relevantes e confiáveis sobre qualquer tópico solicitado pelo usuário. Você sabe como avaliar fontes, extrair os dados mais importantes e apresentá-los de forma clara e organizada.",
-        tools=[web_search_tool],
+        role=prompt("search", "role"),
+        goal=prompt("search", "goal", entrada=user_input),
+        backstory=prompt("search", "backstory"),
+        tools=instrumentar_ferramentas([web_search_tool, search_result_tool]),
         allow_delegation=False,
-        llm=get_gpt35(),
+        llm=get_gpt35(papel="search"),
         verbose=VERBOSE_MODE
     )
 
     # Criar uma nova tarefa para a pesquisa atual
     search_task = Task(
-        description=f"Pesquisar na web informações sobre: {user_input}. Utilize a ferramenta de pesquisa para encontrar informações relevantes e depois extraia o conteúdo dos sites mais promissores quando necessário para obter informações detalhadas.",
-        expected_output="Um resumo completo e bem estruturado das informações encontradas, contendo fatos relevantes, números e detalhes importantes sobre o tópico pesquisado. Inclua as fontes utilizadas.",
+        description=prompt("search", "tarefa", entrada=user_input),
+        expected_output=prompt("search", "resultado_esperado"),
         agent=search_agent
     )
 
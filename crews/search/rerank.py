@@ -0,0 +1,152 @@
+# Seleção local de passagens (BM25): só os trechos relevantes chegam ao agente
+import re
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config.settings import CONFIG
+from crews.search.results import MAX_TOKENS_RESULTADO, encurtar, estimar_tokens, limpar_texto, normalizar_url
+
+# Número máximo de passagens e orçamento de tokens das passagens no resultado
+MAX_PASSAGENS = int(CONFIG.get("busca_passagens_k", 6))
+MAX_TOKENS_PASSAGENS = int(CONFIG.get("busca_passagens_max_tokens", MAX_TOKENS_RESULTADO * 2 // 3))
+MAX_PALAVRAS_PASSAGEM = int(CONFIG.get("busca_passagem_max_palavras", 80))
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_RE_PARAGRAFO = re.compile(r'\n\s*\n|\n(?=\s*(?:[-*•]|\d+\.)\s)')
+_RE_FIM_FRASE = re.compile(r'(?<=[.!?])\s+')
+_RE_TERMO = re.compile(r'\w+')
+
+
+def _sem_acentos(texto: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c))
+
+
+_STOPWORDS = frozenset(_sem_acentos(p) for p in (
+    "a o as os um uma uns umas de do da dos das em no na nos nas por pelo pela para com sem que "
+    "e ou se ao aos à às é são foi ser está como mais mas sobre entre seu sua seus suas qual quais "
+    "the of and to in on for is are was with by at from an or what which"
+).split())
+
+
+def tokenizar(texto: str) -> List[str]:
+    """
+    Termos do texto em minúsculas, sem acentos e sem palavras vazias.
+    """
+    termos = _RE_TERMO.findall(_sem_acentos(texto.lower()))
+    return [t for t in termos if len(t) > 1 and t not in _STOPWORDS]
+
+
+def _segmentos(texto: str) -> List[Tuple[int, int]]:
+    """
+    Intervalos [inicio, fim) das passagens do texto: cada parágrafo (ou item de
+    lista), dividido em grupos de frases quando passa de MAX_PALAVRAS_PASSAGEM.
+    """
+    segmentos = []
+    inicio_paragrafo = 0
+    limites = [m.start() for m in _RE_PARAGRAFO.finditer(texto)] + [len(texto)]
+    for fim_paragrafo in limites:
+        inicio = inicio_paragrafo
+        palavras = 0
+        posicao = inicio_paragrafo
+        for frase in _RE_FIM_FRASE.finditer(texto, inicio_paragrafo, fim_paragrafo):
+            palavras += len(texto[posicao:frase.start()].split())
+            posicao = frase.end()
+            if palavras >= MAX_PALAVRAS_PASSAGEM:
+                segmentos.append((inicio, frase.start()))
+                inicio = frase.end()
+                palavras = 0
+        segmentos.append((inicio, fim_paragrafo))
+        inicio_paragrafo = fim_paragrafo
+    return [(i, f) for i, f in segmentos if texto[i:f].strip()]
+
+
+def dividir_em_passagens(texto: str, fontes: Optional[List[str]] = None) -> List[Dict]:
+    """
+    Divide o texto de uma fonte em passagens atribuídas a essa fonte.
+    """
+    passagens = []
+    for inicio, fim in _segmentos(texto):
+        trecho = limpar_texto(texto[inicio:fim])
+        if trecho:
+            passagens.append({"texto": trecho, "fontes": list(fontes or [])})
+    return passagens
+
+
+def extrair_passagens(response) -> List[Dict]:
+    """
+    Passagens do texto de uma resposta da Responses API. Cada passagem é
+    atribuída às URLs das citações (url_citation) que caem dentro dela.
+    """
+    passagens = []
+    for item in getattr(response, "output", None) or []:
+        if getattr(item, "type", None) != "message":
+            continue
+        for conteudo in getattr(item, "content", None) or []:
+            texto = getattr(conteudo, "text", "") or ""
+            citacoes = [a for a in getattr(conteudo, "annotations", None) or []
+                        if getattr(a, "type", None) == "url_citation"]
+            for inicio, fim in _segmentos(texto):
+                trecho = limpar_texto(texto[inicio:fim])
+                if not trecho:
+                    continue
+                urls = [normalizar_url(a.url) for a in citacoes if inicio <= a.start_index < fim]
+                passagens.append({"texto": trecho, "fontes": list(dict.fromkeys(urls))})
+    return passagens
+
+
+def pontuar(consulta: str, passagens: List[Dict]) -> np.ndarray:
+    """
+    Pontuação BM25 de cada passagem para a consulta, calculada de uma vez sobre
+    a matriz de frequências (passagens × termos da consulta).
+    """
+    termos = list(dict.fromkeys(tokenizar(consulta)))
+    if not termos or not passagens:
+        return np.zeros(len(passagens))
+
+    coluna = {termo: i for i, termo in enumerate(termos)}
+    frequencias = np.zeros((len(passagens), len(termos)))
+    comprimentos = np.zeros(len(passagens))
+    for linha, passagem in enumerate(passagens):
+        tokens = tokenizar(passagem["texto"])
+        comprimentos[linha] = len(tokens)
+        for token in tokens:
+            if token in coluna:
+                frequencias[linha, coluna[token]] += 1
+
+    n = len(passagens)
+    df = np.count_nonzero(frequencias, axis=0)
+    idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5))
+    normalizacao = BM25_K1 * (1 - BM25_B + BM25_B * comprimentos / max(comprimentos.mean(), 1.0))
+    return (idf * frequencias * (BM25_K1 + 1) / (frequencias + normalizacao[:, None])).sum(axis=1)
+
+
+def selecionar_passagens(consulta: str, passagens: List[Dict], max_tokens: int = MAX_TOKENS_PASSAGENS,
+                         k: int = MAX_PASSAGENS) -> List[Dict]:
+    """
+    Escolhe as k passagens mais relevantes que cabem no orçamento de tokens e as
+    devolve na ordem original do texto, com a pontuação em "score". Se nenhuma
+    passagem contém termos da consulta, usa as primeiras do texto. Se a passagem
+    mais relevante sozinha passa do orçamento, ela entra cortada.
+    """
+    pontuacoes = pontuar(consulta, passagens)
+    ordem = np.argsort(-pontuacoes, kind="stable")
+    if (pontuacoes > 0).any():
+        ordem = ordem[pontuacoes[ordem] > 0]
+
+    escolhidas = {}
+    usados = 0
+    for indice in ordem:
+        if len(escolhidas) >= k:
+            break
+        texto = passagens[indice]["texto"]
+        if usados + estimar_tokens(texto) > max_tokens:
+            if escolhidas:
+                continue
+            texto = encurtar(texto, (max_tokens - 1) * 4)
+        escolhidas[int(indice)] = texto
+        usados += estimar_tokens(texto)
+
+    return [{**passagens[i], "texto": escolhidas[i], "score": float(pontuacoes[i])} for i in sorted(escolhidas)]
@@ -0,0 +1,162 @@
+# Resultados de pesquisa compactos: fontes deduplicadas e texto completo fora do prompt
+import json
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from config.settings import CONFIG
+
+# Teto de tokens do resultado devolvido ao agente e orçamento de caracteres por fonte
+MAX_TOKENS_RESULTADO = int(CONFIG.get("busca_max_tokens", 600))
+MAX_CHARS_TRECHO = int(CONFIG.get("busca_trecho_max_chars", 300))
+MAX_FONTES = int(CONFIG.get("busca_max_fontes", 6))
+MAX_RESULTADOS_GUARDADOS = 32
+
+_RE_CITACAO = re.compile(r'\s*\(\[[^\]]*\]\([^)]*\)\)')
+_RE_LINK = re.compile(r'\[([^\]]+)\]\([^)]*\)')
+_RE_FIM_FRASE = re.compile(r'[.!?\n]\s')
+
+_resultados: "OrderedDict[str, Dict]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def estimar_tokens(texto: str) -> int:
+    return len(texto) // 4 + 1
+
+
+def normalizar_url(url: str) -> str:
+    """
+    Normaliza a URL para deduplicação: remove fragmento, parâmetros utm_* e barra final.
+    """
+    partes = urlsplit(url)
+    query = urlencode([(k, v) for k, v in parse_qsl(partes.query) if not k.startswith("utm_")])
+    return urlunsplit((partes.scheme, partes.netloc.lower(), partes.path.rstrip("/"), query, ""))
+
+
+def limpar_texto(texto: str) -> str:
+    """
+    Remove as citações em markdown do texto, mantendo o texto dos links.
+    """
+    return _RE_LINK.sub(r'\1', _RE_CITACAO.sub('', texto)).strip()
+
+
+def _trecho_citado(texto: str, inicio: int) -> str:
+    """
+    Frase que antecede a posição da citação no texto.
+    """
+    anterior = texto[max(0, inicio - MAX_CHARS_TRECHO * 2):inicio]
+    fins = list(_RE_FIM_FRASE.finditer(anterior.rstrip()))
+    if fins:
+        anterior = anterior[fins[-1].end():]
+    return limpar_texto(anterior)
+
+
+def extrair_fontes(response) -> List[Dict[str, str]]:
+    """
+    Extrai as fontes citadas (anotações url_citation) de uma resposta da Responses API,
+    deduplicadas por URL e com um trecho limitado do texto que cita cada fonte.
+    """
+    fontes: "OrderedDict[str, Dict[str, str]]" = OrderedDict()
+    for item in getattr(response, "output", None) or []:
+        if getattr(item, "type", None) != "message":
+            continue
+        for conteudo in getattr(item, "content", None) or []:
+            texto = getattr(conteudo, "text", "") or ""
+            for anotacao in getattr(conteudo, "annotations", None) or []:
+                if getattr(anotacao, "type", None) != "url_citation":
+                    continue
+                chave = normalizar_url(anotacao.url)
+                fonte = fontes.setdefault(chave, {"titulo": anotacao.title or "", "url": chave, "trecho": ""})
+                trecho = _trecho_citado(texto, anotacao.start_index)
+                if trecho and trecho not in fonte["trecho"]:
+                    fonte["trecho"] = f"{fonte['trecho']} {trecho}".strip()[:MAX_CHARS_TRECHO]
+    return list(fontes.values())
+
+
+def guardar(consulta: str, texto: str, fontes: List[Dict[str, str]]) -> str:
+    """
+    Guarda o texto completo da pesquisa e retorna o id usado para recuperá-lo depois.
+    """
+    result_id = f"busca-{uuid.uuid4().hex[:8]}"
+    with _lock:
+        _resultados[result_id] = {"consulta": consulta, "texto": limpar_texto(texto), "fontes": fontes}
+        while len(_resultados) > MAX_RESULTADOS_GUARDADOS:
+            _resultados.popitem(last=False)
+    return result_id
+
+
+def obter(result_id: str) -> Optional[Dict]:
+    with _lock:
+        return _resultados.get(result_id)
+
+
+def encurtar(texto: str, limite: Optional[int] = None) -> str:
+    """
+    Corta o texto (pela metade, se nenhum limite for dado) no último espaço.
+    """
+    limite = len(texto) // 2 if limite is None else limite
+    return texto[:limite].rsplit(" ", 1)[0] + "…"
+
+
+def compactar(result_id: str, consulta: str, texto: str, fontes: List[Dict[str, str]],
+              max_tokens: int = MAX_TOKENS_RESULTADO, passagens: Optional[List[Dict]] = None) -> str:
+    """
+    Monta o resultado compacto enviado ao agente, respeitando o teto de tokens:
+    as passagens mais relevantes (se selecionadas) ou um resumo curto, e as fontes.
+    Com passagens, cada fonte traz só título e URL, pois o conteúdo já está nelas.
+    """
+    resultado = {"id": result_id, "consulta": consulta}
+    pontuacoes = []
+    if passagens:
+        resultado["passagens"] = [{"texto": p["texto"], "fontes": p["fontes"]} for p in passagens]
+        pontuacoes = [p.get("score", 0.0) for p in passagens]
+        resultado["fontes"] = [{"titulo": f["titulo"], "url": f["url"]} for f in fontes[:MAX_FONTES]]
+    else:
+        resultado["resumo"] = limpar_texto(texto)
+        resultado["fontes"] = [dict(fonte) for fonte in fontes[:MAX_FONTES]]
+    resultado["texto_completo"] = f"use web_search_full com result_id='{result_id}' se precisar de mais detalhes"
+
+    # O resumo ocupa no máximo metade do orçamento; as fontes, o restante
+    limite_resumo = max_tokens * 4 // 2
+    if len(resultado.get("resumo", "")) > limite_resumo:
+        resultado["resumo"] = encurtar(resultado["resumo"], limite_resumo)
+
+    serializado = json.dumps(resultado, ensure_ascii=False)
+    while estimar_tokens(serializado) > max_tokens:
+        # Encurta primeiro os trechos, depois o resumo, descarta a passagem menos
+        # relevante e por fim as últimas fontes
+        maior = max(resultado["fontes"], key=lambda f: len(f.get("trecho", "")), default=None)
+        if maior is not None and len(maior.get("trecho", "")) > 80:
+            maior["trecho"] = encurtar(maior["trecho"])
+        elif len(resultado.get("resumo", "")) > 200:
+            resultado["resumo"] = encurtar(resultado["resumo"])
+        elif len(pontuacoes) > 1:
+            menor = pontuacoes.index(min(pontuacoes))
+            pontuacoes.pop(menor)
+            resultado["passagens"].pop(menor)
+        elif resultado["fontes"]:
+            resultado["fontes"].pop()
+        else:
+            break
+        serializado = json.dumps(resultado, ensure_ascii=False)
+
+    return serializado
+
+
+def parte_do_texto(result_id: str, parte: int = 1, max_tokens: int = MAX_TOKENS_RESULTADO) -> str:
+    """
+    Retorna uma parte do texto completo de uma pesquisa anterior.
+    """
+    resultado = obter(result_id)
+    if resultado is None:
+        return f"Resultado '{result_id}' não encontrado. Faça uma nova pesquisa com web_search."
+
+    tamanho = max_tokens * 4
+    texto = resultado["texto"]
+    total = max(1, -(-len(texto) // tamanho))
+    parte = min(max(1, int(parte)), total)
+    trecho = texto[(parte - 1) * tamanho:parte * tamanho]
+    return f"[{result_id} - parte {parte} de {total}]\n{trecho}"
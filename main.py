@@ -9,7 +9,11 @@ from rich.status import Status
 from rich.layout import Layout
 from rich.align import Align
 from rich import box
+from rich.markup import escape
 import shutil
+import threading
+import time
+from openai import APIConnectionError, APIError, APITimeoutError
 from prompt_toolkit import PromptSession
 from prompt_toolkit.history import InMemoryHistory, FileHistory
 from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
@@ -25,6 +29,18 @@ from config.settings import (
 # Importar o chat completion e gerenciador de crews
 from chat_completion import ChatManager
 from crews.manager import CrewManager
+from crews.email.outbox import iniciar_worker, resumo_status, listar_mensagens
+from crews.pool import get_pool, CrewWorkerError
+from core.governor import get_governor
+from core.providers import get_registry
+from core.latency import resumo_latencias
+from core.usage import contexto_uso, novo_turno, relatorio, ORCAMENTO_SESSAO
+from core.cassette import registrar_turno
+from core.prompts import PROMPTS, versao
+from core import profiler
+from core.sessions import nova_sessao, abrir_sessao, listar_sessoes, sessao_atual
+from crews.events import descrever_evento
+from datetime import datetime
 
 # Inicializando o console do Rich e o aplicativo Typer
 console = Console()
@@ -41,6 +57,11 @@ COMANDOS = {
     "/limpar": "Limpa a tela do terminal",
     "/tema": "Muda o tema visual (padrão, escuro, claro, natureza)",
     "/verbose": "Ativa/desativa o modo verbose",
+    "/outbox": "Mostra a caixa de saída de emails",
+    "/metricas": "Mostra as métricas das chamadas à OpenAI e dos provedores",
+    "/uso": "Mostra o uso de tokens e o custo estimado",
+    "/sessao": "Sessões de conversa: /sessao nova|listar|abrir <nome>",
+    "/prompts": "Mostra os tokens de prompt por componente em cada chamada",
     "/sair": "Encerra o aplicativo"
 }
 
@@ -265,6 +286,317 @@ def configurar_email():
     Prompt.ask("[bold]Pressione Enter para voltar ao menu de configurações[/bold]")
     return
 
+def exibir_outbox():
+    """Exibe o estado da caixa de saída de emails."""
+    cores = get_tema()
+
+    resumo = resumo_status()
+    console.print(Panel(
+        f"[{cores['destaque']}]Pendentes:[/{cores['destaque']}] {resumo['pendente']}   "
+        f"[{cores['destaque']}]Enviando:[/{cores['destaque']}] {resumo['enviando']}   "
+        f"[{cores['secundaria']}]Enviados:[/{cores['secundaria']}] {resumo['enviado']}   "
+        f"[{cores['erro']}]Descartados:[/{cores['erro']}] {resumo['descartado']}",
+        title="Caixa de Saída",
+        border_style=cores['principal'],
+        expand=False,
+        box=box.ROUNDED
+    ))
+
+    mensagens = listar_mensagens()
+    if not mensagens:
+        return
+
+    tabela = Table(show_header=True, header_style=f"bold {cores['principal']}", box=box.ROUNDED, border_style=cores['principal'])
+    tabela.add_column("ID", style=cores['principal'])
+    tabela.add_column("Destinatário")
+    tabela.add_column("Assunto")
+    tabela.add_column("Status")
+    tabela.add_column("Tentativas")
+    tabela.add_column("Criado em")
+    tabela.add_column("Último erro")
+
+    for mensagem in mensagens:
+        tabela.add_row(
+            str(mensagem['id']),
+            escape(mensagem['destinatario']),
+            escape(mensagem['assunto']),
+            mensagem['status'],
+            str(mensagem['tentativas']),
+            datetime.fromtimestamp(mensagem['criado_em']).strftime("%d/%m %H:%M"),
+            escape(mensagem['ultimo_erro'] or "")
+        )
+
+    console.print(tabela)
+    console.print()
+
+def exibir_metricas():
+    """Exibe as métricas do governador, dos provedores e da latência por papel."""
+    cores = get_tema()
+    metricas = get_governor().metricas()
+
+    tabela = Table(show_header=True, header_style=f"bold {cores['principal']}", box=box.ROUNDED, border_style=cores['principal'])
+    tabela.add_column("Métrica", style=cores['principal'])
+    tabela.add_column("Valor")
+    tabela.add_row("Chamadas", str(metricas['chamadas']))
+    tabela.add_row("Respostas 429", str(metricas['limitadas']))
+    tabela.add_row("Novas tentativas", str(metricas['novas_tentativas']))
+    tabela.add_row("Espera média na fila", f"{metricas['espera_media']:.2f}s")
+    tabela.add_row("Espera p95 na fila", f"{metricas['espera_p95']:.2f}s")
+    tabela.add_row("Espera máxima na fila", f"{metricas['espera_maxima']:.2f}s")
+
+    console.print(Panel(tabela, title="Métricas da OpenAI", border_style=cores['principal'], expand=False, box=box.ROUNDED))
+
+    tabela = Table(show_header=True, header_style=f"bold {cores['principal']}", box=box.ROUNDED, border_style=cores['principal'])
+    tabela.add_column("Provedor", style=cores['principal'])
+    tabela.add_column("Endereço")
+    tabela.add_column("Disponível")
+    tabela.add_column("Latência média")
+    for provedor in get_registry().estado():
+        latencia = f"{provedor['latencia']:.2f}s" if provedor['latencia'] is not None else "-"
+        tabela.add_row(provedor['nome'], provedor['base_url'], "sim" if provedor['disponivel'] else "não", latencia)
+    console.print(Panel(tabela, title="Provedores", border_style=cores['principal'], expand=False, box=box.ROUNDED))
+
+    def segundos(valor):
+        return f"{valor:.2f}s" if valor is not None else "-"
+
+    tabela = Table(show_header=True, header_style=f"bold {cores['principal']}", box=box.ROUNDED, border_style=cores['principal'])
+    tabela.add_column("Papel", style=cores['principal'])
+    tabela.add_column("Modelo")
+    tabela.add_column("Endpoint")
+    tabela.add_column("Chamadas")
+    tabela.add_column("p50")
+    tabela.add_column("p95")
+    tabela.add_column("p99")
+    tabela.add_column("Timeout")
+    tabela.add_column("Timeouts")
+    tabela.add_column("Hedges (vencedores)")
+    for papel in resumo_latencias():
+        tabela.add_row(papel['papel'], papel['modelo'], papel['endpoint'], str(papel['chamadas']), segundos(papel['p50']), segundos(papel['p95']),
+                       segundos(papel['p99']), segundos(papel['timeout']), str(papel['timeouts']),
+                       f"{papel['hedges']} ({papel['hedges_vencedores']})")
+    console.print(Panel(tabela, title="Latência por papel, modelo e endpoint", border_style=cores['principal'], expand=False, box=box.ROUNDED))
+    console.print()
+
+def exibir_uso():
+    """Exibe o relatório de uso de tokens e custo estimado."""
+    cores = get_tema()
+    dados = relatorio()
+
+    tabela = Table(show_header=True, header_style=f"bold {cores['principal']}", box=box.ROUNDED, border_style=cores['principal'])
+    tabela.add_column("Período", style=cores['principal'])
+    tabela.add_column("Chamadas")
+    tabela.add_column("Tokens de entrada")
+    tabela.add_column("Tokens de saída")
+    tabela.add_column("Custo (US$)")
+    for linha in dados['resumo']:
+        tabela.add_row(linha['periodo'], str(linha['chamadas']), str(linha['tokens_entrada']),
+                       str(linha['tokens_saida']), f"{linha['custo']:.4f}")
+    console.print(Panel(tabela, title="Uso", border_style=cores['principal'], expand=False, box=box.ROUNDED))
+
+    if dados['por_crew']:
+        tabela = Table(show_header=True, header_style=f"bold {cores['principal']}", box=box.ROUNDED, border_style=cores['principal'])
+        tabela.add_column("Crew", style=cores['principal'])
+        tabela.add_column("Chamadas")
+        tabela.add_column("Tokens")
+        tabela.add_column("Custo (US$)")
+        for linha in dados['por_crew']:
+            tabela.add_row(linha['crew'], str(linha['chamadas']),
+                           str(linha['tokens_entrada'] + linha['tokens_saida']), f"{linha['custo']:.4f}")
+        console.print(Panel(tabela, title="Sessão por crew", border_style=cores['principal'], expand=False, box=box.ROUNDED))
+
+    if ORCAMENTO_SESSAO > 0:
+        gasto_sessao = dados['resumo'][0]['custo']
+        console.print(f"[{cores['destaque']}]Orçamento da sessão: US$ {gasto_sessao:.4f} de US$ {ORCAMENTO_SESSAO:.2f}[/{cores['destaque']}]")
+    console.print()
+
+def exibir_perfil_prompts():
+    """Exibe a média de tokens de prompt por componente e as últimas chamadas da sessão."""
+    cores = get_tema()
+    colunas = {
+        "sistema": "Sistema", "backstory": "Backstory", "goal": "Goal", "tarefa": "Tarefa",
+        "esquemas_ferramentas": "Ferramentas", "saidas_ferramentas": "Saídas", "historico": "Histórico",
+    }
+
+    tabela = Table(show_header=True, header_style=f"bold {cores['principal']}", box=box.ROUNDED, border_style=cores['principal'])
+    tabela.add_column("Origem", style=cores['principal'])
+    tabela.add_column("Prompts")
+    tabela.add_column("Chamadas")
+    for titulo in colunas.values():
+        tabela.add_column(titulo, justify="right")
+    tabela.add_column("Total", justify="right")
+    for linha in profiler.relatorio():
+        tabela.add_row(linha['origem'], linha['prompt'], str(linha['chamadas']),
+                       *(f"{linha[c]:.0f}" for c in colunas), f"{sum(linha[c] for c in colunas):.0f}")
+    console.print(Panel(tabela, title="Tokens de prompt por chamada (média)", border_style=cores['principal'], expand=False, box=box.ROUNDED))
+
+    ultimas = profiler.ultimas_chamadas(5)
+    if ultimas:
+        tabela = Table(show_header=True, header_style=f"bold {cores['principal']}", box=box.ROUNDED, border_style=cores['principal'])
+        tabela.add_column("Horário", style=cores['principal'])
+        tabela.add_column("Origem")
+        tabela.add_column("Modelo")
+        for titulo in colunas.values():
+            tabela.add_column(titulo, justify="right")
+        for linha in ultimas:
+            tabela.add_row(datetime.fromtimestamp(linha['criado_em']).strftime("%H:%M:%S"), linha['origem'],
+                           linha['modelo'], *(str(linha[c]) for c in colunas))
+        console.print(Panel(tabela, title="Últimas chamadas", border_style=cores['principal'], expand=False, box=box.ROUNDED))
+
+    em_uso = ", ".join(versao(nome) for nome in PROMPTS)
+    console.print(f"[{cores['secundaria']}]Prompts em uso: {em_uso}. "
+                  f"Para a variante compacta, use \"prompts_variantes\": {{\"search\": \"compacto\"}} na configuração.[/{cores['secundaria']}]")
+    console.print()
+
+def gerenciar_sessao(argumentos):
+    """Cria, lista ou abre sessões de conversa persistentes."""
+    cores = get_tema()
+    partes = argumentos.split()
+    subcomando = partes[0].lower() if partes else ""
+
+    if subcomando == "listar":
+        sessoes = listar_sessoes()
+        if not sessoes:
+            console.print(f"[{cores['destaque']}]Nenhuma sessão salva. Use /sessao nova <nome>.[/{cores['destaque']}]")
+            return
+        atual = sessao_atual()
+        tabela = Table(show_header=True, header_style=f"bold {cores['principal']}", box=box.ROUNDED, border_style=cores['principal'])
+        tabela.add_column("Sessão", style=cores['principal'])
+        tabela.add_column("Mensagens")
+        tabela.add_column("Tamanho")
+        tabela.add_column("Atualizada em")
+        for sessao in sessoes:
+            nome = f"{sessao['nome']} (atual)" if atual and atual.nome == sessao['nome'] else sessao['nome']
+            tabela.add_row(nome, str(sessao['mensagens']), f"{sessao['tamanho'] / 1024:.1f} KB",
+                           datetime.fromtimestamp(sessao['atualizada']).strftime("%d/%m/%Y %H:%M"))
+        console.print(Panel(tabela, title="Sessões", border_style=cores['principal'], expand=False, box=box.ROUNDED))
+        return
+
+    if subcomando in ("nova", "abrir"):
+        nome = partes[1] if len(partes) > 1 else None
+        if subcomando == "nova" and nome is None:
+            nome = datetime.now().strftime("sessao-%Y%m%d-%H%M%S")
+        if nome is None:
+            console.print(f"[{cores['erro']}]Informe o nome da sessão. Exemplo: /sessao abrir trabalho[/{cores['erro']}]")
+            return
+        try:
+            sessao = nova_sessao(nome) if subcomando == "nova" else abrir_sessao(nome)
+        except ValueError as e:
+            console.print(f"[{cores['erro']}]{escape(str(e))}[/{cores['erro']}]")
+            return
+        # A sessão aberta é retomada automaticamente na próxima execução
+        atualizar_configuracao("sessao_atual", sessao.nome)
+        salvar_configuracoes(CONFIG)
+        acao = "criada" if subcomando == "nova" else f"aberta ({sessao.total} mensagens)"
+        console.print(f"[{cores['principal']}]Sessão '{sessao.nome}' {acao}.[/{cores['principal']}]")
+        return
+
+    atual = sessao_atual()
+    if atual:
+        console.print(f"[{cores['principal']}]Sessão atual: {atual.nome} ({atual.total} mensagens)[/{cores['principal']}]")
+    else:
+        console.print(f"[{cores['destaque']}]Nenhuma sessão aberta: cada mensagem é tratada de forma independente.[/{cores['destaque']}]")
+    console.print(f"[{cores['secundaria']}]Use /sessao nova [nome], /sessao listar ou /sessao abrir <nome>.[/{cores['secundaria']}]")
+
+def mensagem_erro_api(erro):
+    """Texto exibido quando uma chamada à OpenAI falha depois das novas tentativas."""
+    if isinstance(erro, APITimeoutError):
+        return "A OpenAI não respondeu dentro do tempo limite. Tente novamente."
+    if isinstance(erro, APIConnectionError):
+        return "Não foi possível conectar à OpenAI. Verifique a conexão e tente novamente."
+    return str(erro)
+
+def executar_turno(entrada, cores, on_event=None):
+    """
+    Processa uma entrada em linguagem natural: consulta o roteador e, se necessário,
+    executa o crew ou o plano correspondente. Um Ctrl+C durante a execução cancela
+    apenas o turno atual.
+
+    Returns:
+        O texto a ser exibido ao usuário
+    """
+    # Grava o turno quando o modo de gravação (cassete) está ativo
+    registrar_turno(entrada)
+
+    # Associa as chamadas deste turno ao relatório de uso
+    with contexto_uso(turno=novo_turno()):
+        # Inicializa o gerenciador de chat e de crews
+        chat_manager = ChatManager()
+        crew_manager = CrewManager(pool=get_pool(), on_event=on_event)
+
+        sessao = sessao_atual()
+        resposta = None
+        try:
+            # Sem sessão aberta, cada turno começa sem histórico para evitar interferência;
+            # com uma sessão, o roteador recebe apenas a janela de contexto recente
+            chat_manager.reset_conversation()
+            if sessao is not None:
+                for mensagem in sessao.contexto():
+                    chat_manager.add_message(mensagem['role'], mensagem['content'])
+            result = chat_manager.handle_user_input(entrada)
+
+            # Verifica o tipo de ação a ser tomada
+            if result['action'] == 'direct_response':
+                resposta = result['response']
+            elif result['action'] == 'use_crew':
+                # Utiliza um crew específico
+                crew_result = crew_manager.execute_crew(result['crew_type'], entrada)
+                resposta = crew_result['result']
+            elif result['action'] == 'use_plan':
+                # Executa um plano com várias etapas (crews independentes em paralelo)
+                plan_result = crew_manager.execute_plan(result.get('plan') or [])
+                resposta = plan_result['result']
+        except (ValueError, CrewWorkerError) as e:
+            return f"[bold {cores['erro']}]Erro:[/bold {cores['erro']}] {str(e)}"
+        except APIError as e:
+            # Timeout ou falha da API: encerra apenas este turno, a sessão continua
+            return f"[bold {cores['erro']}]Erro:[/bold {cores['erro']}] {escape(mensagem_erro_api(e))}"
+        except KeyboardInterrupt:
+            crew_manager.cancel()
+            return f"[bold {cores['destaque']}]Execução cancelada pelo usuário.[/bold {cores['destaque']}]"
+
+        if sessao is not None and resposta is not None:
+            sessao.registrar_turno(entrada, str(resposta))
+
+    return resposta
+
+class LinhaDoTempo:
+    """
+    Linha do tempo compacta dos eventos de progresso dos crews, exibida no loader.
+    Mostra as últimas linhas e a duração de cada ferramenta e tarefa concluída.
+    """
+
+    MAX_LINHAS = 8
+
+    def __init__(self, cores):
+        self.cores = cores
+        self.inicio = time.monotonic()
+        self.linhas = []
+        self._lock = threading.Lock()
+
+    def adicionar(self, evento) -> bool:
+        """Registra o evento e retorna True se a linha do tempo mudou."""
+        texto = descrever_evento(evento)
+        if texto is None:
+            return False
+        decorrido = time.monotonic() - self.inicio
+        concluido = evento["tipo"] in ("ferramenta_concluida", "tarefa_concluida", "crew_concluido")
+        with self._lock:
+            self.linhas.append((decorrido, texto, concluido, bool(evento.get("erro"))))
+            del self.linhas[:-self.MAX_LINHAS]
+        return True
+
+    def renderizar(self) -> str:
+        cores = self.cores
+        with self._lock:
+            linhas = list(self.linhas)
+        partes = []
+        for decorrido, texto, concluido, erro in linhas:
+            estilo = cores['erro'] if erro else (cores['secundaria'] if concluido else cores['destaque'])
+            marcador = "✓" if concluido and not erro else ("✗" if erro else "›")
+            partes.append(f"[dim]{decorrido:5.1f}s[/dim] [{estilo}]{marcador} {escape(texto)}[/{estilo}]")
+        partes.append("[dim]Ctrl+C cancela[/dim]")
+        return "\n".join(partes)
+
 def processar_entrada(entrada):
     # Se a entrada estiver vazia, simplesmente retorna sem fazer nada
     # Isso evita que o programa pule para a próxima linha quando o usuário apenas aperta Enter
@@ -283,6 +615,16 @@ def processar_entrada(entrada):
         exibir_info_env()
     elif entrada_lower == "/limpar":
         limpar_tela()
+    elif entrada_lower == "/outbox":
+        exibir_outbox()
+    elif entrada_lower == "/metricas":
+        exibir_metricas()
+    elif entrada_lower == "/uso":
+        exibir_uso()
+    elif entrada_lower == "/prompts":
+        exibir_perfil_prompts()
+    elif entrada_lower == "/sessao" or entrada_lower.startswith("/sessao "):
+        gerenciar_sessao(entrada.strip()[len("/sessao"):])
     elif entrada_lower == "/verbose":
         # Alternar o modo verbose
         from config.settings import VERBOSE_MODE
@@ -311,46 +653,16 @@ def processar_entrada(entrada):
         # Verifica se o modo verbose está ativado
         from config.settings import VERBOSE_MODE        # Se verbose estiver ativo, executar sem mostrar o loader
         if VERBOSE_MODE:
-            # Inicializa o gerenciador de chat e de crews
-            chat_manager = ChatManager()
-            crew_manager = CrewManager()
-
-            # Limpa o histórico de conversas anteriores para evitar interferência
-            chat_manager.reset_conversation()
-            result = chat_manager.handle_user_input(entrada)
-
-            # Define as cores para a resposta
-            # Verifica o tipo de ação a ser tomada
-            if result['action'] == 'direct_response':
-                result_to_print = result['response']
-            elif result['action'] == 'use_crew':
-                # Utiliza um crew específico
-                try:
-                    crew_result = crew_manager.execute_crew(result['crew_type'], entrada)
-                    result_to_print = crew_result['result']
-                except ValueError as e:
-                    result_to_print = f"[bold {cores['erro']}]Erro:[/bold {cores['erro']}] {str(e)}"
+            result_to_print = executar_turno(entrada, cores) or result_to_print
         else:
-            # Com o modo verbose desativado, mostra o loader
-            with Status("", spinner="dots"):                # Inicializa o gerenciador de chat e de crews
-                chat_manager = ChatManager()
-                crew_manager = CrewManager()
-
-                # Limpa o histórico de conversas anteriores para evitar interferência
-                chat_manager.reset_conversation()
-                result = chat_manager.handle_user_input(entrada)
-
-                # Define as cores para a resposta
-                # Verifica o tipo de ação a ser tomada
-                if result['action'] == 'direct_response':
-                    result_to_print = result['response']
-                elif result['action'] == 'use_crew':
-                    # Utiliza um crew específico
-                    try:
-                        crew_result = crew_manager.execute_crew(result['crew_type'], entrada)
-                        result_to_print = crew_result['result']
-                    except ValueError as e:
-                        result_to_print = f"[bold {cores['erro']}]Erro:[/bold {cores['erro']}] {str(e)}"
+            # Com o modo verbose desativado, mostra o loader com a linha do tempo dos crews
+            linha_do_tempo = LinhaDoTempo(cores)
+            with Status("", spinner="dots") as status:
+                def atualizar_status(evento):
+                    if linha_do_tempo.adicionar(evento):
+                        status.update(linha_do_tempo.renderizar())
+
+                result_to_print = executar_turno(entrada, cores, on_event=atualizar_status) or result_to_print
 
         console.print(Panel(
             f"[italic]{result_to_print}[/]",
@@ -501,11 +813,25 @@ def exibir_boas_vindas():
         border_style=cores['secundaria'],
         box=box.ROUNDED
     ))
+    sessao = sessao_atual()
+    if sessao is not None:
+        console.print(f"[{cores['principal']}]Sessão '{sessao.nome}' retomada ({sessao.total} mensagens).[/{cores['principal']}]")
     console.print()
 
 def main():
     limpar_tela()
 
+    # Inicia a entrega em segundo plano dos emails da caixa de saída
+    iniciar_worker()
+    # Pré-aquece os processos que executam os crews
+    get_pool()
+    # Retoma a última sessão aberta (lê apenas o snapshot e a cauda do log)
+    if CONFIG.get("sessao_atual"):
+        try:
+            abrir_sessao(CONFIG["sessao_atual"])
+        except ValueError:
+            atualizar_configuracao("sessao_atual", None)
+
     # Exibe tela de boas-vindas estilizada
     exibir_boas_vindas()
     # Exibe menu principal com tabela de comandos
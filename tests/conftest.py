@@ -0,0 +1,14 @@
+# Configuração comum dos testes: diretório de configuração isolado e sem chamadas externas
+import os
+import sys
+import tempfile
+
+# Precisa vir antes de qualquer import do aplicativo (config.settings lê o HOME ao ser importado)
+_HOME = tempfile.mkdtemp(prefix="assist-testes-")
+os.environ["HOME"] = os.environ["USERPROFILE"] = _HOME
+os.environ["OPENAI_API_KEY"] = "sk-teste-local"
+os.environ["ASSIST_CASSETTE_MODO"] = "desligado"
+os.environ.pop("OPENAI_BASE_URL", None)
+os.environ.pop("OPENAI_API_BASE", None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,104 @@
+# Cassete: um registro por requisição do cliente, mesmo com novas tentativas e hedging
+import json
+import threading
+import time
+
+import httpx
+import pytest
+
+from core import cassette, transport
+from core.governor import Governor
+from core.latency import LatencyTracker
+from core.providers import ProviderRegistry
+from core.transport import OpenAITransport
+
+CORPO = {"model": "gpt-4o", "messages": [{"role": "user", "content": "escreva para ana@empresa.com"}]}
+
+
+def _resposta(conteudo: str, status: int = 200) -> httpx.Response:
+    dados = {"id": "chatcmpl-teste", "object": "chat.completion", "model": "gpt-4o",
+             "choices": [{"index": 0, "message": {"role": "assistant", "content": conteudo}, "finish_reason": "stop"}]}
+    return httpx.Response(status, headers={"content-type": "application/json"},
+                          stream=httpx.ByteStream(json.dumps(dados).encode("utf-8")))
+
+
+@pytest.fixture
+def arquivo(tmp_path, monkeypatch):
+    caminho = str(tmp_path / "sessao.cassete.gz")
+    monkeypatch.setattr(cassette, "ARQUIVO", caminho)
+    monkeypatch.setattr(cassette, "MODO", "gravar")
+    monkeypatch.setattr(cassette, "_reprodutor", None)
+    return caminho
+
+
+def _cliente(papel, responder, latencias=None, monkeypatch=None):
+    if latencias is not None:
+        monkeypatch.setattr(transport, "get_tracker", lambda *args: latencias)
+    registry = ProviderRegistry(provedores={"stub": {"base_url": "http://stub.local/v1", "api_key": "a"}},
+                                papeis={"padrao": ["stub"]}, estrategia="failover")
+    return httpx.Client(transport=OpenAITransport(
+        papel, inner=httpx.MockTransport(responder), governor=Governor(rpm=10_000, tpm=10_000_000),
+        providers=registry, max_tentativas=2,
+    ))
+
+
+def _registros_http(caminho):
+    return [r for r in cassette.ler_cassete(caminho) if r["tipo"] == "http"]
+
+
+def test_hedge_gera_um_unico_registro(arquivo, monkeypatch):
+    latencias = LatencyTracker("search")
+    for _ in range(20):
+        latencias.registrar(0.01)
+    chamadas = []
+    lock = threading.Lock()
+
+    def responder(request):
+        with lock:
+            chamadas.append(request)
+            primeira = len(chamadas) == 1
+        if primeira:
+            time.sleep(0.3)
+            return _resposta("lenta")
+        return _resposta("copia")
+
+    cliente = _cliente("search", responder, latencias, monkeypatch)
+    response = cliente.post("https://api.openai.com/v1/chat/completions", json=CORPO)
+    assert response.json()["choices"][0]["message"]["content"] == "copia"
+    assert latencias.hedges == 1
+
+    time.sleep(0.4)  # a chamada descartada termina depois
+    assert len(chamadas) == 2
+    registros = _registros_http(arquivo)
+    assert len(registros) == 1
+    assert json.loads(registros[0]["resposta"])["choices"][0]["message"]["content"] == "copia"
+
+
+def test_nova_tentativa_grava_so_a_resposta_final(arquivo, monkeypatch):
+    monkeypatch.setattr(transport, "ESPERA_BASE", 0.01)
+    status = iter([503, 200])
+    cliente = _cliente("email", lambda request: _resposta("ok", next(status)))
+
+    response = cliente.post("https://api.openai.com/v1/chat/completions", json=CORPO)
+    assert response.status_code == 200
+
+    registros = _registros_http(arquivo)
+    assert [r["status"] for r in registros] == [200]
+    assert registros[0]["caminho"] == "/v1/chat/completions"
+    assert "ana@empresa.com" not in registros[0]["requisicao"]
+
+
+def test_reproducao_usa_a_gravacao_sem_rede(arquivo, monkeypatch):
+    cliente = _cliente("email", lambda request: _resposta("gravada"))
+    cliente.post("https://api.openai.com/v1/chat/completions", json=CORPO)
+
+    monkeypatch.setattr(cassette, "MODO", "reproduzir")
+
+    def sem_rede(request):
+        raise AssertionError("a reprodução não deve acessar a rede")
+
+    cliente = _cliente("email", sem_rede)
+    response = cliente.post("https://api.openai.com/v1/chat/completions", json=CORPO)
+    assert response.json()["choices"][0]["message"]["content"] == "gravada"
+    # Sem gravação correspondente, a resposta é 599
+    assert cliente.post("https://api.openai.com/v1/chat/completions", json=CORPO).status_code == 599
@@ -0,0 +1,103 @@
+# Caminho rápido do crew de email: extração do destinatário e volta ao crew completo
+import json
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("crewai")
+
+from crews.email import crew as email_crew
+from crews.email.crew import extract_recipients, extract_single_recipient, run_email_fast_path
+from crews.planner import montar_entrada
+
+
+class _ClienteFalso:
+    """
+    Cliente da OpenAI que devolve sempre o mesmo rascunho e guarda as chamadas.
+    """
+
+    def __init__(self, rascunho=None, erro=None):
+        self.chamadas = []
+        self.rascunho = rascunho or {"subject": "Reunião", "body": "A reunião está confirmada."}
+        self.erro = erro
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._criar))
+
+    def _criar(self, **kwargs):
+        self.chamadas.append(kwargs)
+        if self.erro is not None:
+            raise self.erro
+        mensagem = SimpleNamespace(content=json.dumps(self.rascunho))
+        return SimpleNamespace(choices=[SimpleNamespace(message=mensagem)])
+
+
+@pytest.fixture
+def caminho_rapido(monkeypatch):
+    cliente = _ClienteFalso()
+    enfileirados = []
+    monkeypatch.setattr(email_crew, "get_openai_client", lambda papel="padrao": cliente)
+    monkeypatch.setattr(email_crew, "enfileirar",
+                        lambda recipient, subject, body: enfileirados.append((recipient, subject, body)) or (1, True))
+    return cliente, enfileirados
+
+
+def test_extrai_enderecos_sem_repeticao():
+    assert extract_recipients("a@x.com, b@y.com e A@x.com.") == ["a@x.com", "b@y.com"]
+
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("Mande um email para pessoa@exemplo.com dizendo oi.", "pessoa@exemplo.com"),
+    ("envie para: chefe@empresa.com.br", "chefe@empresa.com.br"),
+    ("send an email to bob@example.org saying hi", "bob@example.org"),
+    ("para a@x.com o contato de b@y.com", None),
+    ("fale com a@x.com sobre o projeto", None),
+    ("mande um email para o meu chefe", None),
+])
+def test_destinatario_unico(texto, esperado):
+    assert extract_single_recipient(texto) == esperado
+
+
+def test_envia_para_o_destinatario_da_instrucao(caminho_rapido):
+    cliente, enfileirados = caminho_rapido
+    resultado = run_email_fast_path("Mande um email para pessoa@exemplo.com dizendo que a reunião está confirmada")
+
+    assert "enfileirado" in resultado
+    assert enfileirados == [("pessoa@exemplo.com", "Reunião", "A reunião está confirmada.")]
+    assert len(cliente.chamadas) == 1
+
+
+def test_ambiguo_volta_para_o_crew_sem_chamar_a_openai(caminho_rapido):
+    cliente, enfileirados = caminho_rapido
+    assert run_email_fast_path("para a@x.com o contato de b@y.com") is None
+    assert cliente.chamadas == [] and enfileirados == []
+
+
+def test_ignora_enderecos_dos_resultados_de_etapas_anteriores(caminho_rapido):
+    cliente, enfileirados = caminho_rapido
+    etapa = {"id": "p2", "input": "envie para chefe@empresa.com um resumo", "depends_on": ["p1"]}
+    entrada = montar_entrada(etapa, {"p1": "Contato da imprensa: imprensa@site.com"})
+
+    run_email_fast_path(entrada)
+
+    assert [destinatario for destinatario, _, _ in enfileirados] == ["chefe@empresa.com"]
+    # O rascunho ainda recebe os resultados anteriores, que formam o conteúdo do email
+    assert "imprensa@site.com" in cliente.chamadas[0]["messages"][1]["content"]
+
+
+def test_instrucao_sem_destinatario_nao_usa_enderecos_dos_resultados(caminho_rapido):
+    cliente, enfileirados = caminho_rapido
+    etapa = {"id": "p2", "input": "mande o resumo para o meu chefe", "depends_on": ["p1"]}
+    assert run_email_fast_path(montar_entrada(etapa, {"p1": "escreva para contato@site.com"})) is None
+    assert enfileirados == []
+
+
+@pytest.mark.parametrize("cliente", [
+    _ClienteFalso(erro=RuntimeError("falha na API")),
+    _ClienteFalso(rascunho={"subject": "", "body": "sem assunto"}),
+])
+def test_falha_na_redacao_volta_para_o_crew(monkeypatch, cliente):
+    enfileirados = []
+    monkeypatch.setattr(email_crew, "get_openai_client", lambda papel="padrao": cliente)
+    monkeypatch.setattr(email_crew, "enfileirar", lambda *args: enfileirados.append(args) or (1, True))
+
+    assert run_email_fast_path("mande um email para a@x.com dizendo oi") is None
+    assert enfileirados == []
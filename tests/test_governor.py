@@ -0,0 +1,56 @@
+# Governador: ordem de entrada por prioridade quando as vagas estão ocupadas
+import threading
+import time
+
+from core.governor import INTERATIVO, LOTE, Governor, prioridade, prioridade_atual
+
+
+def _aguardar(condicao, limite=2.0):
+    fim = time.monotonic() + limite
+    while not condicao():
+        assert time.monotonic() < fim, "tempo esgotado"
+        time.sleep(0.01)
+
+
+def test_prioridade_padrao_e_restaurada():
+    assert prioridade_atual() == INTERATIVO
+    with prioridade(LOTE):
+        assert prioridade_atual() == LOTE
+    assert prioridade_atual() == INTERATIVO
+
+
+def test_interativo_entra_antes_do_lote_que_aguardava():
+    governor = Governor(rpm=10_000, tpm=10_000_000, concorrencia=1)
+    limite = governor._limite("gpt-4o")
+    ordem = []
+
+    def chamar(nivel):
+        with prioridade(nivel), governor.vaga("gpt-4o", 10):
+            ordem.append(nivel)
+
+    with governor.vaga("gpt-4o", 10):
+        # O lote chega primeiro à fila; o turno interativo chega depois
+        lote = threading.Thread(target=chamar, args=(LOTE,))
+        lote.start()
+        _aguardar(lambda: limite.esperando[LOTE] == 1)
+        interativo = threading.Thread(target=chamar, args=(INTERATIVO,))
+        interativo.start()
+        _aguardar(lambda: limite.esperando[INTERATIVO] == 1)
+
+    lote.join(2)
+    interativo.join(2)
+    assert ordem == [INTERATIVO, LOTE]
+
+
+def test_vaga_opcional_nao_fura_a_fila():
+    governor = Governor(rpm=10_000, tpm=10_000_000, concorrencia=2)
+    limite = governor._limite("gpt-4o")
+    assert governor.tentar_vaga("gpt-4o", 10)
+    assert governor.tentar_vaga("gpt-4o", 10)
+    assert not governor.tentar_vaga("gpt-4o", 10)
+    governor.liberar_vaga("gpt-4o")
+    limite.esperando[LOTE] += 1
+    # Com alguém aguardando, a vaga livre fica para quem está na fila
+    assert not governor.tentar_vaga("gpt-4o", 10)
+    limite.esperando[LOTE] -= 1
+    assert governor.tentar_vaga("gpt-4o", 10)
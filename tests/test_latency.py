@@ -0,0 +1,66 @@
+# Timeouts adaptativos e limite de hedging por papel, modelo e endpoint
+import pytest
+
+from core import latency
+from core.latency import LatencyTracker, get_tracker
+
+
+def _tracker(papel="search", amostras=(), timeouts=0):
+    tracker = LatencyTracker(papel, "gpt-4o", "/chat/completions")
+    for amostra in amostras:
+        tracker.registrar(amostra)
+    for _ in range(timeouts):
+        tracker.registrar_timeout(latency.TIMEOUT_MAXIMO)
+    return tracker
+
+
+def test_timeout_inicial_sem_amostras_suficientes():
+    tracker = _tracker(amostras=[1.0] * (latency.AMOSTRAS_MINIMAS - 1))
+    assert tracker.timeout() == latency.TIMEOUT_INICIAL
+    assert tracker.atraso_hedge() is None
+
+
+@pytest.mark.parametrize("latencia, esperado", [
+    (0.1, latency.TIMEOUT_MINIMO),
+    (10.0, 10.0 * latency.TIMEOUT_FATOR),
+    (500.0, latency.TIMEOUT_MAXIMO),
+])
+def test_timeout_e_p99_vezes_fator_dentro_dos_limites(latencia, esperado):
+    assert _tracker(amostras=[latencia] * 40).timeout() == pytest.approx(esperado)
+
+
+def test_timeout_acompanha_a_cauda():
+    tracker = _tracker(amostras=[1.0] * 95 + [20.0] * 5)
+    assert tracker.timeout() == pytest.approx(20.0 * latency.TIMEOUT_FATOR)
+
+
+def test_timeouts_entram_na_janela():
+    tracker = _tracker(amostras=[1.0] * 30, timeouts=2)
+    assert tracker.timeouts == 2 and tracker.chamadas == 32
+    assert tracker.timeout() == latency.TIMEOUT_MAXIMO
+
+
+def test_hedge_so_em_papeis_idempotentes():
+    assert _tracker("email", amostras=[1.0] * 40).atraso_hedge() is None
+    assert _tracker("search", amostras=[1.0] * 40).atraso_hedge() == pytest.approx(1.0)
+
+
+def test_hedge_limitado_a_fracao_das_chamadas():
+    tracker = _tracker(amostras=[1.0] * 40)
+    limite = int(latency.HEDGE_MAX_FRACAO * 40)
+    for _ in range(limite):
+        assert tracker.atraso_hedge() is not None
+        tracker.registrar_hedge(venceu=True)
+    assert tracker.atraso_hedge() is None
+
+    # Novas chamadas liberam hedges de novo, sempre dentro da fração
+    for _ in range(int(1 / latency.HEDGE_MAX_FRACAO)):
+        tracker.registrar(1.0)
+    assert tracker.atraso_hedge() is not None
+    assert tracker.hedges <= latency.HEDGE_MAX_FRACAO * tracker.chamadas
+
+
+def test_janelas_separadas_por_modelo_e_endpoint():
+    assert get_tracker("teste-latencia", "gpt-4o", "/responses") is get_tracker("teste-latencia", "gpt-4o", "/responses")
+    assert get_tracker("teste-latencia", "gpt-4o", "/responses") is not get_tracker("teste-latencia", "gpt-4o", "/chat/completions")
+    assert get_tracker("teste-latencia", "gpt-4o", "/responses") is not get_tracker("teste-latencia", "gpt-3.5-turbo", "/responses")
@@ -0,0 +1,65 @@
+# As chamadas dos agentes do CrewAI precisam passar pelo transporte governado
+import json
+
+import httpx
+import pytest
+
+pytest.importorskip("crewai")
+
+from core import transport
+from core.transport import OpenAITransport
+
+
+def _resposta_chat(conteudo: str) -> httpx.Response:
+    dados = {
+        "id": "chatcmpl-teste", "object": "chat.completion", "created": 0, "model": "gpt-4o",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": conteudo}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 5, "completion_tokens": 2, "total_tokens": 7},
+    }
+    return httpx.Response(200, headers={"content-type": "application/json"},
+                          stream=httpx.ByteStream(json.dumps(dados).encode("utf-8")))
+
+
+def test_agente_usa_transporte_governado(monkeypatch):
+    from crewai import Agent, Crew, Task
+    from config.llms import get_gpt40
+
+    chamadas = []
+
+    def responder(request: httpx.Request) -> httpx.Response:
+        chamadas.append(json.loads(request.read()))
+        return _resposta_chat("Thought: pronto\nFinal Answer: feito")
+
+    cliente = transport.get_http_client("teste-agente")
+    assert isinstance(cliente._transport, OpenAITransport)
+    monkeypatch.setattr(cliente._transport, "inner", httpx.MockTransport(responder))
+
+    llm = get_gpt40(papel="teste-agente")
+    agente = Agent(role="r", goal="g", backstory="b", llm=llm, verbose=False)
+    # O CrewAI não pode trocar o LLM por outro sem o cliente HTTP do papel
+    assert agente.llm is llm
+
+    tarefa = Task(description="diga feito", expected_output="feito", agent=agente)
+    resultado = Crew(agents=[agente], tasks=[tarefa]).kickoff()
+
+    assert "feito" in str(resultado)
+    assert chamadas and chamadas[0]["model"] == "gpt-4o"
+
+
+def test_chamadas_assincronas_usam_transporte_governado(monkeypatch):
+    import asyncio
+    from config.llms import get_gpt35
+
+    chamadas = []
+
+    def responder(request: httpx.Request) -> httpx.Response:
+        chamadas.append(json.loads(request.read()))
+        return _resposta_chat("olá")
+
+    monkeypatch.setattr(transport.get_transport("teste-assincrono"), "inner", httpx.MockTransport(responder))
+
+    llm = get_gpt35(papel="teste-assincrono")
+    resposta = asyncio.run(llm.acall([{"role": "user", "content": "oi"}]))
+
+    assert "olá" in str(resposta)
+    assert len(chamadas) == 1 and chamadas[0]["model"] == "gpt-3.5-turbo"
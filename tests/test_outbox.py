@@ -0,0 +1,141 @@
+# Caixa de saída: idempotência, posse durante a entrega, novas tentativas e descarte
+import threading
+import time
+
+import pytest
+
+from crews.email import outbox
+
+
+@pytest.fixture(autouse=True)
+def banco(tmp_path, monkeypatch):
+    caminho = str(tmp_path / "outbox.db")
+    monkeypatch.setattr(outbox, "OUTBOX_DB", caminho)
+    monkeypatch.setattr(outbox, "_worker", None)
+    return caminho
+
+
+def _mensagem(message_id: int) -> dict:
+    with outbox._conectar() as conn:
+        return dict(conn.execute("SELECT * FROM mensagens WHERE id = ?", (message_id,)).fetchone())
+
+
+def _vencer(message_id: int):
+    """Antecipa a próxima tentativa da mensagem, como se o intervalo já tivesse passado."""
+    with outbox._conectar() as conn:
+        conn.execute("UPDATE mensagens SET proxima_tentativa = ? WHERE id = ?", (time.time() - 1, message_id))
+
+
+def _falhar(*args):
+    raise ConnectionError("servidor SMTP indisponível")
+
+
+def test_enfileirar_e_idempotente():
+    primeiro, criado = outbox.enfileirar("a@x.com", "Oi", "corpo")
+    segundo, criado_de_novo = outbox.enfileirar("A@x.com ", "Oi", "corpo")
+    assert criado and not criado_de_novo
+    assert primeiro == segundo
+
+
+def test_enfileirar_concorrente_cria_uma_mensagem(monkeypatch):
+    conectar = outbox.sqlite3.connect
+
+    def conectar_lento(*args, **kwargs):
+        # Alarga o intervalo entre a verificação e a inserção
+        conn = conectar(*args, **kwargs)
+        conn.set_trace_callback(lambda sql: sql.startswith("INSERT") and time.sleep(0.05))
+        return conn
+
+    monkeypatch.setattr(outbox.sqlite3, "connect", conectar_lento)
+    barreira = threading.Barrier(8)
+    resultados = []
+
+    def enfileirar():
+        barreira.wait()
+        resultados.append(outbox.enfileirar("a@x.com", "Oi", "corpo"))
+
+    threads = [threading.Thread(target=enfileirar) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({message_id for message_id, _ in resultados}) == 1
+    assert sum(criado for _, criado in resultados) == 1
+    assert outbox.resumo_status()[outbox.PENDENTE] == 1
+
+
+def test_entrega_com_sucesso():
+    entregues = []
+    message_id, _ = outbox.enfileirar("a@x.com", "Oi", "corpo")
+
+    assert outbox.processar_pendentes(lambda *args: entregues.append(args)) == 1
+    assert entregues == [("a@x.com", "Oi", "corpo")]
+    mensagem = _mensagem(message_id)
+    assert mensagem["status"] == outbox.ENVIADO and mensagem["tentativas"] == 1
+
+
+def test_mensagem_em_entrega_nao_e_pega_por_outro_processo():
+    entregues = []
+    message_id, _ = outbox.enfileirar("a@x.com", "Oi", "corpo")
+
+    def entregar(*args):
+        # Enquanto esta entrega está em andamento a mensagem pertence a este consumidor
+        assert _mensagem(message_id)["status"] == outbox.ENVIANDO
+        assert not outbox._reservar(message_id)
+        assert outbox.processar_pendentes(lambda *a: entregues.append(("outro",) + a)) == 0
+        entregues.append(args)
+
+    assert outbox.processar_pendentes(entregar) == 1
+    assert entregues == [("a@x.com", "Oi", "corpo")]
+
+
+def test_posse_vencida_volta_para_a_fila():
+    entregues = []
+    message_id, _ = outbox.enfileirar("a@x.com", "Oi", "corpo")
+    assert outbox._reservar(message_id)
+    # Processo interrompido durante a entrega: a posse não é devolvida
+    assert outbox.processar_pendentes(lambda *args: entregues.append(args)) == 0
+
+    _vencer(message_id)
+    assert outbox.processar_pendentes(lambda *args: entregues.append(args)) == 1
+    assert _mensagem(message_id)["status"] == outbox.ENVIADO
+    assert len(entregues) == 1
+
+
+def test_falha_reagenda_com_espera_e_descarta_no_limite(monkeypatch):
+    monkeypatch.setattr(outbox, "MAX_TENTATIVAS", 3)
+    message_id, _ = outbox.enfileirar("a@x.com", "Oi", "corpo")
+
+    antes = time.time()
+    assert outbox.processar_pendentes(_falhar) == 1
+    mensagem = _mensagem(message_id)
+    assert mensagem["status"] == outbox.PENDENTE and mensagem["tentativas"] == 1
+    assert mensagem["ultimo_erro"] == "servidor SMTP indisponível"
+    assert mensagem["proxima_tentativa"] >= antes + outbox.calcular_espera(1)
+    # Antes do intervalo a mensagem não é tentada de novo
+    assert outbox.processar_pendentes(_falhar) == 0
+
+    for tentativas in (2, 3):
+        _vencer(message_id)
+        assert outbox.processar_pendentes(_falhar) == 1
+        assert _mensagem(message_id)["tentativas"] == tentativas
+
+    assert _mensagem(message_id)["status"] == outbox.DESCARTADO
+    _vencer(message_id)
+    assert outbox.processar_pendentes(_falhar) == 0
+
+
+def test_mensagem_descartada_pode_ser_enfileirada_de_novo(monkeypatch):
+    monkeypatch.setattr(outbox, "MAX_TENTATIVAS", 1)
+    message_id, _ = outbox.enfileirar("a@x.com", "Oi", "corpo")
+    outbox.processar_pendentes(_falhar)
+
+    novo_id, criado = outbox.enfileirar("a@x.com", "Oi", "corpo")
+    assert criado and novo_id != message_id
+
+
+def test_espera_exponencial_limitada():
+    assert outbox.calcular_espera(1) == outbox.INTERVALO_BASE
+    assert outbox.calcular_espera(3) == outbox.INTERVALO_BASE * 4
+    assert outbox.calcular_espera(50) == outbox.INTERVALO_MAXIMO
@@ -0,0 +1,100 @@
+# Planos com várias etapas: validação, ordem das dependências e execução pelo CrewManager
+import threading
+
+import pytest
+
+from crews.planner import instrucao_da_etapa, montar_entrada, ordem_topologica, validar_plano
+
+CREWS = ["email", "search"]
+
+
+def _etapa(etapa_id, crew_type="search", depends_on=None, entrada="faça algo"):
+    return {"id": etapa_id, "crew_type": crew_type, "input": entrada, "depends_on": depends_on or []}
+
+
+def test_normaliza_etapas():
+    etapas = validar_plano([
+        {"crew_type": "search", "input": "pesquise"},
+        {"id": 7, "crew_type": "email", "input": None, "depends_on": [1]},
+        {"id": 1, "crew_type": "search"},
+    ], CREWS)
+    assert etapas == [
+        {"id": "p1", "crew_type": "search", "input": "pesquise", "depends_on": []},
+        {"id": "7", "crew_type": "email", "input": "", "depends_on": ["1"]},
+        {"id": "1", "crew_type": "search", "input": "", "depends_on": []},
+    ]
+
+
+@pytest.mark.parametrize("plano, mensagem", [
+    ([], "nenhuma etapa"),
+    ({"id": "p1"}, "nenhuma etapa"),
+    (["pesquise"], "não é um objeto"),
+    ([{"id": "p1", "crew_type": "search", "depends_on": "p0"}], "não é uma lista"),
+    ([{"id": "p1", "crew_type": "calendario"}], "não encontrado"),
+    ([{"id": "p1", "crew_type": ["search"]}], "não encontrado"),
+    ([_etapa("p1"), _etapa("p1")], "repetida"),
+    ([_etapa("p1", depends_on=["p9"])], "inexistentes: p9"),
+    ([_etapa("p1", depends_on=["p2"]), _etapa("p2", depends_on=["p1"])], "circulares"),
+    ([_etapa("p1", depends_on=["p1"])], "circulares"),
+])
+def test_plano_invalido(plano, mensagem):
+    with pytest.raises(ValueError, match=mensagem):
+        validar_plano(plano, CREWS)
+
+
+def test_ordem_topologica_respeita_dependencias():
+    etapas = [
+        _etapa("resumo", depends_on=["a", "b"]),
+        _etapa("a"),
+        _etapa("email", "email", depends_on=["resumo"]),
+        _etapa("b", depends_on=["a"]),
+    ]
+    ordem = ordem_topologica(etapas)
+    assert sorted(ordem) == ["a", "b", "email", "resumo"]
+    for etapa in etapas:
+        assert all(ordem.index(d) < ordem.index(etapa["id"]) for d in etapa["depends_on"])
+
+
+def test_ordem_topologica_nao_altera_as_etapas():
+    etapas = [_etapa("a"), _etapa("b", depends_on=["a"])]
+    ordem_topologica(etapas)
+    assert etapas[1]["depends_on"] == ["a"]
+
+
+def test_entrada_com_resultados_anteriores():
+    etapa = _etapa("p3", depends_on=["p1", "p2"], entrada="compare")
+    entrada = montar_entrada(etapa, {"p1": "um", "p2": "dois", "p4": "ignorado"})
+    assert entrada == "compare\n\nResultados das etapas anteriores:\n[p1]\num\n\n[p2]\ndois"
+    assert instrucao_da_etapa(entrada) == "compare"
+    assert montar_entrada(_etapa("p1", entrada="pesquise"), {}) == "pesquise"
+
+
+def test_execute_plan_segue_as_dependencias(monkeypatch):
+    pytest.importorskip("crewai")
+    from crews.manager import CrewManager
+
+    manager = CrewManager()
+    executadas = []
+    lock = threading.Lock()
+
+    def execute_crew(crew_type, user_input, etapa=None):
+        with lock:
+            executadas.append(etapa)
+        if etapa == "falha":
+            raise RuntimeError("indisponível")
+        return {"result": f"<{instrucao_da_etapa(user_input)}>", "events": [{"etapa": etapa}]}
+
+    monkeypatch.setattr(manager, "execute_crew", execute_crew)
+    resultado = manager.execute_plan([
+        _etapa("a", entrada="A"),
+        _etapa("b", depends_on=["a"], entrada="B"),
+        _etapa("falha"),
+        _etapa("depois_da_falha", "email", depends_on=["falha", "b"]),
+    ])
+
+    assert executadas.index("a") < executadas.index("b")
+    assert "depois_da_falha" not in executadas
+    assert resultado["results"] == {"a": "<A>", "b": "<B>"}
+    assert resultado["errors"]["falha"] == "Erro: indisponível"
+    assert "'falha' falhou" in resultado["errors"]["depois_da_falha"]
+    assert resultado["result"].startswith("[a - search]\n<A>")
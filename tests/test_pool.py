@@ -0,0 +1,95 @@
+# Workers do pool de crews: as chamadas HTTP passam pelo transporte do processo principal
+import json
+import pickle
+
+import httpx
+import pytest
+
+from core import transport, usage
+from core.governor import LOTE, Governor, prioridade, prioridade_atual
+from core.transport import OpenAITransport, TransporteEncaminhado, executar_encaminhada
+
+
+def _resposta_chat(conteudo: str) -> httpx.Response:
+    dados = {
+        "id": "chatcmpl-teste", "object": "chat.completion", "created": 0, "model": "gpt-4o",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": conteudo}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 5, "completion_tokens": 2, "total_tokens": 7},
+    }
+    return httpx.Response(200, headers={"content-type": "application/json"},
+                          stream=httpx.ByteStream(json.dumps(dados).encode("utf-8")))
+
+
+def _pelo_pipe(dados):
+    """Executa a requisição como o processo principal faria, com dados serializados como no pipe."""
+    return pickle.loads(pickle.dumps(executar_encaminhada(pickle.loads(pickle.dumps(dados)))))
+
+
+@pytest.fixture
+def principal(monkeypatch):
+    """Transporte do processo principal com governador próprio e OpenAI simulada."""
+    recebidas = []
+
+    def responder(request: httpx.Request) -> httpx.Response:
+        recebidas.append({"corpo": json.loads(request.read()), "prioridade": prioridade_atual(),
+                          "contexto": usage.contexto_atual()})
+        if request.url.path.endswith("/lenta"):
+            raise httpx.ReadTimeout("sem resposta", request=request)
+        return _resposta_chat("olá")
+
+    governor = Governor(rpm=10_000, tpm=10_000_000)
+    principal = OpenAITransport("teste-pool", inner=httpx.MockTransport(responder), governor=governor,
+                                max_tentativas=1)
+    monkeypatch.setitem(transport._transportes, "teste-pool", principal)
+    return governor, recebidas
+
+
+def test_requisicao_encaminhada_usa_o_governador_e_o_contexto_do_worker(principal):
+    governor, recebidas = principal
+    cliente = httpx.Client(transport=TransporteEncaminhado("teste-pool", _pelo_pipe))
+
+    with usage.contexto_uso(sessao="sessao-pool", turno="7", crew="search"), prioridade(LOTE):
+        response = cliente.post("https://api.openai.com/v1/chat/completions",
+                                json={"model": "gpt-4o", "messages": [{"role": "user", "content": "oi"}]})
+
+    assert response.json()["choices"][0]["message"]["content"] == "olá"
+    assert governor.metricas()["chamadas"] == 1
+    assert recebidas[0]["prioridade"] == LOTE
+    assert recebidas[0]["contexto"]["turno"] == "7" and recebidas[0]["contexto"]["crew"] == "search"
+    assert usage.gasto("sessao-pool", "search") > 0
+
+
+def test_erros_de_transporte_voltam_ao_worker(principal):
+    cliente = httpx.Client(transport=TransporteEncaminhado("teste-pool", _pelo_pipe))
+    with pytest.raises(httpx.ReadTimeout, match="sem resposta"):
+        cliente.post("https://api.openai.com/v1/lenta", json={"model": "gpt-4o"})
+
+
+def test_worker_do_pool_encaminha_as_chamadas(monkeypatch):
+    pytest.importorskip("crewai")
+    from core.governor import get_governor
+    from crews.pool import CrewPool
+
+    chamadas = []
+
+    def responder(request: httpx.Request) -> httpx.Response:
+        chamadas.append(usage.contexto_atual())
+        return _resposta_chat(json.dumps({"subject": "Oi", "body": "Tudo certo."}))
+
+    monkeypatch.setattr(transport.get_transport("email"), "inner", httpx.MockTransport(responder))
+    antes = get_governor().metricas()["chamadas"]
+
+    pool = CrewPool(size=1)
+    try:
+        with usage.contexto_uso(sessao="sessao-worker", turno="1"):
+            resultado = pool.run("email", "mande um email para a@x.com dizendo oi")
+    finally:
+        pool.cancel_all()
+        while not pool._livres.empty():
+            pool._livres.get().encerrar()
+
+    assert "a@x.com" in resultado
+    # A chamada do worker foi feita por este processo, no contexto do turno e do crew
+    assert [c["crew"] for c in chamadas] == ["email"]
+    assert get_governor().metricas()["chamadas"] == antes + 1
+    assert usage.gasto("sessao-worker", "email") > 0
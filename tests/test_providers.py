@@ -0,0 +1,153 @@
+# Failover entre provedores e reescrita de URL, contra servidores locais
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from core.governor import Governor
+from core.providers import ProviderRegistry
+from core.transport import OpenAITransport
+
+
+def _servidor_stub():
+    """
+    Servidor compatível com a OpenAI que responde chat completions com o status
+    definido em servidor.status e guarda os caminhos recebidos.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _responder(self, status: int, dados: dict):
+            corpo = json.dumps(dados).encode("utf-8")
+            self.send_response(status)
+            self.send_header("content-type", "application/json")
+            self.send_header("content-length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def do_GET(self):
+            servidor.caminhos.append(self.path)
+            self._responder(servidor.status, {"object": "list", "data": []})
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("content-length") or 0))
+            servidor.caminhos.append(self.path)
+            servidor.chaves.append(self.headers.get("authorization"))
+            if servidor.status != 200:
+                self._responder(servidor.status, {"error": {"message": "indisponível"}})
+                return
+            self._responder(200, {
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": 0, "model": "gpt-4o",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": servidor.nome},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            })
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    servidor.status = 200
+    servidor.caminhos = []
+    servidor.chaves = []
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+@pytest.fixture
+def servidores():
+    primario, secundario = _servidor_stub(), _servidor_stub()
+    primario.nome, secundario.nome = "primario", "secundario"
+    yield primario, secundario
+    primario.shutdown()
+    secundario.shutdown()
+
+
+def _cliente(registry, base_cliente="https://api.openai.com/v1"):
+    transporte = OpenAITransport(
+        "teste-provedores", inner=httpx.HTTPTransport(), governor=Governor(rpm=10_000, tpm=10_000_000),
+        providers=registry, max_tentativas=2, base_cliente=base_cliente,
+    )
+    return httpx.Client(transport=transporte)
+
+
+def _conversar(cliente, base_cliente="https://api.openai.com/v1", headers=None) -> str:
+    response = cliente.post(f"{base_cliente}/chat/completions", headers=headers,
+                            json={"model": "gpt-4o", "messages": [{"role": "user", "content": "oi"}]})
+    assert response.status_code == 200
+    return response.json()["choices"][0]["message"]["content"]
+
+
+def _registry(primario, secundario) -> ProviderRegistry:
+    host = "http://{}:{}".format(*primario.server_address[:2])
+    host_secundario = "http://{}:{}".format(*secundario.server_address[:2])
+    return ProviderRegistry(
+        provedores={"primario": {"base_url": f"{host}/v1", "api_key": "a"},
+                    "secundario": {"base_url": f"{host_secundario}/proxy/openai/v1", "api_key": "b"}},
+        papeis={"padrao": ["primario", "secundario"]},
+        estrategia="failover",
+    )
+
+
+def test_failover_e_recuperacao(servidores):
+    primario, secundario = servidores
+    registry = _registry(primario, secundario)
+    cliente = _cliente(registry)
+
+    assert _conversar(cliente) == "primario"
+
+    # Com o primário fora, a chamada passa imediatamente ao secundário
+    primario.status = 503
+    assert _conversar(cliente) == "secundario"
+    assert _conversar(cliente) == "secundario"
+    assert not registry.provedores["primario"].disponivel
+    # Indisponível, o primário deixa de ser tentado primeiro
+    tentativas_primario = len(primario.caminhos)
+    assert _conversar(cliente) == "secundario"
+    assert len(primario.caminhos) == tentativas_primario
+
+    # A verificação de saúde devolve o primário à frente da fila
+    primario.status = 200
+    assert registry.provedores["primario"].verificar()
+    assert _conversar(cliente) == "primario"
+
+    assert secundario.caminhos[0] == "/proxy/openai/v1/chat/completions"
+
+
+@pytest.mark.parametrize("base_cliente", [
+    "https://api.openai.com/v1",
+    "http://gateway.local/openai/v1/",
+    "http://gateway.local",
+])
+def test_caminho_relativo_a_base_do_cliente(servidores, base_cliente):
+    primario, secundario = servidores
+    cliente = _cliente(_registry(primario, secundario), base_cliente=base_cliente)
+
+    assert _conversar(cliente, base_cliente.rstrip("/")) == "primario"
+    assert primario.caminhos == ["/v1/chat/completions"]
+
+
+def test_chave_da_openai_nao_vai_para_outro_provedor(servidores):
+    primario, secundario = servidores
+    host = "http://{}:{}".format(*primario.server_address[:2])
+    registry = ProviderRegistry(
+        provedores={"local": {"base_url": f"{host}/v1"},
+                    "secundario": {"base_url": "http://{}:{}/v1".format(*secundario.server_address[:2]),
+                                   "api_key": "b"}},
+        papeis={"padrao": ["local"], "outro": ["secundario"]},
+        estrategia="failover",
+    )
+    conta = {"authorization": "Bearer sk-chave-da-openai", "openai-organization": "org-teste"}
+
+    # Provedor sem chave própria: a requisição segue sem autorização
+    assert _conversar(_cliente(registry), headers=conta) == "primario"
+    assert primario.chaves == [None]
+
+    # Provedor com chave: só a dele é enviada
+    transporte = OpenAITransport("outro", inner=httpx.HTTPTransport(), governor=Governor(rpm=10_000, tpm=10_000_000),
+                                 providers=registry, max_tentativas=1)
+    assert _conversar(httpx.Client(transport=transporte), headers=conta) == "secundario"
+    assert secundario.chaves == ["Bearer b"]
@@ -0,0 +1,121 @@
+# Seleção de passagens por BM25 sobre documentos de exemplo, sem chamadas externas
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from crews.search.rerank import dividir_em_passagens, extrair_passagens, selecionar_passagens, tokenizar
+from crews.search.results import estimar_tokens
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def _documento(nome: str) -> str:
+    with open(os.path.join(FIXTURES, nome), encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.fixture
+def noticias():
+    return dividir_em_passagens(_documento("noticias_cripto.txt"), ["https://exemplo.com/cripto"])
+
+
+def test_tokenizar_remove_acentos_e_palavras_vazias():
+    assert tokenizar("Qual é o preço atual do Bitcoin?") == ["preco", "atual", "bitcoin"]
+
+
+def test_divide_paragrafos_e_itens_de_lista(noticias):
+    assert len(noticias) == 6
+    assert noticias[-1]["texto"].startswith("- O volume negociado")
+    assert all(p["fontes"] == ["https://exemplo.com/cripto"] for p in noticias)
+
+
+def test_passagem_relevante_vem_primeiro(noticias):
+    escolhidas = selecionar_passagens("preço do bitcoin hoje", noticias, max_tokens=1000, k=1)
+    assert len(escolhidas) == 1
+    assert "O preço do bitcoin subiu 4%" in escolhidas[0]["texto"]
+    assert escolhidas[0]["score"] > 0
+
+
+def test_respeita_k_orcamento_e_ordem_original(noticias):
+    escolhidas = selecionar_passagens("bitcoin ethereum tokens", noticias, max_tokens=120, k=2)
+    assert len(escolhidas) <= 2
+    assert sum(estimar_tokens(p["texto"]) for p in escolhidas) <= 120
+    posicoes = [next(i for i, p in enumerate(noticias) if p["texto"] == e["texto"]) for e in escolhidas]
+    assert posicoes == sorted(posicoes)
+
+
+def test_sem_termos_da_consulta_usa_o_inicio_do_texto(noticias):
+    escolhidas = selecionar_passagens("xyzzy", noticias, max_tokens=1000, k=2)
+    assert [p["texto"] for p in escolhidas] == [noticias[0]["texto"], noticias[1]["texto"]]
+
+
+def test_passagem_maior_que_o_orcamento_entra_cortada():
+    passagens = dividir_em_passagens(_documento("paragrafo_longo.txt"))
+    assert len(passagens) == 1 and estimar_tokens(passagens[0]["texto"]) > 60
+
+    escolhidas = selecionar_passagens("modelos de linguagem", passagens, max_tokens=60)
+    assert len(escolhidas) == 1
+    assert escolhidas[0]["texto"].endswith("…")
+    assert passagens[0]["texto"].startswith(escolhidas[0]["texto"][:-1])
+    assert estimar_tokens(escolhidas[0]["texto"]) <= 60
+
+
+def test_citacoes_atribuidas_a_passagem_que_as_contem():
+    texto = _documento("noticias_cripto.txt")
+    posicao_eth = texto.index("O ethereum")
+    response = SimpleNamespace(output=[SimpleNamespace(type="message", content=[SimpleNamespace(
+        text=texto,
+        annotations=[
+            SimpleNamespace(type="url_citation", url="https://exemplo.com/eth?utm_source=x", start_index=posicao_eth + 5),
+            SimpleNamespace(type="url_citation", url="https://exemplo.com/tempo", start_index=texto.index("Em São Paulo")),
+        ],
+    )])])
+
+    passagens = extrair_passagens(response)
+    por_texto = {p["texto"][:12]: p["fontes"] for p in passagens}
+    assert por_texto["O ethereum a"] == ["https://exemplo.com/eth"]
+    assert por_texto["Em São Paulo"] == ["https://exemplo.com/tempo"]
+    assert por_texto["O preço do b"] == []
+
+
+def _cliente_pesquisa(texto):
+    response = SimpleNamespace(output_text=texto, output=[SimpleNamespace(
+        type="message", content=[SimpleNamespace(text=texto, annotations=[])])])
+    consultas = []
+
+    def criar(**kwargs):
+        consultas.append(kwargs["input"])
+        return response
+
+    return SimpleNamespace(responses=SimpleNamespace(create=criar)), consultas
+
+
+def test_passagens_ordenadas_pela_pergunta_do_usuario(monkeypatch):
+    pytest.importorskip("crewai")
+    from crews.planner import montar_entrada
+    from crews.search import crew as search_crew
+
+    cliente, consultas = _cliente_pesquisa(_documento("noticias_cripto.txt"))
+    monkeypatch.setattr(search_crew, "get_openai_client", lambda papel="padrao": cliente)
+
+    # A instrução da etapa é a pergunta; os resultados anteriores não entram na seleção
+    entrada = montar_entrada({"input": "Quanto está o ethereum?", "depends_on": ["p1"]},
+                             {"p1": "O mercado de criptomoedas abriu a semana em alta."})
+    ferramenta = search_crew.get_search_crew(entrada).agents[0].tools[0]
+    assert ferramenta.consulta_usuario == "Quanto está o ethereum?"
+
+    # O agente reformula a consulta da pesquisa; a seleção continua guiada pela pergunta
+    resultado = json.loads(ferramenta._run("mercado de criptomoedas semana alta"))
+    assert consultas == ["mercado de criptomoedas semana alta"]
+    assert resultado["consulta"] == "mercado de criptomoedas semana alta"
+    assert resultado["passagens"][0]["texto"].startswith("O ethereum acompanhou")
+    assert not any(p["texto"].startswith("O mercado de criptomoedas") for p in resultado["passagens"])
+
+    # Sem a pergunta do usuário, a própria consulta ordena as passagens
+    ferramenta.consulta_usuario = ""
+    resultado = json.loads(ferramenta._run("mercado de criptomoedas semana alta"))
+    assert resultado["passagens"][0]["texto"].startswith("O mercado de criptomoedas")
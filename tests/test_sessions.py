@@ -0,0 +1,130 @@
+# Sessões persistentes: reparo do índice após interrupções e janela de contexto via snapshot
+import json
+import os
+
+import pytest
+
+from core import sessions
+from core.sessions import Sessao
+
+
+@pytest.fixture(autouse=True)
+def diretorio(tmp_path, monkeypatch):
+    monkeypatch.setattr(sessions, "SESSOES_DIR", str(tmp_path))
+    monkeypatch.setattr(sessions, "CONTEXTO_MENSAGENS", 4)
+    monkeypatch.setattr(sessions, "INTERVALO_SNAPSHOT", 5)
+    return tmp_path
+
+
+def _preencher(sessao, quantidade, inicio=1):
+    for numero in range(inicio, inicio + quantidade):
+        sessao.adicionar("user", f"mensagem {numero}")
+
+
+def _conteudos(mensagens):
+    return [m["content"] for m in mensagens]
+
+
+def test_nomes_e_existencia():
+    with pytest.raises(ValueError, match="inválido"):
+        Sessao("../fora", criar=True)
+    with pytest.raises(ValueError, match="não encontrada"):
+        Sessao("inexistente")
+    Sessao("trabalho", criar=True)
+    with pytest.raises(ValueError, match="já existe"):
+        Sessao("trabalho", criar=True)
+
+
+def test_reabrir_recupera_mensagens_e_janela():
+    sessao = Sessao("trabalho", criar=True)
+    sessao.registrar_turno("oi", "olá!")
+    _preencher(sessao, 3)
+
+    reaberta = Sessao("trabalho")
+    assert reaberta.total == 5
+    assert reaberta.contexto() == sessao.contexto()
+    assert _conteudos(reaberta.contexto()) == ["olá!", "mensagem 1", "mensagem 2", "mensagem 3"]
+    assert [(m["role"], m["content"]) for m in reaberta._ler_mensagens(0, 2)] == [("user", "oi"), ("assistant", "olá!")]
+
+
+def test_mensagem_gravada_sem_indice_e_indexada():
+    sessao = Sessao("trabalho", criar=True)
+    _preencher(sessao, 2)
+    # Interrupção entre a gravação no log e no índice
+    with open(sessao.caminhos["log"], "ab") as log:
+        log.write((json.dumps({"role": "assistant", "content": "sem índice", "t": 0}) + "\n").encode("utf-8"))
+
+    reaberta = Sessao("trabalho")
+    assert reaberta.total == 3
+    assert os.path.getsize(reaberta.caminhos["indice"]) == 3 * sessions._OFFSET.size
+    assert _conteudos(reaberta._ler_mensagens(2, 3)) == ["sem índice"]
+
+
+def test_linha_incompleta_e_indice_parcial_sao_descartados():
+    sessao = Sessao("trabalho", criar=True)
+    _preencher(sessao, 2)
+    tamanho_log = os.path.getsize(sessao.caminhos["log"])
+    with open(sessao.caminhos["log"], "ab") as log:
+        log.write(b'{"role": "user", "content": "cort')
+    with open(sessao.caminhos["indice"], "ab") as indice:
+        indice.write(b"\x01\x02\x03")
+
+    reaberta = Sessao("trabalho")
+    assert reaberta.total == 2
+    assert os.path.getsize(reaberta.caminhos["log"]) == tamanho_log
+    assert os.path.getsize(reaberta.caminhos["indice"]) == 2 * sessions._OFFSET.size
+    # A sessão continua gravando normalmente depois do reparo
+    reaberta.adicionar("user", "depois do reparo")
+    assert _conteudos(Sessao("trabalho").contexto()) == ["mensagem 1", "mensagem 2", "depois do reparo"]
+
+
+def test_indice_alem_do_fim_do_log_e_cortado():
+    sessao = Sessao("trabalho", criar=True)
+    _preencher(sessao, 3)
+    # O log perdeu a última mensagem, mas o índice ainda aponta para ela
+    with open(sessao.caminhos["log"], "r+b") as log:
+        log.truncate(sessao._offset(2))
+
+    reaberta = Sessao("trabalho")
+    assert reaberta.total == 2
+    assert _conteudos(reaberta.contexto()) == ["mensagem 1", "mensagem 2"]
+
+
+def test_snapshot_ida_e_volta(monkeypatch):
+    sessao = Sessao("trabalho", criar=True)
+    _preencher(sessao, 12)
+    with open(sessao.caminhos["snapshot"], encoding="utf-8") as f:
+        snapshot = json.load(f)
+    assert snapshot["mensagens"] == 10
+    assert _conteudos(snapshot["janela"]) == ["mensagem 7", "mensagem 8", "mensagem 9", "mensagem 10"]
+
+    lidas = []
+    ler = Sessao._ler_mensagens
+    monkeypatch.setattr(Sessao, "_ler_mensagens",
+                        lambda self, inicio, fim: lidas.append((inicio, fim)) or ler(self, inicio, fim))
+    reaberta = Sessao("trabalho")
+    # Só as mensagens posteriores ao snapshot são lidas do log
+    assert lidas == [(10, 12)]
+    assert _conteudos(reaberta.contexto()) == ["mensagem 9", "mensagem 10", "mensagem 11", "mensagem 12"]
+
+
+@pytest.mark.parametrize("conteudo", ['{"mensagens": 2, "janela": []}', "{corrompido", '{"janela": []}'])
+def test_snapshot_defasado_ou_invalido_e_ignorado(conteudo):
+    sessao = Sessao("trabalho", criar=True)
+    _preencher(sessao, 8)
+    with open(sessao.caminhos["snapshot"], "w", encoding="utf-8") as f:
+        f.write(conteudo)
+
+    assert _conteudos(Sessao("trabalho").contexto()) == ["mensagem 5", "mensagem 6", "mensagem 7", "mensagem 8"]
+
+
+def test_contexto_respeita_o_orcamento_de_tokens():
+    sessao = Sessao("trabalho", criar=True)
+    sessao.adicionar("user", "a" * 2000)
+    sessao.adicionar("assistant", "b" * 400)
+
+    contexto = sessao.contexto(max_tokens=300)
+    assert [m["role"] for m in contexto] == ["user", "assistant"]
+    assert contexto[0]["content"].endswith("…") and len(contexto[0]["content"]) < 2000
+    assert contexto[1]["content"] == "b" * 400
+    assert sessao.contexto(max_tokens=120) == [{"role": "assistant", "content": "b" * 400}]
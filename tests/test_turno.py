@@ -0,0 +1,51 @@
+# Um turno com falha na API mostra o erro e a sessão continua
+import httpx
+import pytest
+
+pytest.importorskip("crewai")
+pytest.importorskip("prompt_toolkit")
+
+import openai
+
+import main
+
+CORES = {"erro": "red", "destaque": "yellow"}
+
+
+def _requisicao():
+    return httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+class _ChatFalso:
+    erros = []
+
+    def reset_conversation(self):
+        pass
+
+    def add_message(self, role, content):
+        pass
+
+    def handle_user_input(self, entrada):
+        if self.erros:
+            raise self.erros.pop(0)
+        return {"action": "direct_response", "response": f"resposta para {entrada}"}
+
+
+@pytest.fixture(autouse=True)
+def chat_falso(monkeypatch):
+    monkeypatch.setattr(main, "ChatManager", _ChatFalso)
+    monkeypatch.setattr(main, "get_pool", lambda: None)
+    monkeypatch.setattr(main, "sessao_atual", lambda: None)
+    _ChatFalso.erros = []
+
+
+@pytest.mark.parametrize("erro, trecho", [
+    (openai.APITimeoutError(request=_requisicao()), "tempo limite"),
+    (openai.APIConnectionError(request=_requisicao()), "conectar"),
+    (openai.APIStatusError("[quota] excedida", response=httpx.Response(429, request=_requisicao()), body=None),
+     "\\[quota] excedida"),
+])
+def test_erro_da_api_encerra_so_o_turno(erro, trecho):
+    _ChatFalso.erros = [erro]
+    assert trecho in main.executar_turno("oi", CORES)
+    assert main.executar_turno("de novo", CORES) == "resposta para de novo"